@@ -1,16 +1,24 @@
 import os
-import json
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime, timedelta
 import pytz
-from moviepy.editor import VideoFileClip
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from oauth2client.file import Storage
-from oauth2client.client import flow_from_clientsecrets
-from feedgen.feed import FeedGenerator
 import tempfile
 import shutil
+import pandas as pd
+from dedupe import ContentIndex, source_key
+from feeds import FEED_PROFILES, build_feeds, rfc822_now, upload_pending_feeds
+from google_services import (DRIVE_CREDENTIALS, YOUTUBE_CREDENTIALS, cache_summary, get_service, upload_public_file,
+                             upload_youtube_video)
+from jobs import ACTIVE_STATES, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SKIPPED, JOB_WAITING, JobExecutor, process_youtube_task
+from media import AUDIO_METADATA_KEYS, spool_to_disk
+from metrics import ApiCallCounter
+from pipeline import run_publish_pipeline
+from quota import QUOTA, QuotaExceeded
+from storage import PodcastStore
+from tracing import METRICS, PROMETHEUS_FILE, Trace
+from youtube_catalog import ChannelCatalog
 
 # ============
 # CONFIGURACIÓN
@@ -25,6 +33,12 @@ st.set_page_config(
     layout="wide"
 )
 
+# Nombres de los feeds de destino en la interfaz
+FEED_NAMES = {"rss": "RSS", "ivoox": "iVoox", "spotify": "Spotify / Apple Podcasts"}
+
+# Filas por página en las tablas de videos y tareas
+TAMAÑOS_PAGINA = [25, 50, 100, 200]
+
 # Zona horaria española
 SPAIN_TZ = pytz.timezone('Europe/Madrid')
 
@@ -45,6 +59,10 @@ def verificar_credenciales():
 
 def authenticate_google_service(service_name, credentials_file, scopes, storage_file):
     """Función genérica para autenticar servicios de Google"""
+    # oauth2client solo se carga cuando hace falta autenticarse
+    from oauth2client.client import flow_from_clientsecrets
+    from oauth2client.file import Storage
+    
     try:
         # Configurar el flujo OAuth2 con redirect_uri
         flow = flow_from_clientsecrets(
@@ -110,61 +128,59 @@ def authenticate_google_service(service_name, credentials_file, scopes, storage_
 
 def get_drive_service():
     """Obtiene el servicio de Google Drive usando credenciales locales"""
+    service = get_service("drive", "v3", DRIVE_CREDENTIALS)
+    if service:
+        return service
+    
+    # Sin credenciales válidas: mostrar el flujo de autorización
     creds = authenticate_google_service(
         "Google Drive", 
         "client_secret_drive.json", 
         DRIVE_SCOPES, 
-        "drive_credentials.json"
+        DRIVE_CREDENTIALS
     )
     if creds:
-        return build("drive", "v3", credentials=creds)
+        return get_service("drive", "v3", DRIVE_CREDENTIALS)
     return None
 
 def get_youtube_service():
     """Obtiene el servicio de YouTube usando credenciales locales"""
+    service = get_service("youtube", "v3", YOUTUBE_CREDENTIALS)
+    if service:
+        return service
+    
+    # Sin credenciales válidas: mostrar el flujo de autorización
     creds = authenticate_google_service(
         "YouTube", 
         "client_secret_youtube.json", 
         YT_SCOPES, 
-        "youtube_credentials.json"
+        YOUTUBE_CREDENTIALS
     )
     if creds:
-        return build("youtube", "v3", credentials=creds)
+        return get_service("youtube", "v3", YOUTUBE_CREDENTIALS)
     return None
 
+def streamlit_thread_initializer():
+    """Inicializador de hilos que les da acceso a la página actual
+
+    Sin el contexto de la ejecución, las llamadas a st.* desde un hilo del
+    pool (p. ej. st.progress durante la subida) se ignoran.
+    """
+    ctx = get_script_run_ctx()
+    
+    def _initializer():
+        add_script_run_ctx(threading.current_thread(), ctx)
+    
+    return _initializer
+
 def upload_to_drive(filepath, folder_name="Podcast"):
     """Sube un archivo a Google Drive en la carpeta especificada"""
-    service = get_drive_service()
-    if not service:
+    if not get_drive_service():
         return None, None
     
-    # Buscar o crear carpeta
-    results = service.files().list(
-        q=f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false",
-        spaces='drive',
-        fields="files(id, name)"
-    ).execute()
-    items = results.get('files', [])
-    
-    if items:
-        folder_id = items[0]['id']
-    else:
-        folder = service.files().create(
-            body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}, 
-            fields='id'
-        ).execute()
-        folder_id = folder['id']
-    
-    # Subir archivo
-    media = MediaFileUpload(filepath, resumable=True)
-    file_metadata = {"name": os.path.basename(filepath), "parents": [folder_id]}
-    file = service.files().create(body=file_metadata, media_body=media, fields="id").execute()
-    file_id = file["id"]
-    
-    # Hacer público
-    service.permissions().create(fileId=file_id, body={"role": "reader", "type": "anyone"}).execute()
-    
-    return f"https://drive.google.com/uc?export=download&id={file_id}", file_id
+    # Subida por trozos a la carpeta (resuelta una vez por proceso); si se
+    # corta, se reanuda desde el último byte confirmado
+    return upload_public_file(filepath, folder_name=folder_name)
 
 def upload_to_youtube(video_path, title, description, tags, privacy_status="private", scheduled_time=None):
     """Sube un video a YouTube"""
@@ -172,143 +188,83 @@ def upload_to_youtube(video_path, title, description, tags, privacy_status="priv
     if not service:
         return None
     
-    # Preparar metadata del video
-    body = {
-        'snippet': {
-            'title': title,
-            'description': description,
-            'tags': tags,
-            'categoryId': '22'  # People & Blogs
-        },
-        'status': {
-            'privacyStatus': privacy_status
-        }
-    }
-    
-    # Si hay fecha programada, configurarla
-    if scheduled_time and privacy_status == "private":
-        body['status']['publishAt'] = scheduled_time.isoformat() + 'Z'
-    
-    # Subir video
-    media = MediaFileUpload(video_path, chunksize=-1, resumable=True)
-    insert_request = service.videos().insert(
-        part=','.join(body.keys()),
-        body=body,
-        media_body=media
-    )
-    
-    response = None
-    while response is None:
-        status, response = insert_request.next_chunk()
-        if status:
-            st.progress(status.progress())
-    
-    return response['id']
+    # Subir video por trozos con la sesión guardada en disco
+    barra = st.progress(0.0)
+    return upload_youtube_video(video_path, title, description, tags, privacy_status, scheduled_time,
+                                progress=barra.progress)
 
-def extract_audio_from_video(video_path, output_path):
-    """Extrae audio de un video"""
+def extract_audio_from_video(video_path, output_path, clave):
+    """Extrae audio de un video y devuelve su ruta con tamaño, duración, bitrate y hash"""
     try:
-        clip = VideoFileClip(video_path)
-        clip.audio.write_audiofile(output_path, verbose=False, logger=None)
-        clip.close()
-        return True
+        return get_content_index().extract(video_path, output_path, clave)
     except Exception as e:
         st.error(f"Error al extraer audio: {str(e)}")
-        return False
+        return None
+
+def create_rss_feed(episodes):
+    """Añade o actualiza los episodios en todos los feeds (RSS, iVoox, Spotify)"""
+    return build_feeds(episodes)
+
+def upload_feeds():
+    """Sube a Drive los feeds que cambiaron y devuelve la URL de cada uno"""
+    if not get_drive_service():
+        return {profile.name: None for profile in FEED_PROFILES}
+    return upload_pending_feeds(upload_public_file)
 
-def create_rss_feed(episodes, feed_url):
-    """Crea o actualiza el feed RSS"""
-    fg = FeedGenerator()
-    fg.load_extension("podcast")
-    fg.title("YogaTe Podcast")
-    fg.link(href=feed_url, rel="self")
-    fg.description("Podcast de YogaTe - Episodios de yoga y bienestar")
-    fg.language("es")
-    fg.podcast.itunes_category("Health & Fitness", "Fitness")
-    
-    for episode in episodes:
-        entry = fg.add_entry()
-        entry.id(episode['audio_url'])
-        entry.title(episode['title'])
-        entry.description(episode['description'])
-        entry.enclosure(episode['audio_url'], 0, "audio/mpeg")
-        entry.pubDate(episode['pub_date'])
-    
-    fg.rss_file("feed.xml")
-    return "feed.xml"
+@st.cache_resource
+def get_content_index():
+    """Índice de audios ya extraídos y subidos, compartido entre sesiones"""
+    return ContentIndex()
+
+@st.cache_resource
+def get_catalog():
+    """Catálogo local del canal compartido entre sesiones"""
+    return ChannelCatalog()
 
 def get_youtube_videos():
-    """Obtiene la lista de videos del canal de YouTube"""
+    """Actualiza el catálogo local con los videos nuevos del canal y devuelve sus IDs"""
     service = get_youtube_service()
     if not service:
         return []
     
     try:
-        # Obtener canal del usuario autenticado
-        channels_response = service.channels().list(part="contentDetails", mine=True).execute()
-        if not channels_response['items']:
-            st.error("No se encontró canal de YouTube")
-            return []
-        
-        channel_id = channels_response['items'][0]['id']
-        uploads_playlist_id = channels_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
-        
-        # Obtener videos de la playlist de uploads
-        videos = []
-        next_page_token = None
-        
-        while True:
-            playlist_response = service.playlistItems().list(
-                part="snippet",
-                playlistId=uploads_playlist_id,
-                maxResults=50,
-                pageToken=next_page_token
-            ).execute()
-            
-            for item in playlist_response['items']:
-                video_id = item['snippet']['resourceId']['videoId']
-                video_details = service.videos().list(
-                    part="snippet,statistics",
-                    id=video_id
-                ).execute()
-                
-                if video_details['items']:
-                    video = video_details['items'][0]
-                    videos.append({
-                        'id': video_id,
-                        'title': video['snippet']['title'],
-                        'description': video['snippet']['description'],
-                        'published_at': video['snippet']['publishedAt'],
-                        'view_count': video['statistics'].get('viewCount', 0),
-                        'url': f"https://www.youtube.com/watch?v={video_id}"
-                    })
-            
-            next_page_token = playlist_response.get('nextPageToken')
-            if not next_page_token:
-                break
-        
-        return videos
-    except Exception as e:
-        st.error(f"Error al obtener videos de YouTube: {str(e)}")
+        catalog = get_catalog()
+        counter = ApiCallCounter(QUOTA)
+        nuevos = catalog.refresh(service, counter)
+        st.caption(f"⏱️ {counter.summary()} · {len(nuevos)} videos nuevos")
+        
+        # Las vistas se actualizan en segundo plano; el cliente compartido
+        # envía por el pool de conexiones, que admite varios hilos
+        catalog.refresh_statistics_in_background(lambda: service)
+        return nuevos
+    except LookupError as e:
+        st.error(str(e))
         return []
-
-def cargar_tareas_automaticas():
-    """Carga las tareas automáticas desde el archivo JSON"""
-    if not os.path.exists("tareas_automaticas.json"):
+    except QuotaExceeded as e:
+        st.warning(f"⚠️ No se actualiza la lista de videos para no gastar la cuota de YouTube: {e}")
         return []
-    
-    try:
-        with open("tareas_automaticas.json", "r", encoding="utf-8") as f:
-            return json.load(f)
     except Exception as e:
-        st.error(f"Error al cargar tareas automáticas: {str(e)}")
+        st.error(f"Error al obtener videos de YouTube: {str(e)}")
         return []
 
+@st.cache_resource
+def get_store():
+    """Base de datos de episodios y tareas, importando los JSON anteriores la primera vez"""
+    store = PodcastStore()
+    store.import_json()
+    return store
+
+@st.cache_resource
+def get_job_executor():
+    """Ejecutor de trabajos en segundo plano compartido por todas las sesiones"""
+    executor = JobExecutor(process_youtube_task)
+    executor.resume()
+    return executor
+
 def guardar_tareas_automaticas(tareas):
-    """Guarda las tareas automáticas en el archivo JSON"""
+    """Añade las tareas nuevas a la base de datos"""
     try:
-        with open("tareas_automaticas.json", "w", encoding="utf-8") as f:
-            json.dump(tareas, f, indent=2, ensure_ascii=False)
+        get_store().add_tasks(tareas)
         return True
     except Exception as e:
         st.error(f"Error al guardar tareas automáticas: {str(e)}")
@@ -318,6 +274,29 @@ def guardar_tareas_automaticas(tareas):
 # PESTAÑA 1: SUBIR VIDEO Y CREAR PODCAST
 # ============
 
+def mostrar_tiempos(traza):
+    """Desglose de tiempos de una publicación por etapa"""
+    with st.expander(f"⏱️ Tiempos: {traza.elapsed:.1f}s en total", expanded=False):
+        st.dataframe(pd.DataFrame([
+            {
+                'Etapa': span['stage'],
+                'Segundos': span['duration'],
+                'MB': span['bytes'] / (1024 * 1024),
+                'MB/s': span['mb_s'],
+                'Llamadas API': span['api_calls'],
+                'Reintentos': span['retries'],
+                'Error': span['error'] or "",
+            }
+            for span in traza.breakdown()
+        ]), hide_index=True, use_container_width=True, column_config={
+            'Segundos': st.column_config.ProgressColumn(format="%.2f s", min_value=0.0,
+                                                        max_value=max(traza.elapsed, 0.01)),
+            'MB': st.column_config.NumberColumn(format="%.1f"),
+            'MB/s': st.column_config.NumberColumn(format="%.1f"),
+        })
+        st.caption("La subida a YouTube y la preparación del audio van en paralelo: "
+                   "el total es menor que la suma de las etapas")
+
 def pestaña_subir_video():
     st.header("📹 Subir Video a YouTube y Crear Podcast")
     
@@ -377,151 +356,215 @@ def pestaña_subir_video():
         elif programar and privacidad != "private":
             st.warning("⚠️ Solo se pueden programar videos privados. Cambia la privacidad a 'privado' para programar.")
         
-        # Guardar archivo temporalmente
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
+        # Cada etapa se mide para ver después en qué se fue el tiempo
+        traza = Trace("publicación")
+        
+        # Volcar el archivo a disco por bloques; el mismo temporal sirve para
+        # la subida a YouTube y para la extracción de audio
+        extension = os.path.splitext(uploaded_file.name)[1] or '.mp4'
+        with traza.span("volcado a disco") as span:
+            tmp_path = spool_to_disk(uploaded_file, suffix=extension)
+            span.add_bytes(os.path.getsize(tmp_path))
+        
+        # Comprobar la autenticación antes de lanzar los hilos: el flujo de
+        # autorización necesita mostrar widgets en la página
+        if not get_youtube_service() or not get_drive_service():
+            os.remove(tmp_path)
+            return
+        
+        rutas_audio = []
+        
+        def _subir_video():
+            with traza.span("subida a YouTube") as span:
+                span.add_bytes(os.path.getsize(tmp_path))
+                return upload_to_youtube(tmp_path, titulo, descripcion, tags, privacidad, scheduled_time)
+        
+        def _preparar_audio():
+            # Si esta grabación ya se publicó se reutiliza el audio de Drive
+            with traza.span("hash del video") as span:
+                clave = source_key(tmp_path)
+                span.add_bytes(os.path.getsize(tmp_path))
+                audio = get_content_index().published_audio(clave)
+            if audio:
+                return audio
+            
+            # Extraer audio y subirlo a Drive mientras se sube el video
+            with traza.span("extracción de audio") as span:
+                audio = extract_audio_from_video(tmp_path, tempfile.mktemp(suffix='.mp3'), clave)
+                if audio:
+                    span.add_bytes(audio.get('audio_bytes'))
+            if not audio:
+                return None
+            rutas_audio.append(audio['path'])
+            with traza.span("subida a Drive") as span:
+                span.add_bytes(audio.get('audio_bytes'))
+                audio_url, audio_file_id = get_content_index().upload(audio, upload_to_drive)
+            if not audio_url:
+                return None
+            return {**audio, 'url': audio_url, 'file_id': audio_file_id}
+        
+        def _publicar(video_id, audio):
+            # Agregar nuevo episodio
+            nuevo_episodio = {
+                'title': titulo,
+                'description': descripcion,
+                'audio_url': audio['url'],
+                'pub_date': rfc822_now(),
+                'youtube_id': video_id,
+                **{clave: audio[clave] for clave in AUDIO_METADATA_KEYS if clave in audio}
+            }
+            get_store().add_episode(nuevo_episodio)
+            
+            # Añadir el episodio al feed RSS y subirlo a Drive
+            with traza.span("generación de feeds"):
+                create_rss_feed([nuevo_episodio])
+            with traza.span("subida de feeds"):
+                feed_urls = upload_feeds()
+            return feed_urls if all(feed_urls.values()) else None
         
         try:
-            # Subir a YouTube
-            with st.spinner("Subiendo video a YouTube..."):
-                video_id = upload_to_youtube(tmp_path, titulo, descripcion, tags, privacidad, scheduled_time)
+            with st.spinner("Subiendo video a YouTube y preparando el audio del podcast..."):
+                video_id, audio, feed_urls = run_publish_pipeline(
+                    _subir_video, _preparar_audio, _publicar, initializer=streamlit_thread_initializer()
+                )
             
             if video_id:
                 st.success(f"✅ Video subido a YouTube: https://www.youtube.com/watch?v={video_id}")
-
-# Extraer audio
-                with st.spinner("Extrayendo audio del video..."):
-                    audio_path = tempfile.mktemp(suffix='.mp3')
-                    if extract_audio_from_video(tmp_path, audio_path):
-
-# Subir audio a Drive
-                        with st.spinner("Subiendo audio a Google Drive..."):
-                            audio_url, audio_file_id = upload_to_drive(audio_path, "Podcast")
-                        
-                        if audio_url:
-                            # Crear/actualizar feed RSS
-                            with st.spinner("Creando feed RSS..."):
-                                # Cargar episodios existentes
-                                episodios = []
-                                if os.path.exists("episodios.json"):
-                                    with open("episodios.json", "r", encoding="utf-8") as f:
-                                        episodios = json.load(f)
-                                
-                                # Agregar nuevo episodio
-                                nuevo_episodio = {
-                                    'title': titulo,
-                                    'description': descripcion,
-                                    'audio_url': audio_url,
-                                    'pub_date': datetime.now().strftime('%a, %d %b %Y %H:%M:%S +0000'),
-                                    'youtube_id': video_id
-                                }
-                                episodios.append(nuevo_episodio)
-                                
-                                # Guardar episodios
-                                with open("episodios.json", "w", encoding="utf-8") as f:
-                                    json.dump(episodios, f, indent=2, ensure_ascii=False)
-                                
-                                # Crear feed RSS
-                                feed_file = create_rss_feed(episodios, audio_url)
-                                
-                                # Subir feed a Drive
-                                feed_url, feed_file_id = upload_to_drive(feed_file, "Podcast")
-                            
-                            if feed_url:
-                                st.success("✅ Podcast creado exitosamente!")
-                                
-                                # Mostrar URLs importantes
-                                st.subheader("🔗 Enlaces Importantes")
-                                col1, col2 = st.columns(2)
-                                
-                                with col1:
-                                    st.info(f"**Feed RSS:**\n{feed_url}")
-                                    st.code(feed_url, language=None)
-                                
-                                with col2:
-                                    st.info(f"**Video YouTube:**\nhttps://www.youtube.com/watch?v={video_id}")
-                                    st.code(f"https://www.youtube.com/watch?v={video_id}", language=None)
-                                
-                                st.success("📋 Copia la URL del feed RSS y pégala en Spotify e Ivoox para sincronizar tu podcast")
-                            else:
-                                st.error("Error al crear el feed RSS")
-                        else:
-                            st.error("Error al subir el audio a Google Drive")
-                    else:
-                        st.error("Error al extraer el audio del video")
             else:
                 st.error("Error al subir el video a YouTube")
+            
+            if not audio:
+                if rutas_audio:
+                    st.error("Error al subir el audio a Google Drive")
+                else:
+                    st.error("Error al extraer el audio del video")
+            elif not video_id:
+                st.warning(f"⚠️ El audio se subió a Drive pero no se ha publicado en el feed: {audio['url']}")
+            
+            if video_id and audio:
+                if feed_urls:
+                    st.success("✅ Podcast creado exitosamente!")
+                    
+                    # Mostrar URLs importantes
+                    st.subheader("🔗 Enlaces Importantes")
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        for nombre, feed_url in feed_urls.items():
+                            st.info(f"**Feed {FEED_NAMES.get(nombre, nombre)}:**\n{feed_url}")
+                            st.code(feed_url, language=None)
+                    
+                    with col2:
+                        st.info(f"**Video YouTube:**\nhttps://www.youtube.com/watch?v={video_id}")
+                        st.code(f"https://www.youtube.com/watch?v={video_id}", language=None)
+                    
+                    st.success("📋 Copia la URL de cada feed y pégala en Spotify e Ivoox para sincronizar tu podcast")
+                else:
+                    st.error("Error al crear el feed RSS")
+            
+            mostrar_tiempos(traza)
         
         finally:
             # Limpiar archivos temporales
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            if 'audio_path' in locals() and os.path.exists(audio_path):
-                os.remove(audio_path)
+            for ruta in [tmp_path, *rutas_audio]:
+                if os.path.exists(ruta):
+                    os.remove(ruta)
 
 # ============
 # PESTAÑA 2: GESTIÓN AUTOMÁTICA DE VIDEOS
 # ============
 
+def paginador(clave, total, tamaño_por_defecto=50):
+    """Selector de página y tamaño de página; devuelve (offset, límite)"""
+    col1, col2, col3 = st.columns([2, 2, 3])
+    with col1:
+        tamaño = st.selectbox("Por página", TAMAÑOS_PAGINA, index=TAMAÑOS_PAGINA.index(tamaño_por_defecto),
+                              key=f"{clave}_tamaño")
+    paginas = max(1, -(-total // tamaño))
+    # Si el filtro deja menos páginas, se vuelve a la última que existe
+    if st.session_state.get(f"{clave}_pagina", 1) > paginas:
+        st.session_state[f"{clave}_pagina"] = paginas
+    with col2:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, key=f"{clave}_pagina")
+    with col3:
+        st.caption(f"Página {pagina} de {paginas} · {total} en total")
+    return (pagina - 1) * tamaño, tamaño
+
 def pestaña_gestion_automatica():
     st.header("🤖 Gestión Automática de Videos")
     
     # Obtener videos de YouTube
     if st.button("🔄 Actualizar Lista de Videos"):
         with st.spinner("Obteniendo videos de YouTube..."):
-            videos = get_youtube_videos()
-            st.session_state.youtube_videos = videos
+            get_youtube_videos()
     
-    if 'youtube_videos' not in st.session_state:
+    # La tabla lee del catálogo guardado, página a página
+    catalog = get_catalog()
+    if not len(catalog):
         st.info("Haz clic en 'Actualizar Lista de Videos' para cargar tus videos de YouTube")
         return
     
-    videos = st.session_state.youtube_videos
+    st.subheader(f"📺 Videos Encontrados ({len(catalog)})")
     
-    if not videos:
-        st.warning("No se encontraron videos en tu canal de YouTube")
-        return
+    video_ids_programados = get_store().scheduled_video_ids()
+    seleccion = st.session_state.setdefault("videos_seleccionados", set())
     
-    st.subheader(f"📺 Videos Encontrados ({len(videos)})")
+    # Búsqueda y filtros en SQLite: solo viaja al navegador la página visible
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        busqueda = st.text_input("Buscar por título", key="busqueda_videos")
+    with col2:
+        filtro = st.selectbox("Mostrar", ["Disponibles", "Ya programados", "Todos"], key="filtro_videos")
     
-    # Cargar tareas automáticas existentes
-    tareas_automaticas = cargar_tareas_automaticas()
-    video_ids_programados = {tarea['video_id'] for tarea in tareas_automaticas}
+    filtros = {
+        "Disponibles": {'exclude_ids': video_ids_programados},
+        "Ya programados": {'include_ids': video_ids_programados},
+        "Todos": {},
+    }[filtro]
+    _, total = catalog.page(busqueda, limit=0, **filtros)
+    offset, limite = paginador("videos", total)
+    videos, total = catalog.page(busqueda, offset, limite, **filtros)
     
-    # Mostrar videos con opción de selección
-    videos_seleccionados = []
-    
-    for i, video in enumerate(videos):
-        col1, col2, col3, col4 = st.columns([1, 4, 2, 1])
-        
-        with col1:
-            if video['id'] not in video_ids_programados:
-                seleccionado = st.checkbox("", key=f"select_{i}")
-                if seleccionado:
-                    videos_seleccionados.append(video)
-            else:
-                st.success("✅")
-        
-        with col2:
-            st.write(f"**{video['title']}**")
-            st.caption(f"Publicado: {video['published_at'][:10]}")
-            st.caption(f"Vistas: {video['view_count']}")
-        
-        with col3:
-            if video['id'] in video_ids_programados:
-                st.info("Ya programado")
+    if not videos:
+        st.warning("No hay videos que coincidan con la búsqueda")
+    else:
+        tabla = pd.DataFrame([
+            {
+                'id': video['id'],
+                'Seleccionar': video['id'] in seleccion,
+                'Título': video['title'],
+                'Publicado': video['published_at'][:10],
+                'Vistas': int(video['view_count']),
+                'Estado': "Ya programado" if video['id'] in video_ids_programados else "Disponible",
+                'Ver': video['url'],
+            }
+            for video in videos
+        ]).set_index('id')
+        
+        # La clave cambia con la página para que las ediciones no se mezclen entre páginas
+        editada = st.data_editor(
+            tabla,
+            key=f"tabla_videos_{busqueda}_{filtro}_{offset}_{limite}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=['Título', 'Publicado', 'Vistas', 'Estado', 'Ver'],
+            column_config={
+                'Seleccionar': st.column_config.CheckboxColumn(width="small"),
+                'Vistas': st.column_config.NumberColumn(format="%d"),
+                'Ver': st.column_config.LinkColumn(display_text="Ver en YouTube"),
+            },
+        )
+        for video_id, marcado in editada['Seleccionar'].items():
+            if marcado and video_id not in video_ids_programados:
+                seleccion.add(video_id)
             else:
-                st.write("Disponible")
-        
-        with col4:
-            if st.button("Ver", key=f"view_{i}"):
-                st.write(f"[Ver en YouTube]({video['url']})")
-        
-        st.markdown("---")
+                seleccion.discard(video_id)
+    
+    seleccion -= video_ids_programados
     
     # Formulario para programar tareas
-    if videos_seleccionados:
+    if seleccion:
+        videos_seleccionados = catalog.get(seleccion)
         st.subheader("📅 Programar Tareas Automáticas")
         
         with st.form("form_programar_tareas"):
@@ -553,80 +596,104 @@ def pestaña_gestion_automatica():
                 }
                 nuevas_tareas.append(tarea)
             
-            # Agregar a las tareas existentes
-            tareas_automaticas.extend(nuevas_tareas)
-            
-            if guardar_tareas_automaticas(tareas_automaticas):
+            if guardar_tareas_automaticas(nuevas_tareas):
+                seleccion.clear()
                 st.success(f"✅ {len(nuevas_tareas)} tareas programadas exitosamente!")
                 st.info(f"Las tareas se ejecutarán cada {intervalo_horas} horas a partir del {fecha_inicio}")
             else:
                 st.error("Error al guardar las tareas")
     
     # Mostrar tareas programadas
-    if tareas_automaticas:
+    _, total_tareas = get_store().tasks_page(limit=0)
+    if total_tareas:
         st.subheader("📋 Tareas Programadas")
         
-        for i, tarea in enumerate(tareas_automaticas):
-            fecha = datetime.fromisoformat(tarea['scheduled_date'])
-            col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
-            
-            with col1:
-                st.write(f"**{tarea['title']}**")
-            
-            with col2:
-                st.write(fecha.strftime("%d/%m/%Y %H:%M"))
-            
-            with col3:
-                if tarea['processed']:
-                    st.success("✅ Procesado")
-                else:
-                    st.warning("⏳ Pendiente")
-            
-            with col4:
-                if not tarea['processed'] and datetime.now() >= fecha:
-                    if st.button("Procesar", key=f"process_{i}"):
-                        procesar_tarea_automatica(tarea, i)
+        offset, limite = paginador("tareas", total_tareas)
+        tareas, _ = get_store().tasks_page(offset=offset, limit=limite)
+        ahora = datetime.now()
+        tabla = pd.DataFrame([
+            {
+                'id': tarea['id'],
+                'Procesar': False,
+                'Título': tarea['title'],
+                'Fecha': datetime.fromisoformat(tarea['scheduled_date']).strftime("%d/%m/%Y %H:%M"),
+                'Estado': "✅ Procesado" if tarea['processed'] else "⏳ Pendiente",
+            }
+            for tarea in tareas
+        ]).set_index('id')
+        editada = st.data_editor(
+            tabla,
+            key=f"tabla_tareas_{offset}_{limite}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=['Título', 'Fecha', 'Estado'],
+            column_config={'Procesar': st.column_config.CheckboxColumn(width="small")},
+        )
+        
+        # Solo se pueden procesar las pendientes cuya fecha ya pasó
+        marcadas = set(editada.index[editada['Procesar']])
+        listas = [tarea for tarea in tareas if tarea['id'] in marcadas
+                  and not tarea['processed'] and ahora >= datetime.fromisoformat(tarea['scheduled_date'])]
+        if marcadas and st.button(f"Procesar seleccionadas ({len(listas)})", disabled=not listas):
+            encolar_tareas(listas)
         
         # Botón para procesar todas las tareas pendientes
-        tareas_pendientes = [t for t in tareas_automaticas if not t['processed'] and datetime.now() >= datetime.fromisoformat(t['scheduled_date'])]
+        tareas_pendientes = get_store().pending_tasks()
         
         if tareas_pendientes:
             st.markdown("---")
             if st.button("🚀 Procesar Todas las Tareas Pendientes", type="primary"):
-                progress_bar = st.progress(0)
-                for i, tarea in enumerate(tareas_pendientes):
-                    idx = tareas_automaticas.index(tarea)
-                    st.write(f"Procesando: {tarea['title']}")
-                    if procesar_tarea_automatica(tarea, idx):
-                        progress_bar.progress((i + 1) / len(tareas_pendientes))
-                
-                st.success("¡Todas las tareas han sido procesadas!")
+                encolar_tareas(tareas_pendientes)
+    
+    panel_trabajos()
 
-def procesar_tarea_automatica(tarea, index):
-    """Procesa una tarea automática: descarga video de YouTube, extrae audio y actualiza feed"""
-    try:
-        st.info(f"📤 Procesando: {tarea['title']}")
-        
-        # Descargar video de YouTube (esto requeriría youtube-dl o similar)
-        # Por ahora, simularemos el proceso
-        with st.spinner("Descargando video de YouTube..."):
-            # En una implementación real, aquí usarías youtube-dl o yt-dlp
-            st.warning("⚠️ Funcionalidad de descarga de YouTube requiere youtube-dl instalado")
-            return False
-        
-        # El resto del proceso sería similar al de la pestaña 1
-        # Extraer audio, subir a Drive, actualizar feed RSS
-        
-        # Marcar como procesado
-        tareas_automaticas = cargar_tareas_automaticas()
-        tareas_automaticas[index]['processed'] = True
-        guardar_tareas_automaticas(tareas_automaticas)
-        
-        return True
-        
-    except Exception as e:
-        st.error(f"Error al procesar la tarea: {str(e)}")
-        return False
+def encolar_tareas(tareas):
+    """Envía las tareas al ejecutor en segundo plano sin bloquear la página"""
+    creados = get_job_executor().submit(tareas)
+    if creados:
+        st.success(f"✅ {len(creados)} tareas enviadas a procesar en segundo plano")
+    else:
+        st.info("Esas tareas ya se están procesando")
+
+ESTADOS_TRABAJO = {
+    JOB_QUEUED: "🕒 En cola",
+    JOB_WAITING: "⏳ Esperando",
+    JOB_RUNNING: "⚙️ En curso",
+    JOB_DONE: "✅ Completado",
+    JOB_FAILED: "❌ Error",
+    JOB_SKIPPED: "⏭️ Omitido",
+}
+
+def panel_trabajos():
+    """Estado de los trabajos; se refresca solo mientras haya alguno activo"""
+    conteo = get_job_executor().queue.counts()
+    if not conteo:
+        return
+    activos = any(conteo.get(estado) for estado in ACTIVE_STATES)
+    
+    @st.fragment(run_every=2 if activos else None)
+    def _panel():
+        cola = get_job_executor().queue
+        conteo = cola.counts()
+        st.subheader("⚙️ Trabajos en segundo plano")
+        total = sum(conteo.values())
+        terminados = total - sum(conteo.get(estado, 0) for estado in ACTIVE_STATES)
+        st.progress(terminados / total if total else 1.0,
+                    text=" · ".join(f"{ESTADOS_TRABAJO[estado]}: {n}" for estado, n in conteo.items()))
+        st.dataframe([
+            {
+                "Tarea": trabajo['title'],
+                "Estado": ESTADOS_TRABAJO[trabajo['state']],
+                "Etapa": trabajo['stage'] or "",
+                "Error": trabajo['error'] or "",
+            }
+            for trabajo in cola.jobs()
+        ], use_container_width=True, hide_index=True)
+        if activos and not any(conteo.get(estado) for estado in ACTIVE_STATES):
+            # Al terminar el lote se recarga la página para dejar de consultar
+            st.rerun()
+    
+    _panel()
 
 # ============
 # FUNCIÓN PRINCIPAL
@@ -648,6 +715,29 @@ def main():
     
     with tab2:
         pestaña_gestion_automatica()
+    
+    with st.sidebar.expander("📊 Cachés"):
+        for nombre, resumen in cache_summary().items():
+            st.caption(f"**{nombre}:** {resumen}")
+        st.caption(f"**contenido ya publicado:** {get_content_index().stats.summary()}")
+    
+    with st.sidebar.expander("⏱️ Tiempos por etapa"):
+        etapas = METRICS.snapshot()
+        if etapas:
+            for etapa, totales in etapas.items():
+                st.caption(f"**{etapa}:** {totales['count']} veces, {totales['seconds'] / totales['count']:.1f}s "
+                           f"de media, {totales['api_calls']} llamadas, {totales['retries']} reintentos")
+            st.download_button("Métricas (Prometheus)", METRICS.prometheus_text(),
+                               file_name=PROMETHEUS_FILE, mime="text/plain")
+        else:
+            st.caption("Sin publicaciones en este proceso")
+    
+    with st.sidebar.expander("📉 Cuota de la API"):
+        for api, (usadas, limite) in QUOTA.snapshot().items():
+            if limite:
+                st.progress(min(1.0, usadas / limite),
+                            text=f"{api}: {usadas} de {limite} unidades hoy (quedan {max(0, limite - usadas)})")
+        st.caption(QUOTA.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""Completa el tamaño, la duración y el bitrate del audio de los episodios ya publicados
+
+Uso: python backfill_audio.py [--workers 8] [--hash] [--force]
+
+Sondea en paralelo el audio de cada episodio al que le faltan los
+metadatos, tanto los guardados como los que solo están publicados en los
+feeds (con length="0" o sin itunes:duration). Los guarda en el episodio
+(si está guardado) y, en cada item de los feeds y sus páginas de archivo,
+cambia solo enclosure@length e itunes:duration; cada item se corrige en su
+posición, aunque su GUID esté repetido. Sin --hash solo se lee la cabecera
+de cada archivo; con --hash se descarga entero para calcular también su
+SHA-256. Los feeds que cambien se suben a Drive en la siguiente publicación.
+"""
+import argparse
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from feeds import (FEED_PROFILES, FEEDS_LOCK, archive_paths, episode_guid, item_audio, load_feed,
+                   patch_item_audio, save_feed)
+from media import HASH_CHUNK_SIZE, probe_audio_metadata
+from storage import PodcastStore
+
+
+def download_sha256(url, chunk_size=HASH_CHUNK_SIZE):
+    """Descarga ``url`` en streaming y devuelve (bytes, sha256) sin tocar el disco"""
+    digest = hashlib.sha256()
+    size = 0
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        for block in response.iter_content(chunk_size):
+            digest.update(block)
+            size += len(block)
+    return size, digest.hexdigest()
+
+
+def probe_episode(episode, with_hash=False):
+    """Metadatos del audio del episodio, tanto si es una ruta local como una URL"""
+    source = episode['audio_url']
+    metadata = probe_audio_metadata(source)
+    if with_hash and "://" in source:
+        metadata['audio_bytes'], metadata['audio_sha256'] = download_sha256(source)
+    return metadata
+
+
+def needs_backfill(episode, with_hash=False):
+    keys = ('audio_bytes', 'duration', 'audio_sha256') if with_hash else ('audio_bytes', 'duration')
+    return not all(episode.get(key) for key in keys)
+
+
+def feed_items(force=False):
+    """(ruta, posición, URL del audio) de los items de los feeds a los que les faltan metadatos"""
+    items = []
+    for profile in FEED_PROFILES:
+        for path in [profile.path, *archive_paths(profile.path)]:
+            if not os.path.exists(path):
+                continue
+            for position, (_, fragment) in enumerate(load_feed(path).segments):
+                url, audio_bytes, duration = item_audio(fragment)
+                if url and (force or not (audio_bytes and duration)):
+                    items.append((path, position, url))
+    return items
+
+
+def patch_feeds(items, metadata_by_url):
+    """Corrige en su posición los items sondeados; devuelve las rutas de los feeds que cambiaron"""
+    with FEEDS_LOCK:
+        documents = {}
+        for path, position, url in items:
+            metadata = metadata_by_url.get(url)
+            if not metadata:
+                continue
+            document = documents.setdefault(path, load_feed(path))
+            _, fragment = document.segments[position]
+            # Si otra publicación movió los items entre medias, ese item se deja para otra pasada
+            if item_audio(fragment)[0] != url:
+                continue
+            document.replace(position, patch_item_audio(fragment, metadata.get('audio_bytes'),
+                                                        metadata.get('duration')))
+        return [path for path, document in documents.items() if save_feed(path, document)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8, help="archivos sondeados a la vez")
+    parser.add_argument("--hash", action="store_true", help="descargar cada audio para calcular su SHA-256")
+    parser.add_argument("--force", action="store_true", help="volver a sondear aunque ya tengan metadatos")
+    args = parser.parse_args()
+
+    store = PodcastStore()
+    store.import_json()
+    episodes = store.episodes()
+    items = feed_items(args.force)
+
+    # Un mismo audio se sondea una sola vez; los metadatos ya guardados sirven para los feeds
+    metadata_by_url = {} if args.force else {
+        episode['audio_url']: episode for episode in episodes if not needs_backfill(episode)
+    }
+    guids_by_url = defaultdict(list)
+    pending = {}
+    for episode in episodes:
+        if args.force or needs_backfill(episode, args.hash):
+            guids_by_url[episode['audio_url']].append(episode_guid(episode))
+            pending.setdefault(episode['audio_url'], episode)
+    for _, _, url in items:
+        if url not in metadata_by_url and url not in pending:
+            pending[url] = {'audio_url': url, 'title': url}
+    print(f"🔎 Sondeando {len(pending)} audios ({len(items)} items de los feeds) con {args.workers} hilos...")
+
+    updated, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # Solo hace falta el SHA-256 de los episodios guardados
+        futures = {executor.submit(probe_episode, episode, args.hash and url in guids_by_url): episode
+                   for url, episode in pending.items()}
+        for future in as_completed(futures):
+            episode = futures[future]
+            try:
+                metadata = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ {episode['title']}: {e}")
+                continue
+            # El tipo MIME ya registrado en la publicación manda sobre el deducido
+            if episode.get('audio_type'):
+                metadata.pop('audio_type', None)
+            for guid in guids_by_url.get(episode['audio_url'], []):
+                store.update_episode(guid, **metadata)
+            metadata_by_url[episode['audio_url']] = metadata
+            updated += 1
+
+    changed = patch_feeds(items, metadata_by_url)
+    print(f"✅ {updated} audios sondeados; feeds modificados: {', '.join(changed) or 'ninguno'}")
+    if failed:
+        print(f"⚠️ {failed} audios no se pudieron sondear")
+
+
+if __name__ == "__main__":
+    main()
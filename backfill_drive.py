@@ -0,0 +1,118 @@
+"""Deja pública y ordenada la carpeta del podcast en Drive con unas pocas peticiones por lotes
+
+Uso: python backfill_drive.py [--folder Podcast] [--rename] [--dry-run]
+
+- Mueve a la carpeta el audio de los episodios y los feeds que estén en otra.
+- Con --rename, renombra el audio de cada episodio con su título.
+- Hace públicos (cualquiera con el enlace) los archivos de la carpeta, el
+  audio de los episodios y los feeds que aún no lo sean.
+
+Los metadatos, los cambios y los permisos se envían en lotes de hasta 100
+operaciones (ver drive_bulk.py), así que miles de archivos cuestan unas
+decenas de peticiones. Con --dry-run solo se muestra lo que se haría.
+"""
+import argparse
+import os
+import re
+import sys
+
+from drive_bulk import file_id_from_url, get_files, is_public, list_folder, share_publicly, update_files
+from feeds import FeedUploadState
+from google_services import DRIVE_CREDENTIALS, get_service, resolve_folder_id
+from quota import QUOTA
+from storage import PodcastStore
+
+
+def audio_file_name(episode, current_name):
+    """Nombre del archivo de audio según el título del episodio, con la extensión actual"""
+    title = re.sub(r'[\\/:*?"<>|\s]+', " ", episode['title']).strip() or "episodio"
+    return title + (os.path.splitext(current_name)[1] or ".mp3")
+
+
+def referenced_files(store):
+    """{ID de Drive: episodio o None} del audio de los episodios y de los feeds (y sus archivos) subidos"""
+    referenced = {}
+    for episode in store.episodes():
+        file_id = file_id_from_url(episode.get('audio_url'))
+        if file_id:
+            referenced[file_id] = episode
+    for file_id in FeedUploadState().file_ids():
+        referenced[file_id] = None
+    return referenced
+
+
+def report_errors(title, result):
+    print(f"   {title}: {result.summary()}")
+    for file_id, error in result.errors.items():
+        print(f"❌ {file_id}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--folder", default="Podcast", help="carpeta de Drive del podcast")
+    parser.add_argument("--rename", action="store_true", help="renombrar el audio con el título del episodio")
+    parser.add_argument("--dry-run", action="store_true", help="mostrar los cambios sin hacerlos")
+    args = parser.parse_args()
+
+    service = get_service("drive", "v3", DRIVE_CREDENTIALS)
+    if not service:
+        print("❌ Faltan credenciales de Drive: autentícate antes en la app")
+        return 1
+
+    store = PodcastStore()
+    store.import_json()
+    folder_id = resolve_folder_id(service, args.folder)
+    files = {file['id']: file for file in list_folder(service, folder_id)}
+    referenced = referenced_files(store)
+    print(f"🔎 {len(files)} archivos en {args.folder}, {len(referenced)} referenciados por episodios y feeds")
+
+    # Los referenciados que no están en la carpeta se consultan en lote
+    outside = [file_id for file_id in referenced if file_id not in files]
+    if outside:
+        result = get_files(service, outside)
+        files.update(result.responses)
+        for file_id, error in result.errors.items():
+            print(f"⚠️ {file_id} no se encuentra en Drive: {error}")
+
+    changes = {}
+    for file_id, file in files.items():
+        change = {}
+        if folder_id not in file.get('parents', []):
+            change['add_parents'] = [folder_id]
+            change['remove_parents'] = file.get('parents', [])
+        episode = referenced.get(file_id)
+        if args.rename and episode:
+            name = audio_file_name(episode, file.get('name', ""))
+            if name != file.get('name'):
+                change['name'] = name
+        if change:
+            changes[file_id] = change
+    private = [file_id for file_id, file in files.items() if not is_public(file)]
+
+    moves = sum(1 for change in changes.values() if 'add_parents' in change)
+    renames = sum(1 for change in changes.values() if 'name' in change)
+    print(f"📋 {moves} archivos a mover, {renames} a renombrar, {len(private)} a hacer públicos")
+    if args.dry_run:
+        for file_id, change in changes.items():
+            destino = f" → «{change['name']}»" if 'name' in change else ""
+            print(f"   {files[file_id].get('name', file_id)}{destino}"
+                  + (f" (a {args.folder})" if 'add_parents' in change else ""))
+        return 0
+
+    failed = 0
+    if changes:
+        result = update_files(service, changes)
+        report_errors("movidos y renombrados", result)
+        failed += len(result.errors)
+    if private:
+        result = share_publicly(service, private)
+        report_errors("hechos públicos", result)
+        failed += len(result.errors)
+
+    print(f"{'⚠️' if failed else '✅'} Carpeta {args.folder} revisada; {failed} operaciones fallidas")
+    print(f"📉 Cuota: {QUOTA.summary()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
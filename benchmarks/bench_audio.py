@@ -0,0 +1,65 @@
+"""Compara la extracción de audio con ffmpeg frente a moviepy
+
+Genera clips de prueba con ffmpeg (lavfi) con audio AAC, que se copia sin
+recodificar, y con audio PCM, que obliga a recodificar a MP3, y mide cada
+método sobre ellos.
+
+Uso: python -m benchmarks.bench_audio [--seconds 300]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from media import extract_audio_ffmpeg, extract_audio_moviepy, ffmpeg_binary
+
+CLIPS = {
+    "aac (copia)": ("clip_aac.mp4", ["-c:a", "aac", "-b:a", "128k"]),
+    "pcm (recodifica)": ("clip_pcm.mov", ["-c:a", "pcm_s16le"]),
+}
+
+
+def generate_clip(path, seconds, audio_args):
+    subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+         "-c:v", "libx264", "-preset", "ultrafast", *audio_args, "-shortest", path],
+        check=True
+    )
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    output = function(*args)
+    return time.perf_counter() - started, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=300, help="duración de los clips generados")
+    parser.add_argument("--skip-moviepy", action="store_true")
+    args = parser.parse_args()
+
+    if not ffmpeg_binary():
+        raise SystemExit("❌ Este benchmark necesita ffmpeg")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'clip':<18} {'método':<8} {'tiempo':>8} {'salida':>10}")
+        for name, (filename, audio_args) in CLIPS.items():
+            clip_path = os.path.join(workdir, filename)
+            generate_clip(clip_path, args.seconds, audio_args)
+
+            methods = [("ffmpeg", extract_audio_ffmpeg)]
+            if not args.skip_moviepy:
+                methods.append(("moviepy", extract_audio_moviepy))
+            for method, function in methods:
+                elapsed, output_path = timed(function, clip_path, os.path.join(workdir, f"{method}.mp3"))
+                size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                print(f"{name:<18} {method:<8} {elapsed:>7.2f}s {size_mb:>8.1f}MB")
+                os.remove(output_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Descarga con yt-dlp desde un origen HLS local: video completo frente a solo audio
+
+Genera con ffmpeg una clase sintética en HLS (video 720p y una pista de audio
+aparte, como sirve YouTube) y la sirve por HTTP con una latencia fija por
+petición. Mide bytes transferidos y tiempo para:
+- el video completo (video + audio)
+- solo el audio, fragmento a fragmento
+- solo el audio con fragmentos concurrentes (download_audio)
+- repetir la descarga ya registrada en el archivo de descargas
+- repetirla cuando el audio ya no está en disco (no se vuelve a descargar)
+
+Uso: python -m benchmarks.bench_download [--seconds 120] [--latency 0.03]
+"""
+import argparse
+import functools
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from media import ffmpeg_binary
+from youtube_download import AlreadyDownloadedError, download_audio
+
+
+def make_hls(directory, seconds):
+    subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=s=1280x720:r=25:d={seconds}", "-f", "lavfi", "-i", f"sine=d={seconds}",
+         "-map", "0:v", "-map", "1:a", "-c:v", "libx264", "-preset", "ultrafast", "-b:v", "2M", "-g", "50",
+         "-c:a", "aac", "-b:a", "128k",
+         "-f", "hls", "-hls_time", "2", "-hls_playlist_type", "vod", "-master_pl_name", "clase.m3u8",
+         "-var_stream_map", "v:0,agroup:aud a:0,agroup:aud,default:yes",
+         "-hls_segment_filename", os.path.join(directory, "s%v_%03d.ts"), os.path.join(directory, "p%v.m3u8")],
+        check=True
+    )
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+    lock = threading.Lock()
+    sent = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        time.sleep(self.latency)
+        data = source.read()
+        with CountingHandler.lock:
+            CountingHandler.sent += len(data)
+        outputfile.write(data)
+
+
+def measure(function):
+    CountingHandler.sent = 0
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started, CountingHandler.sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=120, help="duración de la clase sintética")
+    parser.add_argument("--latency", type=float, default=0.03, help="latencia por petición HTTP")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    origin = os.path.join(workdir, "origen")
+    os.makedirs(origin)
+    make_hls(origin, args.seconds)
+
+    CountingHandler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(CountingHandler, directory=origin))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/clase.m3u8"
+
+    def full_video():
+        from yt_dlp import YoutubeDL
+        # Ambas pistas por separado: lo que se mide es la transferencia, no la mezcla
+        options = {"format": "bv*,ba", "outtmpl": os.path.join(workdir, "video", "%(id)s.%(format_id)s.%(ext)s"),
+                   "concurrent_fragment_downloads": 4, "quiet": True, "no_warnings": True, "noprogress": True}
+        with YoutubeDL(options) as ydl:
+            ydl.download([url])
+
+    def archived_without_audio():
+        try:
+            download_audio(url, video_id="clase", directory=os.path.join(workdir, "vacio"), archive=archive)
+        except AlreadyDownloadedError:
+            return
+        raise AssertionError("se volvió a descargar un audio ya registrado")
+
+    archive = os.path.join(workdir, "archivo.txt")
+    results = [
+        ("video completo", measure(full_video)),
+        ("solo audio, 1 fragmento", measure(lambda: download_audio(
+            url, directory=os.path.join(workdir, "audio1"), archive=archive + "1", concurrent_fragments=1))),
+        ("solo audio, 4 fragmentos", measure(lambda: download_audio(
+            url, directory=os.path.join(workdir, "audio4"), archive=archive, concurrent_fragments=4))),
+        ("repetir (ya en el archivo)", measure(lambda: download_audio(
+            url, video_id="clase", directory=os.path.join(workdir, "audio4"), archive=archive))),
+        ("registrado, sin audio", measure(archived_without_audio)),
+    ]
+    server.shutdown()
+
+    print(f"Clase de {args.seconds}s, latencia {args.latency * 1000:.0f} ms por petición")
+    for name, (elapsed, sent) in results:
+        print(f"  {name:28s} {sent / 1024 / 1024:8.2f} MB {elapsed:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
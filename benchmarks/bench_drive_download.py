@@ -0,0 +1,94 @@
+"""Descarga de un video de Drive: todo en memoria frente a rangos en paralelo
+
+Sirve un archivo con benchmarks/fake_google_api.py, con un ancho de banda
+limitado por conexión, y lo descarga en subprocesos midiendo tiempo y pico
+de memoria (VmHWM):
+- memoria: la respuesta entera en memoria y luego a disco (método antiguo)
+- rangos: RangeDownloadManager con 1 y con 4 hilos
+Después corta una descarga a la mitad y la reanuda, contando los bytes
+que se vuelven a pedir.
+
+Uso: python -m benchmarks.bench_drive_download [--size 256] [--bandwidth 64]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_google_api import start_server
+
+MB = 1024 * 1024
+
+
+def _peak_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child(mode, file_id, destination):
+    import requests
+    from downloads import RangeDownloadManager, drive_media_url
+
+    baseline = _peak_mb()
+    started = time.perf_counter()
+    if mode == "memoria":
+        content = requests.get(drive_media_url(file_id), timeout=600).content
+        with open(destination, "wb") as f:
+            f.write(content)
+        del content
+    else:
+        RangeDownloadManager(chunk_size=8 * MB, workers=int(mode)).download(file_id, destination)
+    print(json.dumps({"elapsed": time.perf_counter() - started, "peak_mb": _peak_mb() - baseline}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=256, help="tamaño del video en MB")
+    parser.add_argument("--bandwidth", type=float, default=64, help="MB/s por conexión")
+    parser.add_argument("--child", nargs=3, metavar=("MODO", "FILE_ID", "DESTINO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    server, state, base_url = start_server(bandwidth=args.bandwidth * MB)
+    os.environ["GOOGLE_API_BASE_URL"] = base_url
+    file_id = state.add_file(os.urandom(args.size * MB), "clase.mp4")
+    workdir = tempfile.mkdtemp()
+
+    print(f"Video de {args.size} MB, {args.bandwidth:.0f} MB/s por conexión")
+    for mode, name in (("memoria", "todo en memoria"), ("1", "rangos, 1 hilo"), ("4", "rangos, 4 hilos")):
+        destination = os.path.join(workdir, f"video_{mode}.mp4")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_drive_download", "--child", mode, file_id, destination],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        print(f"  {name:18s} {result['elapsed']:6.2f} s  pico de memoria {result['peak_mb']:7.1f} MB")
+        os.remove(destination)
+
+    # Corte a mitad de descarga (el servidor deja de servir trozos) y reanudación
+    from downloads import DownloadError, RangeDownloadManager
+
+    destination = os.path.join(workdir, "video_reanudado.mp4")
+    manager = RangeDownloadManager(chunk_size=8 * MB, workers=4)
+    state.media_limit = max(args.size // 8 // 2, 1)
+    try:
+        manager.download(file_id, destination)
+    except DownloadError:
+        pass
+    state.media_limit = None
+    state.bytes_sent = 0
+    manager.download(file_id, destination)
+    print(f"  reanudación: se pidieron {state.bytes_sent / MB:.0f} de {args.size} MB, MD5 verificado")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Benchmark de extremo a extremo contra el servidor de pruebas de Google
+
+Arranca benchmarks/fake_google_api.py con la latencia, el ancho de banda y
+los errores indicados, genera videos sintéticos con ffmpeg y ejecuta, en un
+directorio temporal y sin tocar las APIs reales:
+- subida: lo que hace la pestaña «Subir video» al pulsar el botón (volcado
+  a disco, video a YouTube y audio y feeds a Drive en paralelo), un video
+  tras otro
+- catálogo: lo que hace get_youtube_videos, con el canal entero, con videos
+  nuevos y sin cambios
+- upload_task: una ejecución de upload_task.py con una tarea de
+  schedule.json por video, con los videos en Drive; después, una tarea
+  cuya descarga se corta a medias y que la siguiente invocación reanuda
+
+Para cada escenario informa del tiempo total, el rendimiento y los
+percentiles p50/p90/p99 de la latencia por operación y por etapa (de las
+trazas). Las credenciales son de mentira y la cuota diaria no limita.
+
+Uso: python -m benchmarks.bench_e2e [--videos 6] [--seconds 20] [--latency 0.02]
+         [--bandwidth 50] [--fail-rate 0.02] [--rate-limit-rate 0.0]
+         [--channel-videos 1000] [--only subida catalogo upload_task]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.fake_google_api import start_server
+
+MB = 1024 * 1024
+SCENARIOS = ["subida", "catalogo", "upload_task"]
+
+
+def percentiles(values):
+    """Devuelve (p50, p90, p99) por el método del rango más cercano"""
+    ordered = sorted(values)
+    if not ordered:
+        return (0.0, 0.0, 0.0)
+    return tuple(ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))] for p in (50, 90, 99))
+
+
+def report(name, latencies, elapsed, total_bytes=0):
+    p50, p90, p99 = percentiles(latencies)
+    throughput = f", {total_bytes / MB / elapsed:.1f} MB/s" if total_bytes else ""
+    print(f"  {name}: {len(latencies)} en {elapsed:.2f}s ({len(latencies) / elapsed:.2f}/s{throughput}); "
+          f"p50 {p50 * 1000:.0f} ms, p90 {p90 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms")
+
+
+def report_stages(trace_file, trace_name):
+    """Percentiles por etapa de las trazas escritas en ``trace_file``"""
+    durations, sizes = defaultdict(list), defaultdict(int)
+    with open(trace_file, encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if span["trace"] == trace_name:
+                durations[span["stage"]].append(span["duration"])
+                sizes[span["stage"]] += span["bytes"]
+    for stage, values in durations.items():
+        p50, p90, p99 = percentiles(values)
+        seconds = sum(values)
+        throughput = f", {sizes[stage] / MB / seconds:.1f} MB/s" if sizes[stage] and seconds else ""
+        print(f"    {stage:22s} ×{len(values):<3d} p50 {p50 * 1000:6.0f} ms, p90 {p90 * 1000:6.0f} ms, "
+              f"p99 {p99 * 1000:6.0f} ms{throughput}")
+
+
+def generate_video(path, seconds, index):
+    from media import ffmpeg_binary
+
+    subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc=size=1280x720:rate=25:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency={220 + 20 * index}:sample_rate=44100:duration={seconds}",
+         "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-b:a", "128k", "-shortest", path],
+        check=True
+    )
+
+
+def write_fake_credentials(*paths):
+    """Credenciales OAuth con un token que no caduca durante el benchmark"""
+    from oauth2client.client import OAuth2Credentials
+    from oauth2client.file import Storage
+
+    for path in paths:
+        Storage(path).put(OAuth2Credentials(
+            "token-de-prueba", "cliente", "secreto", "refresco", datetime.utcnow() + timedelta(days=1),
+            "http://127.0.0.1/token", "bench_e2e"
+        ))
+
+
+def bench_upload_tab(videos):
+    """El proceso de la pestaña «Subir video» para cada video, uno tras otro"""
+    from dedupe import ContentIndex, source_key
+    from feeds import build_feeds, rfc822_now, upload_pending_feeds
+    from google_services import upload_public_file, upload_youtube_video
+    from media import AUDIO_METADATA_KEYS, spool_to_disk
+    from pipeline import run_publish_pipeline
+    from storage import PodcastStore
+    from tracing import Trace
+
+    store, index = PodcastStore(), ContentIndex()
+    latencies, total_bytes = [], 0
+    started = time.perf_counter()
+    for number, path in enumerate(videos):
+        with open(path, "rb") as f:
+            uploaded_file = io.BytesIO(f.read())
+        title = f"Clase sintética {number}"
+        video_started = time.perf_counter()
+        traza = Trace("publicación")
+        with traza.span("volcado a disco") as span:
+            tmp_path = spool_to_disk(uploaded_file)
+            span.add_bytes(os.path.getsize(tmp_path))
+
+        def _subir_video():
+            with traza.span("subida a YouTube") as span:
+                span.add_bytes(os.path.getsize(tmp_path))
+                return upload_youtube_video(tmp_path, title, "Respira y suelta.", ["yoga"])
+
+        def _preparar_audio():
+            with traza.span("hash del video") as span:
+                clave = source_key(tmp_path)
+                span.add_bytes(os.path.getsize(tmp_path))
+                audio = index.published_audio(clave)
+            if audio:
+                return audio
+            with traza.span("extracción de audio") as span:
+                audio = index.extract(tmp_path, tempfile.mktemp(suffix='.mp3'), clave)
+                span.add_bytes(audio.get('audio_bytes'))
+            with traza.span("subida a Drive") as span:
+                span.add_bytes(audio.get('audio_bytes'))
+                audio['url'], audio['file_id'] = index.upload(audio, upload_public_file)
+            return audio
+
+        def _publicar(video_id, audio):
+            episodio = {
+                'title': title,
+                'description': "Respira y suelta.",
+                'audio_url': audio['url'],
+                'pub_date': rfc822_now(),
+                'youtube_id': video_id,
+                **{clave: audio[clave] for clave in AUDIO_METADATA_KEYS if clave in audio}
+            }
+            store.add_episode(episodio)
+            with traza.span("generación de feeds"):
+                build_feeds([episodio])
+            with traza.span("subida de feeds"):
+                return upload_pending_feeds(upload_public_file)
+
+        try:
+            video_id, audio, feed_urls = run_publish_pipeline(_subir_video, _preparar_audio, _publicar)
+        finally:
+            os.remove(tmp_path)
+        if not (video_id and audio and feed_urls):
+            raise SystemExit(f"❌ No se publicó {title}")
+        latencies.append(time.perf_counter() - video_started)
+        total_bytes += len(uploaded_file.getbuffer())
+
+    report("videos publicados", latencies, time.perf_counter() - started, total_bytes)
+    report_stages("trazas.jsonl", "publicación")
+
+
+def bench_catalog(state, new_videos, rounds):
+    """get_youtube_videos: canal entero, luego videos nuevos y luego sin cambios"""
+    from google_services import YOUTUBE_CREDENTIALS, get_service
+    from metrics import ApiCallCounter
+    from quota import QUOTA
+    from youtube_catalog import ChannelCatalog
+
+    service = get_service("youtube", "v3", YOUTUBE_CREDENTIALS)
+    catalog = ChannelCatalog("catalogo_bench.db")
+
+    def _refresh(full=False):
+        counter = ApiCallCounter(QUOTA)
+        refresh_started = time.perf_counter()
+        new_ids = catalog.refresh(service, counter, full=full)
+        return time.perf_counter() - refresh_started, new_ids, counter
+
+    elapsed, new_ids, counter = _refresh(full=True)
+    print(f"  canal entero: {len(new_ids)} videos en {elapsed:.2f}s ({counter.summary()})")
+
+    for name, added in (("con videos nuevos", new_videos), ("sin cambios", 0)):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for number in range(added):
+                state.add_video(f"Clase nueva {number}")
+            elapsed, new_ids, counter = _refresh()
+            if len(new_ids) != added:
+                raise SystemExit(f"❌ Se esperaban {added} videos nuevos y llegaron {len(new_ids)}")
+            latencies.append(elapsed)
+        report(f"refrescos {name} ({added} por refresco, {counter.summary()})",
+               latencies, time.perf_counter() - started)
+
+
+def bench_upload_task(state, videos):
+    """Una ejecución de upload_task.py con una tarea vencida por video"""
+    import upload_task
+
+    plan = []
+    for number, path in enumerate(videos):
+        with open(path, "rb") as f:
+            file_id = state.add_file(f.read(), os.path.basename(path), file_id=f"drive{number:04d}")
+        plan.append({"file_id": file_id, "name": f"Clase de Drive {number}", "description": "Respira.",
+                     "scheduled_date": (datetime.now() - timedelta(minutes=number + 1)).isoformat(),
+                     "uploaded": False})
+    with open("schedule.json", "w") as f:
+        json.dump(plan, f, indent=2)
+
+    sys.argv = ["upload_task.py"]
+    started = time.perf_counter()
+    if upload_task.main():
+        raise SystemExit("❌ upload_task terminó con errores")
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(os.path.getsize(path) for path in videos)
+    print(f"  upload_task: {len(videos)} tareas en {elapsed:.2f}s ({len(videos) / elapsed:.2f} tareas/s, "
+          f"{total_bytes / MB / elapsed:.1f} MB/s de video)")
+    report_stages("trazas.jsonl", "upload_task")
+
+
+def bench_resumed_download(state, video):
+    """Una tarea cuya descarga se corta a medias; la siguiente invocación pide solo lo que falta"""
+    import contextlib
+
+    import upload_task
+    from dedupe import ContentIndex
+    from downloads import DOWNLOADS, DownloadError, drive_download_path
+    from storage import PodcastStore
+    from tracing import Trace
+
+    with open(video, "rb") as f:
+        data = f.read()
+    file_id = state.add_file(data, os.path.basename(video), file_id="drive_reanudada")
+    tarea = {"file_id": file_id, "name": "Clase reanudada", "description": "Respira."}
+    published = []
+    handler = upload_task.make_task_handler(PodcastStore(), ContentIndex(), None, published,
+                                            Trace("upload_task"))
+    part_path = drive_download_path(file_id) + ".part"
+    chunk_size = DOWNLOADS.chunk_size
+    # Trozos pequeños para que el corte deje parte del video descargada
+    DOWNLOADS.chunk_size = max(len(data) // 8, 1)
+    try:
+        state.media_limit = 4
+        try:
+            handler(tarea, lambda name: contextlib.nullcontext())
+        except DownloadError:
+            pass
+        else:
+            raise SystemExit("❌ La descarga cortada no falló")
+        if not (os.path.exists(part_path) and os.path.exists(f"{part_path}.json")):
+            raise SystemExit("❌ La descarga cortada no dejó el .part para reanudarla")
+        state.media_limit = None
+        sent = state.bytes_sent
+        handler(tarea, lambda name: contextlib.nullcontext())
+        resent = state.bytes_sent - sent
+    finally:
+        DOWNLOADS.chunk_size = chunk_size
+        state.media_limit = None
+    if not published or resent >= len(data):
+        raise SystemExit(f"❌ La segunda invocación no reanudó la descarga ({resent} de {len(data)} bytes)")
+    if os.path.exists(part_path) or os.path.exists(drive_download_path(file_id)):
+        raise SystemExit("❌ La descarga terminada no se borró")
+    print(f"  descarga reanudada: la segunda invocación pidió {resent / 1024:.0f} de {len(data) / 1024:.0f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=6, help="videos sintéticos por escenario")
+    parser.add_argument("--seconds", type=int, default=20, help="duración de cada video")
+    parser.add_argument("--latency", type=float, default=0.02, help="segundos de espera por petición")
+    parser.add_argument("--bandwidth", type=float, default=50, help="MB/s por conexión (0 sin límite)")
+    parser.add_argument("--fail-rate", type=float, default=0.02, help="fracción de trozos que responden 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fracción de llamadas a la API que responden 403 rateLimitExceeded")
+    parser.add_argument("--channel-videos", type=int, default=1000, help="videos del canal al empezar")
+    parser.add_argument("--new-videos", type=int, default=5, help="videos nuevos por refresco del catálogo")
+    parser.add_argument("--rounds", type=int, default=20, help="refrescos del catálogo por caso")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    args = parser.parse_args()
+
+    server, state, base_url = start_server(
+        fail_rate=args.fail_rate, seed=1, bandwidth=args.bandwidth * MB or None,
+        latency=args.latency, rate_limit_rate=args.rate_limit_rate
+    )
+    state.add_channel_videos(args.channel_videos)
+
+    # Todo lo que la app escribe (bases de datos, feeds, trazas) queda en
+    # un directorio temporal; la configuración se lee al importar los módulos
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    os.chdir(workdir)
+    os.environ.update({
+        "GOOGLE_API_BASE_URL": base_url,
+        "GOOGLE_UPLOAD_BASE_URL": f"{base_url}/upload",
+        "YOUTUBE_JSON": "{}",
+        "DRIVE_JSON": "{}",
+        "YOUTUBE_DAILY_QUOTA": str(10 ** 9),
+        "API_RATE": "1000",
+        "API_BURST": "1000",
+        "TRACE_FILE": "trazas.jsonl",
+        "PROMETHEUS_FILE": "metricas.prom",
+    })
+
+    from media import ffmpeg_binary
+    if not ffmpeg_binary():
+        raise SystemExit("❌ Este benchmark necesita ffmpeg")
+    write_fake_credentials("drive_credentials.json", "youtube_credentials.json")
+
+    print(f"Generando {args.videos} videos de {args.seconds}s con ffmpeg...")
+    videos = []
+    for number in range(args.videos):
+        path = os.path.join(workdir, f"clase_{number}.mp4")
+        generate_video(path, args.seconds, number)
+        videos.append(path)
+    print(f"Servidor {base_url}: latencia {args.latency * 1000:.0f} ms, "
+          f"{args.bandwidth:.0f} MB/s por conexión, {args.fail_rate:.0%} de 503, "
+          f"{args.rate_limit_rate:.0%} de rateLimitExceeded")
+
+    try:
+        if "subida" in args.only:
+            print("\n▶ Pestaña «Subir video»")
+            bench_upload_tab(videos)
+        if "catalogo" in args.only:
+            print(f"\n▶ Catálogo del canal ({args.channel_videos} videos)")
+            bench_catalog(state, args.new_videos, args.rounds)
+        if "upload_task" in args.only:
+            print("\n▶ upload_task.py")
+            # Videos distintos de los de la pestaña, para que no se reutilice su audio
+            for number, path in enumerate(videos):
+                generate_video(path, args.seconds, args.videos + number)
+            bench_upload_task(state, videos)
+            generate_video(videos[0], args.seconds, 2 * args.videos)
+            bench_resumed_download(state, videos[0])
+    finally:
+        server.shutdown()
+        os.chdir(repo_root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n🧪 Servidor: {state.summary()}")
+
+
+if __name__ == "__main__":
+    main()
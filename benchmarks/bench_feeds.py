@@ -0,0 +1,118 @@
+"""Construcción de los feeds RSS, iVoox y Spotify para un catálogo grande
+
+Mide, sobre episodios sintéticos en un directorio temporal:
+- una pasada por destino, escapando cada episodio en cada una (como antes)
+- una sola pasada compartida por los tres destinos
+- publicar un episodio nuevo sobre los feeds ya construidos
+- repetir la construcción sin cambios (no debe escribir nada)
+- lo mismo con páginas de archivo: tamaño del feed principal que descargan
+  los clientes en cada consulta y coste de publicar solo sobre él
+
+Uso: python -m benchmarks.bench_feeds [--episodes 1500] [--head-items 25]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import feeds
+from feeds import FEED_PROFILES, build_feeds, format_duration
+
+LOREM = ("Meditación guiada para encontrar la calma & el equilibrio <en casa>. "
+         "Respira, observa y suelta lo que no necesitas. ") * 6
+
+
+def synthetic_episodes(count):
+    return [{
+        'title': f"Meditación {n} - Colección 'Calma'",
+        'description': f"{LOREM}\n\n#meditacion #yogate {n}",
+        'audio_url': f"https://yogate.es/Podcast/meditacion_{n:05d}.mp3",
+        'audio_bytes': 12_000_000 + n,
+        'duration': 900 + n,
+        'pub_date': f"Mon, 0{1 + n % 9} Dec 2025 14:{n % 60:02d}:00 +0000",
+        'youtube_id': f"yt{n:08d}",
+    } for n in range(count)]
+
+
+def clear_caches():
+    feeds._serialize.cache_clear()
+    for profile in FEED_PROFILES:
+        profile.render_item.cache_clear()
+    feeds._documents.clear()
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=1500)
+    parser.add_argument("--head-items", type=int, default=feeds.FEED_HEAD_ITEMS or 25)
+    args = parser.parse_args()
+
+    episodes = synthetic_episodes(args.episodes)
+    workdir = tempfile.mkdtemp()
+    profiles = [profile._replace(path=os.path.join(workdir, profile.path)) for profile in FEED_PROFILES]
+
+    def per_target():
+        for profile in profiles:
+            feeds._serialize.cache_clear()
+            build_feeds(episodes, [profile], head_items=0)
+
+    clear_caches()
+    elapsed_separate, _ = timed(per_target)
+    for profile in profiles:
+        os.remove(profile.path)
+
+    clear_caches()
+    elapsed_shared, changed = timed(lambda: build_feeds(episodes, profiles, head_items=0))
+    assert all(changed.values())
+
+    new_episode = synthetic_episodes(args.episodes + 1)[-1]
+    elapsed_publish, changed = timed(lambda: build_feeds([new_episode], profiles, head_items=0))
+    assert all(changed.values())
+
+    elapsed_noop, changed = timed(lambda: build_feeds(episodes + [new_episode], profiles, head_items=0))
+    assert not any(changed.values())
+
+    sizes = ", ".join(f"{p.name} {os.path.getsize(p.path) / 1024:.0f}KB" for p in profiles)
+    print(f"{args.episodes} episodios, 3 destinos ({sizes}); duración de ejemplo {format_duration(900)}")
+    print(f"  una pasada por destino:      {elapsed_separate * 1000:8.1f} ms")
+    print(f"  una pasada compartida:       {elapsed_shared * 1000:8.1f} ms")
+    print(f"  publicar un episodio nuevo:  {elapsed_publish * 1000:8.1f} ms")
+    print(f"  reconstruir sin cambios:     {elapsed_noop * 1000:8.1f} ms (sin escrituras)")
+
+    # Con páginas de archivo, en otro directorio
+    archive_dir = tempfile.mkdtemp()
+    # Se archivan los tres para comparar; en FEED_PROFILES solo el RSS admite archivo
+    paged = [profile._replace(path=os.path.join(archive_dir, profile.path), archive=True)
+             for profile in FEED_PROFILES]
+    clear_caches()
+    elapsed_paged, changed = timed(lambda: build_feeds(episodes, paged, head_items=args.head_items))
+    assert all(changed.values())
+
+    elapsed_paged_publish, changed = timed(lambda: build_feeds([new_episode], paged, head_items=args.head_items))
+    assert all(changed.values())
+
+    elapsed_paged_noop, changed = timed(
+        lambda: build_feeds(episodes + [new_episode], paged, head_items=args.head_items)
+    )
+    assert not any(changed.values())
+
+    pages = sum(len(feeds.archive_paths(p.path)) for p in paged)
+    print(f"Con páginas de archivo (feed principal de {args.head_items} a "
+          f"{args.head_items + feeds.FEED_ARCHIVE_ITEMS - 1} items, {pages} páginas en total)")
+    for full, head in zip(profiles, paged):
+        full_size, head_size = os.path.getsize(full.path), os.path.getsize(head.path)
+        print(f"  {head.name:8} por consulta:   {head_size / 1024:8.1f} KB frente a {full_size / 1024:.0f}KB "
+              f"({full_size / head_size:.0f}x menos)")
+    print(f"  construcción inicial:        {elapsed_paged * 1000:8.1f} ms")
+    print(f"  publicar un episodio nuevo:  {elapsed_paged_publish * 1000:8.1f} ms")
+    print(f"  reconstruir sin cambios:     {elapsed_paged_noop * 1000:8.1f} ms (sin escrituras)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Tiempo de importación de los puntos de entrada (``python -X importtime``)
+
+Importa cada módulo en un proceso nuevo y resume la salida de
+``-X importtime``: tiempo total, los imports directos que más pesan y qué
+librerías pesadas se cargan al arrancar. Las librerías de medios, de los
+clientes de Google y de feeds solo deben cargarse al usarse; con
+``--check`` el script termina con error si alguna aparece.
+
+Uso: python -m benchmarks.bench_imports [--repeat 5] [--top 8] [--check]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ["upload_task", "watch_folder", "jobs", "app"]
+
+# Librerías que ningún punto de entrada debe importar al arrancar
+LAZY_LIBRARIES = ["googleapiclient", "oauth2client", "httplib2", "moviepy", "imageio", "imageio_ffmpeg",
+                  "numpy", "feedgen", "yt_dlp", "watchdog"]
+
+# Excepciones por punto de entrada: streamlit y pandas ya cargan numpy
+EXPECTED = {"app": {"numpy"}}
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module):
+    """Devuelve [(nivel, propio µs, acumulado µs, nombre)] de importar ``module``"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, int(own), int(cumulative), name.strip()))
+    return entries
+
+
+def summarize(module, repeat):
+    runs = [import_profile(module) for _ in range(repeat)]
+    totals = [next(cumulative for _, _, cumulative, name in run if name == module) for run in runs]
+    profile = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    direct = sorted(((cumulative, name) for depth, _, cumulative, name in profile if depth == 1), reverse=True)
+    loaded = {name.split(".")[0] for _, _, _, name in profile}
+    return statistics.median(totals), direct, sorted(loaded & set(LAZY_LIBRARIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--check", action="store_true",
+                        help="terminar con error si se importa alguna librería que debería cargarse al usarse")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        total, direct, eager = summarize(module, args.repeat)
+        eager = [name for name in eager if name not in EXPECTED.get(module, ())]
+        print(f"\n{module}: {total / 1000:.0f} ms (mediana de {args.repeat})")
+        for cumulative, name in direct[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        if eager:
+            failed = True
+            print(f"  ⚠️ se importan al arrancar: {', '.join(eager)}")
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
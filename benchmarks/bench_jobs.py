@@ -0,0 +1,75 @@
+"""Lote de tareas pendientes: procesado en secuencia frente al ejecutor por etapas
+
+Cada tarea simula la descarga y la subida con esperas de red y extrae de
+verdad el audio con ffmpeg (recodificando a MP3), que es la etapa de CPU.
+
+Uso: python -m benchmarks.bench_jobs [--tasks 12] [--seconds 20] [--network 0.5]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import nullcontext
+
+from jobs import JOB_DONE, STAGE_DOWNLOAD, STAGE_LIMITS, STAGE_TRANSCODE, STAGE_UPLOAD, JobExecutor, JobQueue
+from media import TRANSCODE_ARGS, ffmpeg_binary
+
+
+def make_source(path, seconds):
+    subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=d={seconds}",
+         "-c:a", "pcm_s16le", path],
+        check=True
+    )
+
+
+def make_handler(source, workdir, network):
+    def handler(task, stage):
+        with stage(STAGE_DOWNLOAD):
+            time.sleep(network)
+        with stage(STAGE_TRANSCODE):
+            subprocess.run(
+                [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+                 *TRANSCODE_ARGS, os.path.join(workdir, f"{task['id']}.mp3")],
+                check=True
+            )
+        with stage(STAGE_UPLOAD):
+            time.sleep(network)
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=12)
+    parser.add_argument("--seconds", type=int, default=20, help="duración del audio de cada tarea")
+    parser.add_argument("--network", type=float, default=0.5, help="espera simulada de descarga y de subida")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "fuente.wav")
+    make_source(source, args.seconds)
+    tasks = [{'id': n, 'title': f"Tarea {n}"} for n in range(args.tasks)]
+    handler = make_handler(source, workdir, args.network)
+
+    started = time.perf_counter()
+    for task in tasks:
+        handler(task, lambda name: nullcontext())
+    sequential = time.perf_counter() - started
+
+    queue = JobQueue(os.path.join(workdir, "podcast.db"))
+    executor = JobExecutor(handler, queue)
+    started = time.perf_counter()
+    executor.submit(tasks)
+    while queue.counts().get(JOB_DONE, 0) < len(tasks):
+        time.sleep(0.05)
+    pooled = time.perf_counter() - started
+    executor.shutdown()
+
+    print(f"{args.tasks} tareas, {os.cpu_count()} núcleos, límites por etapa {STAGE_LIMITS}")
+    print(f"  en secuencia:       {sequential:7.2f} s")
+    print(f"  ejecutor por etapas: {pooled:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
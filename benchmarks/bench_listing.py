@@ -0,0 +1,69 @@
+"""Compara el listado vídeo a vídeo con el listado por lotes
+
+También mide ChannelCatalog.refresh con el catálogo vacío, que es lo que
+hace la app al cargar el canal por primera vez.
+
+Uso: python -m benchmarks.bench_listing [--videos 1000] [--latency 0.005]
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.fake_youtube import FakeYouTubeService
+from metrics import ApiCallCounter
+from youtube_catalog import ChannelCatalog, get_uploads_playlist_id, list_channel_videos, _video_entry
+
+
+def legacy_list(service, counter):
+    """Algoritmo anterior: una llamada a videos().list por cada video"""
+    playlist_id = get_uploads_playlist_id(service, counter)
+    videos = []
+    page_token = None
+    while True:
+        page = counter.execute(service.playlistItems().list(
+            part="snippet", playlistId=playlist_id, maxResults=50, pageToken=page_token
+        ), "playlistItems.list")
+        for item in page['items']:
+            video_id = item['snippet']['resourceId']['videoId']
+            details = counter.execute(service.videos().list(part="snippet,statistics", id=video_id), "videos.list")
+            if details['items']:
+                videos.append(_video_entry(details['items'][0]))
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+    counter.stop()
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="segundos por petición HTTP")
+    args = parser.parse_args()
+
+    runs = [
+        ("vídeo a vídeo", lambda service, counter: legacy_list(service, counter)),
+        ("lotes de 50", lambda service, counter: list_channel_videos(service, counter, pipeline=False)),
+        ("lotes + pipeline", lambda service, counter: list_channel_videos(service, counter)),
+    ]
+    reference = None
+    for name, run in runs:
+        service = FakeYouTubeService(args.videos, args.latency)
+        counter = ApiCallCounter()
+        videos = run(service, counter)
+        if reference is None:
+            reference = videos
+        assert videos == reference, f"{name}: el resultado no coincide"
+        print(f"{name:<18} {len(videos)} videos · {counter.summary()}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        catalog = ChannelCatalog(os.path.join(workdir, "catalogo.db"))
+        service = FakeYouTubeService(args.videos, args.latency)
+        counter = ApiCallCounter()
+        new_ids = catalog.refresh(service, counter, full=True)
+        assert new_ids == [video['id'] for video in reference], "catálogo: el resultado no coincide"
+        print(f"{'catálogo (app)':<18} {len(new_ids)} videos · {counter.summary()}")
+
+
+if __name__ == "__main__":
+    main()
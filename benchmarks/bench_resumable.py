@@ -0,0 +1,86 @@
+"""Subida reanudable contra el servidor local: fallos 503 y caída del proceso
+
+Sube un archivo aleatorio al servidor simulado con un porcentaje de trozos
+que fallan, interrumpe la subida a mitad (como si el contenedor se
+reiniciara) y la reanuda con un gestor nuevo que lee el estado del disco.
+
+Uso: python -m benchmarks.bench_resumable [--mb 64] [--chunk-mb 4] [--fail-rate 0.1]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.fake_google_api import start_server
+from uploads import ResumableUploadManager
+
+MB = 1024 * 1024
+
+
+class ProcessCrash(Exception):
+    """Simula que el proceso muere a mitad de la subida"""
+
+
+class CrashingSession(requests.Session):
+    def __init__(self, crash_after):
+        super().__init__()
+        self.crash_after = crash_after
+        self.chunks = 0
+        self.bytes_sent = 0
+
+    def put(self, url, data=None, **kwargs):
+        if data:
+            if self.crash_after and self.chunks >= self.crash_after:
+                raise ProcessCrash()
+            self.chunks += 1
+            self.bytes_sent += len(data)
+        return super().put(url, data=data, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=64)
+    parser.add_argument("--chunk-mb", type=int, default=4)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server, state, base_url = start_server(fail_rate=args.fail_rate, seed=1)
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "clase.mp4")
+    with open(source, "wb") as f:
+        for _ in range(args.mb):
+            f.write(os.urandom(MB))
+
+    state_file = os.path.join(workdir, "subidas_pendientes.json")
+    init_url = f"{base_url}/upload/youtube/v3/videos?uploadType=resumable&part=snippet,status"
+    metadata = {"snippet": {"title": "Clase de prueba"}}
+    total_chunks = -(-args.mb // args.chunk_mb)
+
+    started = time.perf_counter()
+    first = CrashingSession(crash_after=total_chunks // 2)
+    manager = ResumableUploadManager(state_file, args.chunk_mb * MB, session=first, sleep=lambda s: None)
+    try:
+        manager.upload(source, init_url, metadata)
+        raise SystemExit("❌ La subida debía interrumpirse")
+    except ProcessCrash:
+        pass
+
+    second = CrashingSession(crash_after=0)
+    manager = ResumableUploadManager(state_file, args.chunk_mb * MB, session=second, sleep=lambda s: None)
+    response = manager.upload(source, init_url, metadata)
+    elapsed = time.perf_counter() - started
+
+    with open(source, "rb") as f:
+        assert state.video_data[response["id"]] == f.read(), "el archivo recibido no coincide"
+
+    print(f"✅ {args.mb}MB subidos en {elapsed:.2f}s ({args.mb / elapsed:.1f} MB/s)")
+    print(f"   antes de la caída: {first.bytes_sent / MB:.1f}MB en {first.chunks} trozos")
+    print(f"   tras reanudar:     {second.bytes_sent / MB:.1f}MB en {second.chunks} trozos")
+    print(f"   503 inyectados: {state.failures}, reintentos: {manager.retries}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Pico de memoria al volcar a disco un video subido, según su tamaño
+
+Cada medida se hace en un subproceso: se prepara la fuente del tamaño
+indicado, se reinicia el pico de RSS y se vuelca a disco con el método
+antiguo (leerlo entero y escribirlo) o con spool_to_disk. Fuentes:
+
+- memoria: un BytesIO, como el UploadedFile de Streamlit. CPython evita
+  la copia de getvalue() si nadie más tiene una vista del buffer, así que
+  se mide también con una vista exportada ("memoria+vista").
+- disco: un archivo abierto en modo binario, como el que lee la carpeta
+  Pendientes.
+
+Uso: python -m benchmarks.bench_spool [--sizes 64 256 1024]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+
+from media import spool_to_disk
+
+MB = 1024 * 1024
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak_rss():
+    # Escribir "5" en clear_refs reinicia VmHWM (Linux >= 4.0)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+SOURCES = ("memoria", "memoria+vista", "disco")
+
+
+def _legacy(source):
+    import tempfile
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
+        data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+        tmp_file.write(data)
+        return tmp_file.name
+
+
+def _make_source(kind, size_mb, scratch):
+    block = os.urandom(MB)
+    if kind == "disco":
+        with open(scratch, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+        return open(scratch, "rb")
+    buffer = io.BytesIO()
+    for _ in range(size_mb):
+        buffer.write(block)
+    return buffer
+
+
+def child(kind, method, size_mb):
+    scratch = f"bench_spool_{os.getpid()}.bin"
+    source = _make_source(kind, size_mb, scratch)
+    view = source.getbuffer() if kind == "memoria+vista" else None
+
+    _reset_peak_rss()
+    baseline = _status_kb("VmRSS")
+    started = time.perf_counter()
+    path = _legacy(source) if method == "antiguo" else spool_to_disk(source)
+    elapsed = time.perf_counter() - started
+    extra_mb = (_status_kb("VmHWM") - baseline) / 1024
+
+    if view is not None:
+        view.release()
+    source.close()
+    os.remove(path)
+    if os.path.exists(scratch):
+        os.remove(scratch)
+    print(f"{extra_mb:.1f} {elapsed:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024], help="tamaños en MB")
+    parser.add_argument("--child", nargs=3, metavar=("FUENTE", "METODO", "MB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], int(args.child[2]))
+        return
+
+    print(f"{'fuente':>14} {'tamaño':>8} {'método':>8} {'RSS extra':>10} {'tiempo':>8}")
+    for kind in SOURCES:
+        for size_mb in args.sizes:
+            for method in ("antiguo", "spool"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_spool", "--child", kind, method, str(size_mb)],
+                    capture_output=True, text=True, check=True
+                ).stdout.split()
+                print(f"{kind:>14} {size_mb:>6}MB {method:>8} {float(output[0]):>8.1f}MB {float(output[1]):>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
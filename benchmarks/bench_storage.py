@@ -0,0 +1,78 @@
+"""Tareas programadas: lista en JSON frente a SQLite con índices
+
+Reproduce "Procesar Todas las Tareas Pendientes" con muchas tareas:
+- JSON: filtrar pendientes, tareas.index(tarea) y reescribir el archivo entero por cada una
+- SQLite: pending_tasks() por índice y mark_processed() de una sola fila
+
+Uso: python -m benchmarks.bench_storage [--tasks 20000] [--pending 300]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from storage import PodcastStore
+
+
+def synthetic_tasks(count, pending):
+    now = datetime.now()
+    return [{
+        'video_id': f"video{n:06d}",
+        'title': f"Meditación {n}",
+        'description': "Respira y suelta. " * 20,
+        'youtube_url': f"https://www.youtube.com/watch?v=video{n:06d}",
+        # Las primeras ``pending`` ya vencieron; el resto queda en el futuro
+        'scheduled_date': (now + timedelta(hours=n - pending)).isoformat(),
+        'intervalo_horas': 1,
+        'processed': False,
+        'created_at': now.isoformat(),
+    } for n in range(count)]
+
+
+def run_json(path, tasks):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tasks, f, indent=2, ensure_ascii=False)
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        tareas = json.load(f)
+    pendientes = [t for t in tareas if not t['processed'] and datetime.now() >= datetime.fromisoformat(t['scheduled_date'])]
+    for tarea in pendientes:
+        idx = tareas.index(tarea)
+        with open(path, "r", encoding="utf-8") as f:
+            tareas = json.load(f)
+        tareas[idx]['processed'] = True
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(tareas, f, indent=2, ensure_ascii=False)
+    return time.perf_counter() - started, len(pendientes)
+
+
+def run_sqlite(path, tasks):
+    store = PodcastStore(path)
+    store.add_tasks(tasks)
+    started = time.perf_counter()
+    pendientes = store.pending_tasks()
+    for tarea in pendientes:
+        store.mark_processed(tarea['id'])
+    return time.perf_counter() - started, len(pendientes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--pending", type=int, default=300)
+    args = parser.parse_args()
+
+    tasks = synthetic_tasks(args.tasks, args.pending)
+    workdir = tempfile.mkdtemp()
+    elapsed_json, done_json = run_json(os.path.join(workdir, "tareas_automaticas.json"), tasks)
+    elapsed_sqlite, done_sqlite = run_sqlite(os.path.join(workdir, "podcast.db"), tasks)
+
+    print(f"{args.tasks} tareas, {done_json}/{done_sqlite} pendientes procesadas")
+    print(f"  JSON (index + reescritura): {elapsed_json:8.2f} s")
+    print(f"  SQLite (índices, 1 fila):   {elapsed_sqlite:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
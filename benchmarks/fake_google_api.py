@@ -0,0 +1,501 @@
+"""Servidor local que imita los endpoints de YouTube y Drive que usa la app
+
+Uso: python -m benchmarks.fake_google_api [--port 8765] [--fail-rate 0.1]
+         [--latency 0.05] [--bandwidth 20] [--rate-limit-rate 0.02] [--channel-videos 500]
+
+Con GOOGLE_UPLOAD_BASE_URL=http://127.0.0.1:8765/upload la app sube aquí
+en lugar de a YouTube/Drive, y con GOOGLE_API_BASE_URL=http://127.0.0.1:8765
+descarga de aquí los archivos de Drive (admite cabeceras Range) y los
+clientes de la API (channels, playlistItems, videos, files, permissions)
+hablan con este servidor. Las peticiones por lotes (``/batch/...``) se
+reparten entre las mismas rutas.
+
+Simula latencia fija por petición, ancho de banda por conexión (subidas y
+descargas), errores 503 en trozos y descargas y respuestas 403
+``rateLimitExceeded`` en las llamadas a la API.
+"""
+import argparse
+import email
+import hashlib
+import http.client
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+UPLOADS_PLAYLIST_ID = "UUfake"
+PAGE_SIZE_MAX = 50
+PUBLIC_PERMISSION_ID = "anyoneWithLink"
+BATCH_PART_HEADER = "X-Fake-Batch-Part"
+
+
+class FakeGoogleState:
+    """Sesiones de subida, archivos de Drive y videos del canal simulados"""
+
+    def __init__(self, fail_rate=0.0, seed=None, bandwidth=None, latency=0.0, rate_limit_rate=0.0):
+        self.lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.rate_limit_rate = rate_limit_rate
+        # Segundos de espera antes de responder cada petición
+        self.latency = latency
+        # Bytes por segundo de cada conexión, como el límite por flujo de Drive
+        self.bandwidth = bandwidth
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # Descargas de contenido que se sirven antes de responder 404 (None sin límite),
+        # para cortar una descarga a medias
+        self.media_limit = None
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.files = {}
+        # Videos del canal, del más reciente al más antiguo, y lo recibido de cada uno
+        self.videos = []
+        self.video_data = {}
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.calls = Counter()
+
+    def add_file(self, data, name="archivo", file_id=None):
+        """Registra un archivo descargable y devuelve su ID"""
+        file_id = file_id or uuid.uuid4().hex[:12]
+        with self.lock:
+            self.files[file_id] = {"metadata": {"name": name}, "data": data}
+        return file_id
+
+    def add_video(self, title, description="", video_id=None, published_at=None):
+        """Publica un video en el canal (al principio de la playlist de subidas)"""
+        video_id = video_id or uuid.uuid4().hex[:11]
+        published_at = published_at or datetime.now(timezone.utc)
+        with self.lock:
+            self.videos.insert(0, {
+                "id": video_id,
+                "etag": uuid.uuid4().hex,
+                "snippet": {"title": title, "description": description,
+                            "publishedAt": published_at.strftime("%Y-%m-%dT%H:%M:%SZ")},
+                "statistics": {"viewCount": str(self.random.randint(0, 10000))},
+            })
+        return video_id
+
+    def add_channel_videos(self, count):
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        for n in range(count):
+            self.add_video(f"Clase de yoga {n}", "Respira y suelta.", published_at=start + timedelta(days=n))
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            if self.fail_rate and self.random.random() < self.fail_rate:
+                self.failures += 1
+                return True
+            return False
+
+    def should_rate_limit(self):
+        with self.lock:
+            if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+                self.rate_limited += 1
+                return True
+            return False
+
+    def summary(self):
+        with self.lock:
+            calls = ", ".join(f"{name} {count}" for name, count in self.calls.most_common())
+            return (f"{sum(self.calls.values())} peticiones ({calls}); {self.failures} errores 503, "
+                    f"{self.rate_limited} rateLimitExceeded; "
+                    f"{self.bytes_received / 1024 / 1024:.1f} MB recibidos, "
+                    f"{self.bytes_sent / 1024 / 1024:.1f} MB enviados")
+
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _throttle(self, size):
+        if self.state.bandwidth:
+            time.sleep(size / self.state.bandwidth)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        with self.state.lock:
+            self.state.bytes_received += len(body)
+        self._throttle(len(body))
+        return body
+
+    def _query(self):
+        return {key: values[-1] for key, values in parse_qs(urlsplit(self.path).query).items()}
+
+    def _reply(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self, call):
+        """Cuenta la llamada, espera la latencia y decide si responde rateLimitExceeded"""
+        with self.state.lock:
+            self.state.calls[call] += 1
+        # Las partes de un lote comparten el viaje (y la latencia) del lote
+        if self.state.latency and not self.headers.get(BATCH_PART_HEADER):
+            time.sleep(self.state.latency)
+        if call.endswith((".chunk", ".media")) or not self.state.should_rate_limit():
+            return True
+        self._body()
+        self._reply(403, {"error": {"code": 403, "message": "Rate Limit Exceeded",
+                                    "errors": [{"reason": "rateLimitExceeded", "domain": "usageLimits"}]}})
+        return False
+
+    # ------------------------------------------------------------------
+    # Subidas reanudables
+    # ------------------------------------------------------------------
+
+    def _initiate(self, kind, file_id=None):
+        metadata = json.loads(self._body() or b"{}")
+        session_id = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.sessions[session_id] = {
+                "kind": kind,
+                "metadata": metadata,
+                "file_id": file_id,
+                "size": int(self.headers.get("X-Upload-Content-Length", 0)),
+                "data": bytearray(),
+            }
+        host = self.headers.get("Host")
+        self._reply(200, headers={"Location": f"http://{host}/upload/session/{session_id}"})
+
+    def _put_chunk(self, session_id):
+        body = self._body()
+        session = self.state.sessions.get(session_id)
+        if session is None:
+            self._reply(404, {"error": {"code": 404, "message": "Sesión no encontrada"}})
+            return
+        if self.state.should_fail():
+            self._reply(503, {"error": {"code": 503, "message": "Backend Error"}})
+            return
+
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+)", self.headers.get("Content-Range", ""))
+        if match:
+            start = int(match.group(1))
+            with self.state.lock:
+                # Solo se acepta el siguiente byte esperado, como hace Google
+                if start == len(session["data"]):
+                    session["data"].extend(body)
+
+        received = len(session["data"])
+        if received < session["size"]:
+            headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+            self._reply(308, headers=headers)
+            return
+
+        if session["kind"] == "youtube":
+            snippet = session["metadata"].get("snippet", {})
+            video_id = self.state.add_video(snippet.get("title", ""), snippet.get("description", ""))
+            with self.state.lock:
+                self.state.video_data[video_id] = bytes(session["data"])
+            self._reply(200, {"id": video_id, "kind": "youtube#video"})
+            return
+
+        file_id = session["file_id"] or uuid.uuid4().hex[:12]
+        with self.state.lock:
+            metadata = {**self.state.files.get(file_id, {}).get("metadata", {}), **session["metadata"]}
+            self.state.files[file_id] = {"metadata": metadata, "data": bytes(session["data"])}
+        self._reply(200, {"id": file_id, "kind": "drive#file"})
+
+    # ------------------------------------------------------------------
+    # Drive
+    # ------------------------------------------------------------------
+
+    def _get_file(self, file_id):
+        stored = self.state.files.get(file_id)
+        if stored is None:
+            self._reply(404, {"error": {"code": 404, "message": "Archivo no encontrado"}})
+            return
+        data = stored["data"]
+        query = urlsplit(self.path).query
+        if "alt=media" not in query:
+            self._reply(200, {**self._file_resource(file_id, stored),
+                              "size": str(len(data)), "md5Checksum": hashlib.md5(data).hexdigest()})
+            return
+        if self.state.should_fail():
+            self._reply(503, {"error": {"code": 503, "message": "Backend Error"}})
+            return
+        with self.state.lock:
+            cut = self.state.media_limit is not None and self.state.media_limit <= 0
+            if self.state.media_limit:
+                self.state.media_limit -= 1
+        if cut:
+            self._reply(404, {"error": {"code": 404, "message": "Descarga cortada"}})
+            return
+
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        status, start, end = 200, 0, len(data) - 1
+        if match:
+            status = 206
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        view = memoryview(data)
+        block_size = 256 * 1024
+        for offset in range(start, end + 1, block_size):
+            block = view[offset:min(offset + block_size, end + 1)]
+            self.wfile.write(block)
+            with self.state.lock:
+                self.state.bytes_sent += len(block)
+            self._throttle(len(block))
+
+    def _file_resource(self, file_id, stored):
+        metadata = stored["metadata"]
+        return {"id": file_id, "name": metadata.get("name", file_id), "mimeType": metadata.get("mimeType"),
+                "parents": metadata.get("parents", []), "permissionIds": metadata.get("permissionIds", [])}
+
+    def _list_files(self):
+        """files.list: solo entiende los filtros name='...', mimeType='...' y '...' in parents"""
+        query = self._query()
+        q = query.get("q", "")
+        filters = dict(re.findall(r"(name|mimeType)\s*=\s*'([^']*)'", q))
+        parents = re.findall(r"'([^']*)'\s+in\s+parents", q)
+        size = int(query.get("pageSize", 100))
+        start = int(query.get("pageToken") or 0)
+        with self.state.lock:
+            found = [
+                self._file_resource(file_id, stored)
+                for file_id, stored in self.state.files.items()
+                if all(stored["metadata"].get(key) == value for key, value in filters.items())
+                and all(parent in stored["metadata"].get("parents", []) for parent in parents)
+            ]
+        page = {"files": found[start:start + size]}
+        if start + size < len(found):
+            page["nextPageToken"] = str(start + size)
+        self._reply(200, page)
+
+    def _create_file(self):
+        """files.create sin contenido (p. ej. una carpeta)"""
+        metadata = json.loads(self._body() or b"{}")
+        file_id = uuid.uuid4().hex[:12]
+        with self.state.lock:
+            self.state.files[file_id] = {"metadata": metadata, "data": b""}
+        self._reply(200, {"id": file_id})
+
+    def _update_file(self, file_id):
+        """files.update sin contenido: nombre y carpetas (addParents/removeParents)"""
+        changes = json.loads(self._body() or b"{}")
+        query = self._query()
+        with self.state.lock:
+            stored = self.state.files.get(file_id)
+            if stored is not None:
+                metadata = stored["metadata"]
+                metadata.update(changes)
+                parents = [parent for parent in metadata.get("parents", [])
+                           if parent not in query.get("removeParents", "").split(",")]
+                parents += [parent for parent in query.get("addParents", "").split(",")
+                            if parent and parent not in parents]
+                metadata["parents"] = parents
+                resource = self._file_resource(file_id, stored)
+        if stored is None:
+            self._reply(404, {"error": {"code": 404, "message": "Archivo no encontrado"}})
+            return
+        self._reply(200, resource)
+
+    def _create_permission(self, file_id):
+        permission = json.loads(self._body() or b"{}")
+        with self.state.lock:
+            stored = self.state.files.get(file_id)
+            if stored is not None and permission.get("type") == "anyone":
+                ids = stored["metadata"].setdefault("permissionIds", [])
+                if PUBLIC_PERMISSION_ID not in ids:
+                    ids.append(PUBLIC_PERMISSION_ID)
+        if stored is None:
+            self._reply(404, {"error": {"code": 404, "message": "Archivo no encontrado"}})
+            return
+        self._reply(200, {"id": PUBLIC_PERMISSION_ID, "type": "anyone", "role": "reader"})
+
+    # ------------------------------------------------------------------
+    # Lotes
+    # ------------------------------------------------------------------
+
+    def _batch(self):
+        """Reenvía cada parte del lote a este mismo servidor y junta las respuestas"""
+        body = self._body().decode("utf-8")
+        message = email.message_from_string(f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n{body}")
+        boundary = uuid.uuid4().hex
+        parts = []
+        connection = http.client.HTTPConnection(*self.server.server_address[:2], timeout=60)
+        try:
+            for part in message.get_payload():
+                request_line, raw = part.get_payload().split("\n", 1)
+                method, target, _ = request_line.strip().split(" ", 2)
+                inner = email.message_from_string(raw)
+                payload = inner.get_payload() or ""
+                headers = {name: value for name, value in inner.items()
+                           if name.lower() not in ("host", "mime-version", "content-length")}
+                connection.request(method, target, body=payload.encode("utf-8") or None,
+                                   headers={**headers, BATCH_PART_HEADER: "1"})
+                response = connection.getresponse()
+                content = response.read().decode("utf-8")
+                content_id = part["Content-ID"].strip()[1:-1]
+                parts.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {response.status} {response.reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(content.encode('utf-8'))}\r\n\r\n{content}\r\n"
+                )
+        finally:
+            connection.close()
+        reply = ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    # ------------------------------------------------------------------
+    # YouTube
+    # ------------------------------------------------------------------
+
+    def _channels(self):
+        self._reply(200, {"items": [{"contentDetails": {"relatedPlaylists": {"uploads": UPLOADS_PLAYLIST_ID}}}]})
+
+    def _playlist_items(self):
+        query = self._query()
+        size = min(int(query.get("maxResults", 5)), PAGE_SIZE_MAX)
+        start = int(query.get("pageToken") or 0)
+        with self.state.lock:
+            page = self.state.videos[start:start + size]
+            more = start + size < len(self.state.videos)
+        etag = hashlib.md5("".join(video["id"] for video in page).encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304)
+            return
+        self._reply(200, {
+            "etag": etag,
+            "items": [{"snippet": {"resourceId": {"videoId": video["id"]}}} for video in page],
+            **({"nextPageToken": str(start + size)} if more else {}),
+        })
+
+    def _videos(self):
+        ids = set(self._query().get("id", "").split(","))
+        with self.state.lock:
+            items = [video for video in self.state.videos if video["id"] in ids]
+        self._reply(200, {"items": items})
+
+    # ------------------------------------------------------------------
+    # Rutas
+    # ------------------------------------------------------------------
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+        if match:
+            media = "alt=media" in urlsplit(self.path).query
+            if self._begin("drive.files.get" + (".media" if media else "")):
+                self._get_file(match.group(1))
+            return
+        routes = {
+            "/drive/v3/files": ("drive.files.list", self._list_files),
+            "/youtube/v3/channels": ("channels.list", self._channels),
+            "/youtube/v3/playlistItems": ("playlistItems.list", self._playlist_items),
+            "/youtube/v3/videos": ("videos.list", self._videos),
+        }
+        if path in routes:
+            call, handler = routes[path]
+            if self._begin(call):
+                handler()
+        else:
+            self._reply(404, {"error": {"code": 404, "message": self.path}})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == "/upload/youtube/v3/videos":
+            if self._begin("videos.insert"):
+                self._initiate("youtube")
+        elif path == "/upload/drive/v3/files":
+            if self._begin("drive.files.create"):
+                self._initiate("drive")
+        elif path == "/drive/v3/files":
+            if self._begin("drive.files.create"):
+                self._create_file()
+        elif re.fullmatch(r"/drive/v3/files/([^/]+)/permissions", path):
+            if self._begin("drive.permissions.create"):
+                self._create_permission(path.split("/")[4])
+        elif path == "/batch" or path.startswith("/batch/"):
+            # YouTube envía sus lotes a /batch y Drive a /batch/drive/v3
+            if self._begin("batch"):
+                self._batch()
+        else:
+            self._reply(404, {"error": {"code": 404, "message": path}})
+
+    def do_PATCH(self):
+        path = urlsplit(self.path).path
+        upload = re.fullmatch(r"/upload/drive/v3/files/([^/]+)", path)
+        metadata = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+        if upload:
+            if self._begin("drive.files.update"):
+                self._initiate("drive", file_id=upload.group(1))
+        elif metadata:
+            if self._begin("drive.files.update"):
+                self._update_file(metadata.group(1))
+        else:
+            self._reply(404, {"error": {"code": 404, "message": self.path}})
+
+    def do_PUT(self):
+        match = re.fullmatch(r"/upload/session/([0-9a-f]+)", urlsplit(self.path).path)
+        if match:
+            self._begin("upload.chunk")
+            self._put_chunk(match.group(1))
+        else:
+            self._reply(404, {"error": {"code": 404, "message": self.path}})
+
+
+def start_server(port=0, fail_rate=0.0, seed=None, bandwidth=None, latency=0.0, rate_limit_rate=0.0):
+    """Arranca el servidor en un hilo y devuelve (servidor, estado, url_base)"""
+    state = FakeGoogleState(fail_rate, seed, bandwidth, latency, rate_limit_rate)
+    handler = type("Handler", (FakeGoogleHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fracción de trozos que responden 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fracción de llamadas a la API que responden 403 rateLimitExceeded")
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos de espera por petición")
+    parser.add_argument("--bandwidth", type=float, default=None, help="MB/s por conexión")
+    parser.add_argument("--channel-videos", type=int, default=0, help="videos iniciales del canal")
+    args = parser.parse_args()
+    server, state, base_url = start_server(
+        args.port, args.fail_rate, bandwidth=args.bandwidth and args.bandwidth * 1024 * 1024,
+        latency=args.latency, rate_limit_rate=args.rate_limit_rate
+    )
+    state.add_channel_videos(args.channel_videos)
+    print(f"🧪 Servidor de pruebas en {base_url} (Ctrl+C para parar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(state.summary())
+
+
+if __name__ == "__main__":
+    main()
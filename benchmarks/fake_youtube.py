@@ -0,0 +1,101 @@
+"""Servicio de YouTube simulado en memoria para los benchmarks"""
+import time
+
+
+class FakeRequest:
+    def __init__(self, service, method, handler, kwargs):
+        self.service = service
+        self.method = method
+        self.handler = handler
+        self.kwargs = kwargs
+        self.headers = {}
+
+    def run(self):
+        return self.handler(**self.kwargs)
+
+    def execute(self, http=None, num_retries=0):
+        self.service.round_trip()
+        return self.run()
+
+
+class FakeBatch:
+    def __init__(self, service):
+        self.service = service
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request, callback, request_id))
+
+    def execute(self, http=None):
+        self.service.round_trip()
+        for request, callback, request_id in self.requests:
+            callback(request_id, request.run(), None)
+
+
+class _Collection:
+    def __init__(self, service, handlers):
+        self._service = service
+        self._handlers = handlers
+
+    def __getattr__(self, method):
+        handler = self._handlers[method]
+        return lambda **kwargs: FakeRequest(self._service, method, handler, kwargs)
+
+
+class FakeYouTubeService:
+    """Canal simulado con ``video_count`` videos y latencia fija por petición"""
+
+    def __init__(self, video_count=1000, latency=0.005):
+        self.latency = latency
+        self.http_requests = 0
+        self.catalog = {
+            f"vid{n:05d}": {
+                'id': f"vid{n:05d}",
+                'etag': f"etag-{n}",
+                'snippet': {
+                    'title': f"Clase de yoga {n}",
+                    'description': f"Descripción de la clase {n}",
+                    'publishedAt': f"2024-01-01T00:{n % 60:02d}:00Z",
+                },
+                'statistics': {'viewCount': str(n * 3)},
+            }
+            for n in range(video_count, 0, -1)
+        }
+        self.playlist = list(self.catalog)
+
+    def round_trip(self):
+        self.http_requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self)
+
+    def channels(self):
+        return _Collection(self, {'list': self._channels_list})
+
+    def playlistItems(self):
+        return _Collection(self, {'list': self._playlist_items_list})
+
+    def videos(self):
+        return _Collection(self, {'list': self._videos_list})
+
+    def _channels_list(self, part, mine):
+        return {'items': [{
+            'id': 'UCfake',
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UUfake'}},
+        }]}
+
+    def _playlist_items_list(self, part, playlistId, maxResults=5, pageToken=None):
+        start = int(pageToken or 0)
+        ids = self.playlist[start:start + maxResults]
+        response = {
+            'etag': f"page-{start}-{len(self.playlist)}",
+            'items': [{'snippet': {'resourceId': {'videoId': video_id}}} for video_id in ids],
+        }
+        if start + maxResults < len(self.playlist):
+            response['nextPageToken'] = str(start + maxResults)
+        return response
+
+    def _videos_list(self, part, id, maxResults=5):
+        return {'items': [self.catalog[video_id] for video_id in id.split(",") if video_id in self.catalog]}
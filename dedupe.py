@@ -0,0 +1,135 @@
+"""Índice por contenido: archivo de origen → audio extraído → archivo de Drive
+
+Si se vuelve a publicar la misma grabación no se extrae ni se sube otra
+vez: el hash del origen lleva a los metadatos del audio ya extraído y el
+hash del audio al archivo de Drive que ya lo contiene. Cada archivo de
+Drive recuerda si ya se hizo público: los que se suben sin compartir (para
+compartirlos después en lote) quedan pendientes hasta ``mark_shared``.
+"""
+import json
+import sqlite3
+import time
+from contextlib import closing
+
+from media import extract_audio, file_sha256, probe_audio_metadata
+from metrics import CacheStats
+from storage import STORE_DB
+
+
+def source_key(path):
+    """Clave de un archivo local de origen"""
+    return f"sha256:{file_sha256(path)}"
+
+
+def drive_source_key(md5_checksum):
+    """Clave de un origen en Drive a partir del md5Checksum que ya calcula Drive"""
+    return f"md5:{md5_checksum}"
+
+
+class ContentIndex:
+    """Tablas del índice por contenido en la base de datos del podcast"""
+
+    def __init__(self, path=STORE_DB):
+        self.path = path
+        self.stats = CacheStats()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    source_key TEXT PRIMARY KEY,
+                    audio_sha256 TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS drive_files (
+                    audio_sha256 TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    shared INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(drive_files)")}
+            if "shared" not in columns:
+                # De las filas anteriores no se sabe si se compartieron: se
+                # vuelven a compartir una vez (crear el permiso es idempotente)
+                conn.execute("ALTER TABLE drive_files ADD COLUMN shared INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def audio_for(self, key):
+        """Metadatos del audio extraído de ``key``, o None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT metadata FROM sources WHERE source_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remember_audio(self, key, metadata):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source_key, audio_sha256, metadata, created_at) VALUES (?, ?, ?, ?)",
+                (key, metadata['audio_sha256'], json.dumps(metadata), time.time())
+            )
+
+    def drive_file(self, audio_sha256):
+        """(URL, ID) del archivo de Drive con ese audio, o None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT url, file_id FROM drive_files WHERE audio_sha256 = ?", (audio_sha256,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def remember_drive_file(self, audio_sha256, url, file_id, shared=True):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO drive_files (audio_sha256, file_id, url, created_at, shared) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (audio_sha256, file_id, url, time.time(), int(shared))
+            )
+
+    def unshared_file_ids(self):
+        """IDs de Drive de los audios registrados que aún no se han hecho públicos"""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT file_id FROM drive_files WHERE NOT shared")]
+
+    def mark_shared(self, file_ids):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE drive_files SET shared = 1 WHERE file_id = ?",
+                             [(file_id,) for file_id in file_ids])
+
+    def published_audio(self, key):
+        """Audio ya extraído y subido a Drive para ``key``, listo para el episodio, o None"""
+        metadata = self.audio_for(key)
+        drive = self.drive_file(metadata['audio_sha256']) if metadata else None
+        if drive is None:
+            self.stats.miss("publicado")
+            return None
+        self.stats.hit("publicado")
+        url, file_id = drive
+        return {**metadata, 'path': None, 'url': url, 'file_id': file_id}
+
+    def extract(self, video_path, output_path, key):
+        """Extrae el audio y lo registra para ``key``; devuelve {'path', **metadatos}"""
+        audio_path = extract_audio(video_path, output_path)
+        metadata = probe_audio_metadata(audio_path)
+        self.remember_audio(key, metadata)
+        return {**metadata, 'path': audio_path}
+
+    def upload(self, audio, upload_file, shared=True):
+        """Sube el audio salvo que Drive ya tenga ese contenido; devuelve (URL, ID)
+
+        Con ``shared`` en False, ``upload_file`` no comparte el archivo y
+        queda en ``unshared_file_ids`` hasta que se llame a ``mark_shared``.
+        """
+        existing = self.drive_file(audio['audio_sha256'])
+        if existing:
+            self.stats.hit("drive")
+            return existing
+        self.stats.miss("drive")
+        url, file_id = upload_file(audio['path'])
+        if url:
+            self.remember_drive_file(audio['audio_sha256'], url, file_id, shared)
+        return url, file_id
+
@@ -0,0 +1,235 @@
+"""Descargas de Drive por rangos en paralelo, reanudables y verificadas con MD5"""
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_pool import SESSION
+from quota import QUOTA
+from tracing import record_retry
+from uploads import MAX_BACKOFF, MAX_RETRIES, RETRY_STATUS_CODES
+
+# Se puede apuntar a un servidor local de pruebas (benchmarks/fake_google_api.py)
+API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "https://www.googleapis.com")
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_MB", "16")) * 1024 * 1024
+DEFAULT_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+
+# Bloque en el que se lee cada respuesta: acota la memoria por hilo
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Carpeta de las descargas de Drive: una ruta fija por archivo para poder reanudarlas
+DOWNLOAD_DIR = "descargas"
+
+
+class DownloadError(Exception):
+    """La descarga no se pudo completar o no coincide con Drive"""
+
+
+def drive_file_url(file_id, fields="name,size,md5Checksum"):
+    return f"{API_BASE_URL}/drive/v3/files/{file_id}?fields={fields}"
+
+
+def drive_media_url(file_id):
+    return f"{API_BASE_URL}/drive/v3/files/{file_id}?alt=media"
+
+
+def drive_download_path(file_id, extension=".mp4"):
+    """Ruta fija de la descarga de ``file_id``: otra ejecución reanuda su ``.part``"""
+    return os.path.join(DOWNLOAD_DIR, f"drive_{file_id}{extension}")
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    buffer = bytearray(STREAM_BLOCK_SIZE)
+    with open(path, "rb", buffering=0) as f, memoryview(buffer) as view:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+class RangeDownloadManager:
+    """Descarga archivos de Drive a disco con peticiones Range en paralelo
+
+    El archivo se reparte en trozos de ``chunk_size`` que ``workers`` hilos
+    piden a la vez sobre un pool de conexiones compartido. Cada respuesta se
+    escribe en su posición del archivo ``.part`` por bloques, así que la
+    memoria no depende del tamaño del video. Los trozos terminados se
+    apuntan en ``<destino>.part.json``: si el proceso muere, la siguiente
+    llamada solo pide los que faltan. Al final se compara el MD5 con el
+    ``md5Checksum`` de Drive.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                 max_retries=MAX_RETRIES, session=None, sleep=time.sleep):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_retries = max_retries
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.sleep = sleep
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        if attempt > self.max_retries:
+            raise DownloadError(f"Demasiados reintentos ({self.max_retries})")
+        with self._lock:
+            self.retries += 1
+        record_retry()
+        self.sleep(min(2 ** attempt, MAX_BACKOFF) + random.random())
+
+    def _get(self, url, headers, stream=False):
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, headers=headers, stream=stream, timeout=60)
+            except requests.RequestException:
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                response.close()
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code not in (200, 206):
+                raise DownloadError(f"Error en la descarga ({response.status_code}): {response.text[:200]}")
+            return response
+
+    def metadata(self, file_id, auth_headers=None):
+        """Devuelve {'name', 'size', 'md5Checksum'} del archivo de Drive"""
+        headers = auth_headers() if auth_headers else {}
+        return QUOTA.run(lambda: self._get(drive_file_url(file_id), headers).json(), "drive.files.get")
+
+    def _read_state(self, state_path, file_id, size, md5):
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (state.get("file_id"), state.get("size"), state.get("md5")) != (file_id, size, md5):
+            return set()
+        return set(state.get("done", []))
+
+    def _write_state(self, state_path, file_id, size, md5, done):
+        tmp_path = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file_id": file_id, "size": size, "md5": md5, "done": sorted(done)}, f)
+        os.replace(tmp_path, state_path)
+
+    def _fetch_chunk(self, url, fd, start, end, auth_headers):
+        """Descarga bytes [start, end] y los escribe en su sitio; reintenta si se corta
+
+        Cada respuesta incompleta cuenta como un intento, con la misma espera
+        exponencial y el mismo límite ``max_retries`` que los errores.
+        """
+        attempt = 0
+        offset = start
+        while offset <= end:
+            headers = {"Range": f"bytes={offset}-{end}", **(auth_headers() if auth_headers else {})}
+            response = QUOTA.run(lambda: self._get(url, headers, stream=True), "drive.files.get")
+            if response.status_code == 200 and offset:
+                # El servidor ignoró el Range: no se puede escribir en su sitio
+                response.close()
+                raise DownloadError("El servidor no admite descargas por rangos")
+            try:
+                for block in response.iter_content(STREAM_BLOCK_SIZE):
+                    block = block[:end + 1 - offset]
+                    os.pwrite(fd, block, offset)
+                    offset += len(block)
+                    if offset > end:
+                        break
+            except requests.RequestException:
+                pass
+            finally:
+                response.close()
+            if offset <= end:
+                # Respuesta cortada, con error o sin él: cuenta como un reintento
+                attempt += 1
+                self._backoff(attempt)
+
+    def download(self, file_id, destination, auth_headers=None, progress=None):
+        """Descarga el archivo ``file_id`` de Drive en ``destination`` y devuelve la ruta
+
+        Si ``destination`` ya está completo (mismo MD5) no se vuelve a pedir.
+        El ``.part`` y su estado solo se borran cuando el MD5 coincide (o si
+        no coincide, para empezar de cero).
+        """
+        info = self.metadata(file_id, auth_headers)
+        size = int(info["size"])
+        md5 = info.get("md5Checksum")
+        if (os.path.exists(destination) and os.path.getsize(destination) == size
+                and (not md5 or file_md5(destination) == md5)):
+            if progress:
+                progress(1.0)
+            return destination
+        if os.path.dirname(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+        part_path = f"{destination}.part"
+        state_path = f"{part_path}.json"
+
+        done = self._read_state(state_path, file_id, size, md5) if os.path.exists(part_path) else set()
+        chunks = [(index, start, min(start + self.chunk_size, size) - 1)
+                  for index, start in enumerate(range(0, size, self.chunk_size))]
+        pending = [chunk for chunk in chunks if chunk[0] not in done]
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT)
+        try:
+            os.ftruncate(fd, size)
+            url = drive_media_url(file_id)
+
+            def _run(chunk):
+                index, start, end = chunk
+                self._fetch_chunk(url, fd, start, end, auth_headers)
+                with self._lock:
+                    done.add(index)
+                    self._write_state(state_path, file_id, size, md5, done)
+                    if progress and chunks:
+                        progress(len(done) / len(chunks))
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="descarga") as pool:
+                # Cada hilo con una copia del contexto: los reintentos cuentan en el span activo
+                futures = [pool.submit(contextvars.copy_context().run, _run, chunk) for chunk in pending]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    # Si un trozo falla no se siguen pidiendo los demás
+                    for future in futures:
+                        future.cancel()
+                    raise
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if md5 and file_md5(part_path) != md5:
+            os.remove(part_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise DownloadError(f"El MD5 de {file_id} no coincide con el de Drive")
+
+        os.replace(part_path, destination)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        if progress:
+            progress(1.0)
+        return destination
+
+
+# Comparte el pool de conexiones con los clientes de la API
+DOWNLOADS = RangeDownloadManager(session=SESSION)
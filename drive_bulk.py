@@ -0,0 +1,182 @@
+"""Operaciones de Drive en lote: permisos, metadatos y carpetas de muchos archivos
+
+Hacer público, renombrar o mover un archivo son peticiones pequeñas;
+``DriveBatch`` las agrupa en peticiones por lotes de Drive
+(``BatchHttpRequest``) de hasta 100, que cuestan un solo viaje HTTP. Los
+errores se tratan por operación: las que fallan por límite de ritmo o por
+un error del servidor se reintentan en un lote nuevo con espera
+exponencial, y las demás quedan en ``BatchResult.errors`` con su clave.
+"""
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from quota import QUOTA, error_reason
+from tracing import record_retry
+from uploads import MAX_BACKOFF, MAX_RETRIES, RETRY_STATUS_CODES
+
+# Límite de la API de Drive de peticiones por lote
+DRIVE_BATCH_SIZE = 100
+
+PUBLIC_PERMISSION = {"role": "reader", "type": "anyone"}
+# ID que Drive da al permiso de "cualquiera con el enlace"
+PUBLIC_PERMISSION_ID = "anyoneWithLink"
+
+FILE_FIELDS = "id, name, parents, permissionIds"
+
+
+def file_id_from_url(url):
+    """ID de Drive de una URL de descarga pública, o None si no es de Drive"""
+    if not url or "drive.google.com" not in url:
+        return None
+    return parse_qs(urlsplit(url).query).get("id", [None])[0]
+
+
+def is_public(file):
+    return PUBLIC_PERMISSION_ID in file.get("permissionIds", [])
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _retryable(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return status in RETRY_STATUS_CODES or error_reason(error) == "rate"
+
+
+class BatchResult:
+    """Respuestas y errores de un lote, por la clave de cada operación"""
+
+    def __init__(self):
+        self.responses = {}
+        self.errors = {}
+        self.batches = 0
+        self.retries = 0
+
+    def summary(self):
+        return (f"{len(self.responses)} correctas, {len(self.errors)} con error en {self.batches} "
+                f"peticiones por lotes, {self.retries} reintentos")
+
+
+class DriveBatch:
+    """Acumula operaciones de Drive y las envía en lotes de ``batch_size``"""
+
+    def __init__(self, service, batch_size=DRIVE_BATCH_SIZE, max_retries=MAX_RETRIES, scheduler=QUOTA,
+                 sleep=time.sleep):
+        self.service = service
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+        self.sleep = sleep
+        self._pending = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, request, method):
+        """Añade la petición ``request`` (del método ``method``) con la clave ``key``"""
+        self._pending.append((key, request, method))
+
+    def _execute_group(self, group, result):
+        """Envía un lote y devuelve las operaciones que hay que reintentar"""
+        from googleapiclient.errors import HttpError
+
+        retry = []
+
+        def _callback(request_id, response, exception):
+            operation = group[int(request_id)]
+            key = operation[0]
+            if exception is None:
+                result.responses[key] = response
+                result.errors.pop(key, None)
+            else:
+                result.errors[key] = exception
+                if _retryable(exception):
+                    retry.append(operation)
+
+        batch = self.service.new_batch_http_request(callback=_callback)
+        for number, (_, request, _) in enumerate(group):
+            batch.add(request, request_id=str(number))
+        result.batches += 1
+        try:
+            self.scheduler.run(batch.execute, *(method for _, _, method in group))
+        except HttpError as e:
+            # El lote entero falló antes de repartir las respuestas
+            if not _retryable(e):
+                raise
+            for key, _, _ in group:
+                result.errors[key] = e
+            return list(group)
+        return retry
+
+    def execute(self):
+        """Envía todas las operaciones pendientes y devuelve un BatchResult"""
+        pending, self._pending = self._pending, []
+        result = BatchResult()
+        attempt = 0
+        while pending:
+            retry = []
+            for group in _chunks(pending, self.batch_size):
+                retry.extend(self._execute_group(group, result))
+            if not retry or attempt >= self.max_retries:
+                break
+            attempt += 1
+            result.retries += len(retry)
+            record_retry(len(retry))
+            self.sleep(min(2 ** attempt, MAX_BACKOFF) + random.random())
+            pending = retry
+        return result
+
+
+def list_folder(service, folder_id, fields=FILE_FIELDS):
+    """Archivos de la carpeta ``folder_id`` (no los de la papelera), a 1000 por página"""
+    files, page_token = [], None
+    while True:
+        page = QUOTA.execute(service.files().list(
+            q=f"'{folder_id}' in parents and trashed=false",
+            spaces='drive',
+            pageSize=1000,
+            pageToken=page_token,
+            fields=f"nextPageToken, files({fields})"
+        ), "drive.files.list")
+        files.extend(page.get('files', []))
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return files
+
+
+def get_files(service, file_ids, fields=FILE_FIELDS):
+    """Metadatos de varios archivos en lotes; devuelve un BatchResult por ID"""
+    batch = DriveBatch(service)
+    for file_id in file_ids:
+        batch.add(file_id, service.files().get(fileId=file_id, fields=fields), "drive.files.get")
+    return batch.execute()
+
+
+def share_publicly(service, file_ids):
+    """Hace públicos (cualquiera con el enlace puede leer) los archivos, en lotes"""
+    batch = DriveBatch(service)
+    for file_id in file_ids:
+        batch.add(file_id, service.permissions().create(fileId=file_id, body=PUBLIC_PERMISSION, fields="id"),
+                  "drive.permissions.create")
+    return batch.execute()
+
+
+def update_files(service, changes):
+    """Renombra y mueve archivos en lotes
+
+    ``changes`` es {file_id: {'name': ..., 'add_parents': [...], 'remove_parents': [...]}},
+    con cualquiera de las tres claves.
+    """
+    batch = DriveBatch(service)
+    for file_id, change in changes.items():
+        batch.add(file_id, service.files().update(
+            fileId=file_id,
+            body={'name': change['name']} if change.get('name') else {},
+            addParents=",".join(change.get('add_parents', [])) or None,
+            removeParents=",".join(change.get('remove_parents', [])) or None,
+            fields=FILE_FIELDS
+        ), "drive.files.update")
+    return batch.execute()
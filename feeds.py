@@ -0,0 +1,689 @@
+"""Feeds RSS del podcast actualizados de forma incremental
+
+Con ``FEED_HEAD_ITEMS`` (desactivado por defecto), los feeds cuyo perfil
+lo admite solo llevan esos episodios más recientes (y hasta
+``FEED_ARCHIVE_ITEMS`` más). Los antiguos pasan a páginas de archivo
+(``feed_archivo_001.xml``, ...) enlazadas como indica el RFC 5005: el feed
+enlaza la página más reciente con ``rel="prev-archive"`` y cada página la
+anterior. Publicar un episodio solo reescribe y sube el feed principal; una
+página solo cambia si se corrige uno de sus episodios. iVoox, Spotify y
+Apple no siguen esos enlaces, así que sus feeds nunca se archivan.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, NamedTuple
+from xml.sax.saxutils import escape, quoteattr, unescape
+
+from media import file_sha256
+from pipeline import run_concurrently
+
+ITEM_PATTERN = re.compile(r"(\s*)(<item>.*?</item>)", re.S)
+GUID_PATTERN = re.compile(r"<guid[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</guid>", re.S)
+PUBDATE_PATTERN = re.compile(r"<pubDate>(.*?)</pubDate>")
+LAST_BUILD_PATTERN = re.compile(r"(<lastBuildDate>)(.*?)(</lastBuildDate>)")
+SELF_LINK_PATTERN = re.compile(r'<atom:link\b[^>]*\brel="self"[^>]*/>')
+PREV_ARCHIVE_PATTERN = re.compile(r'(\s*)<atom:link\b[^>]*\brel="prev-archive"[^>]*/>')
+HREF_PATTERN = re.compile(r'\bhref="([^"]*)"')
+RSS_OPEN_PATTERN = re.compile(r"<rss\b[^>]*>")
+CDATA_PATTERN = re.compile(r"<!\[CDATA\[(.*?)\]\]>", re.S)
+ENCLOSURE_PATTERN = re.compile(r"<enclosure\b[^>]*>")
+
+# Episodios del feed principal en los perfiles con archivo; 0 (por defecto) para no archivar
+FEED_HEAD_ITEMS = int(os.getenv("FEED_HEAD_ITEMS", "0"))
+# Episodios de cada página de archivo
+FEED_ARCHIVE_ITEMS = int(os.getenv("FEED_ARCHIVE_ITEMS", "25"))
+# Dónde se publican los feeds; por defecto, junto al atom:link rel="self" de cada uno
+FEED_BASE_URL = os.getenv("FEED_BASE_URL")
+
+HISTORY_NAMESPACE = "http://purl.org/syndication/history/1.0"
+
+# Hash y archivo de Drive de cada feed subido, para no resubir los que no cambian
+FEED_UPLOAD_STATE = "feeds_publicados.json"
+
+# Autor de los episodios tal y como aparece en los feeds publicados
+ITEM_AUTHOR_XML = escape("martazavila@gmail.com (YOGATE)")
+
+# Canal mínimo (mismo formato que genera feedgen) para cuando aún no existe feed.xml
+DEFAULT_RSS_HEAD = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" '
+    'xmlns:atom="http://www.w3.org/2005/Atom" '
+    'xmlns:content="http://purl.org/rss/1.0/modules/content/" version="2.0">'
+    "<channel><title>YOGATE - Meditaciones</title>"
+    "<link>https://yogate.es/Podcast/feed.xml</link>"
+    "<description>YOGATE - Meditaciones - Episodios de yoga y bienestar</description>"
+    '<atom:link href="https://yogate.es/Podcast/feed.xml" rel="self"/>'
+    "<language>es</language><lastBuildDate></lastBuildDate>"
+    '<itunes:category text="Health &amp; Fitness"><itunes:category text="Fitness"/></itunes:category>'
+)
+DEFAULT_RSS_TAIL = "</channel></rss>"
+
+# Canal por defecto de los feeds indentados (iVoox, Spotify/Apple)
+DEFAULT_PODCAST_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:podcast="https://podcastindex.org/namespace/1.0">
+  <channel>
+    <title><![CDATA[YOGATE - Meditaciones]]></title>
+    <atom:link href="{self_url}" rel="self" type="application/rss+xml" />
+    <link>https://yogate.es</link>
+    <description><![CDATA[YOGATE - Meditaciones - Episodios de yoga y bienestar]]></description>
+    <language>es</language>
+    <lastBuildDate></lastBuildDate>
+    <managingEditor>martazavila@gmail.com (YOGATE)</managingEditor>
+    <itunes:author><![CDATA[YOGATE]]></itunes:author>
+    <itunes:owner>
+      <itunes:name><![CDATA[YOGATE]]></itunes:name>
+      <itunes:email>martazavila@gmail.com</itunes:email>
+    </itunes:owner>
+    <itunes:explicit>no</itunes:explicit>
+    <itunes:image href="https://raw.githubusercontent.com/YogateMartaZenner/yogateupload/main/logo.jpeg" />
+    <itunes:category text="Religion &amp; Spirituality">
+      <itunes:category text="Spirituality" />
+    </itunes:category>"""
+DEFAULT_PODCAST_TAIL = "\n  </channel>\n</rss>"
+
+
+def rfc822_now():
+    return format_datetime(datetime.now(timezone.utc)).replace("-0000", "+0000")
+
+
+def cdata(text):
+    """Envuelve el texto en CDATA, partiendo cualquier ']]>' que contenga"""
+    return "<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def format_duration(seconds):
+    """Duración en el formato HH:MM:SS de itunes:duration"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def episode_guid(episode):
+    return episode.get('guid') or episode['audio_url']
+
+
+class EpisodeFields(NamedTuple):
+    """Campos de un episodio ya escapados, compartidos por todos los formatos"""
+    guid: str
+    title: str
+    title_cdata: str
+    description: str
+    description_cdata: str
+    audio_url: str
+    length: int
+    audio_type: str
+    pub_date: str
+    link: str
+    duration: str
+
+
+@lru_cache(maxsize=8192)
+def _serialize(guid, title, description, audio_url, length, audio_type, pub_date, link, duration):
+    return EpisodeFields(
+        guid=escape(guid),
+        title=escape(title),
+        title_cdata=cdata(title),
+        description=escape(description),
+        description_cdata=cdata(description),
+        audio_url=quoteattr(audio_url),
+        length=length,
+        audio_type=quoteattr(audio_type),
+        pub_date=escape(pub_date),
+        link=escape(link),
+        duration=format_duration(duration) if duration else "",
+    )
+
+
+def serialize_episode(episode):
+    """Escapa una sola vez los campos del episodio (memorizado)"""
+    link = (f"https://www.youtube.com/watch?v={episode['youtube_id']}"
+            if episode.get('youtube_id') else episode['audio_url'])
+    return _serialize(
+        episode_guid(episode), episode['title'], episode.get('description', ""), episode['audio_url'],
+        episode.get('audio_bytes', 0), episode.get('audio_type', "audio/mpeg"), episode['pub_date'],
+        link, episode.get('duration', 0)
+    )
+
+
+@lru_cache(maxsize=8192)
+def render_rss_item(fields):
+    """Fragmento <item> con el formato compacto de feed.xml"""
+    return (
+        f"<item><title>{fields.title}</title>"
+        f"<description>{fields.description}</description>"
+        f"<author>{ITEM_AUTHOR_XML}</author>"
+        f'<guid isPermaLink="false">{fields.guid}</guid>'
+        f"<enclosure url={fields.audio_url} length=\"{fields.length}\" type={fields.audio_type}/>"
+        f"<pubDate>{fields.pub_date}</pubDate>"
+        + (f"<itunes:duration>{fields.duration}</itunes:duration>" if fields.duration else "")
+        + "</item>"
+    )
+
+
+@lru_cache(maxsize=8192)
+def render_ivoox_item(fields):
+    """Fragmento <item> con el formato indentado de feed_ivoox.xml"""
+    duration = f"      <itunes:duration>{fields.duration}</itunes:duration>\n" if fields.duration else ""
+    return (
+        "<item>\n"
+        f"      <title>{fields.title_cdata}</title>\n"
+        f"      <description>{fields.description_cdata}</description>\n"
+        f"      <pubDate>{fields.pub_date}</pubDate>\n"
+        f"      <link>{fields.link}</link>\n"
+        f"      <enclosure url={fields.audio_url} length=\"{fields.length}\" type={fields.audio_type} />\n"
+        f'      <guid isPermaLink="false">{fields.guid}</guid>\n'
+        f"      <podcast:guid>{fields.guid}</podcast:guid>\n"
+        f"{duration}"
+        "    </item>"
+    )
+
+
+@lru_cache(maxsize=8192)
+def render_apple_item(fields):
+    """Fragmento <item> con las etiquetas itunes que piden Spotify y Apple Podcasts"""
+    duration = f"      <itunes:duration>{fields.duration}</itunes:duration>\n" if fields.duration else ""
+    return (
+        "<item>\n"
+        f"      <title>{fields.title_cdata}</title>\n"
+        f"      <description>{fields.description_cdata}</description>\n"
+        f"      <itunes:summary>{fields.description_cdata}</itunes:summary>\n"
+        f"      <pubDate>{fields.pub_date}</pubDate>\n"
+        f"      <link>{fields.link}</link>\n"
+        f"      <enclosure url={fields.audio_url} length=\"{fields.length}\" type={fields.audio_type} />\n"
+        f'      <guid isPermaLink="false">{fields.guid}</guid>\n'
+        f"{duration}"
+        "      <itunes:explicit>no</itunes:explicit>\n"
+        "      <itunes:episodeType>full</itunes:episodeType>\n"
+        "    </item>"
+    )
+
+
+class FeedProfile(NamedTuple):
+    """Un feed de destino: archivo, formato de item y canal por defecto
+
+    ``archive`` indica si sus episodios antiguos pueden pasar a páginas de
+    archivo: solo para lectores que siguen los enlaces del RFC 5005.
+    """
+    name: str
+    path: str
+    render_item: Callable
+    head: str
+    tail: str
+    archive: bool = False
+
+
+FEED_PROFILES = [
+    FeedProfile("rss", "feed.xml", render_rss_item, DEFAULT_RSS_HEAD, DEFAULT_RSS_TAIL, archive=True),
+    FeedProfile("ivoox", "feed_ivoox.xml", render_ivoox_item,
+                DEFAULT_PODCAST_HEAD.format(self_url="https://yogate.es/Podcast/feed_ivoox.xml"),
+                DEFAULT_PODCAST_TAIL),
+    FeedProfile("spotify", "feed_spotify.xml", render_apple_item,
+                DEFAULT_PODCAST_HEAD.format(self_url="https://yogate.es/Podcast/feed_spotify.xml"),
+                DEFAULT_PODCAST_TAIL),
+]
+
+
+def _item_guid(fragment):
+    # En el archivo el GUID va escapado (&amp;); el índice usa el de episode_guid
+    match = GUID_PATTERN.search(fragment)
+    return unescape(match.group(1).strip()) if match else hashlib.sha1(fragment.encode()).hexdigest()
+
+
+def _item_date(fragment):
+    match = PUBDATE_PATTERN.search(fragment)
+    try:
+        return parsedate_to_datetime(match.group(1)) if match else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_duration(text):
+    """Segundos de un itunes:duration (HH:MM:SS, MM:SS o segundos); 0 si no se entiende"""
+    try:
+        seconds = 0
+        for part in text.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return int(seconds)
+    except ValueError:
+        return 0
+
+
+def _item_text(fragment, tag):
+    """Texto de la etiqueta ``tag`` del item, sin escapar ni CDATA; None si no está"""
+    match = re.search(rf"<{tag}\b[^>]*>(.*?)</{tag}>", fragment, re.S)
+    if not match:
+        return None
+    parts = CDATA_PATTERN.split(match.group(1))
+    # split alterna texto escapado y contenido de los CDATA
+    return "".join(part if i % 2 else unescape(part) for i, part in enumerate(parts))
+
+
+def _enclosure_attribute(fragment, name):
+    enclosure = ENCLOSURE_PATTERN.search(fragment)
+    match = re.search(rf'\b{name}="([^"]*)"', enclosure.group(0)) if enclosure else None
+    return unescape(match.group(1), {"&quot;": '"'}) if match else None
+
+
+def item_audio(fragment):
+    """(URL, bytes, segundos) del audio de un <item> publicado; 0 si falta el dato"""
+    return (
+        _enclosure_attribute(fragment, "url") or "",
+        int(_enclosure_attribute(fragment, "length") or 0),
+        parse_duration(_item_text(fragment, "itunes:duration") or "0"),
+    )
+
+
+def patch_item_audio(fragment, audio_bytes=None, duration=None):
+    """Cambia solo enclosure@length e itunes:duration del item; el resto queda igual"""
+    if audio_bytes:
+        def set_length(match):
+            enclosure = match.group(0)
+            if re.search(r'\blength="[^"]*"', enclosure):
+                return re.sub(r'\blength="[^"]*"', f'length="{int(audio_bytes)}"', enclosure, count=1)
+            return enclosure.replace("<enclosure", f'<enclosure length="{int(audio_bytes)}"', 1)
+        fragment = ENCLOSURE_PATTERN.sub(set_length, fragment, count=1)
+    if duration:
+        element = f"<itunes:duration>{format_duration(duration)}</itunes:duration>"
+        if "<itunes:duration>" in fragment:
+            fragment = re.sub(r"<itunes:duration>.*?</itunes:duration>", element, fragment, count=1, flags=re.S)
+        else:
+            # Con la sangría del enclosure y antes del cierre, como lo renderizan los perfiles
+            indent = re.search(r"(\n[ \t]*)<enclosure", fragment)
+            closing = fragment.rindex("</item>")
+            while closing and fragment[closing - 1] in " \t\n":
+                closing -= 1
+            fragment = fragment[:closing] + (indent.group(1) if indent else "") + element + fragment[closing:]
+    return fragment
+
+
+class FeedDocument:
+    """Feed como cabecera del canal intacta más un fragmento XML por item
+
+    Los items existentes se guardan tal cual están en el archivo, así que
+    un feed sin cambios se vuelve a escribir byte a byte igual; publicar un
+    episodio solo renderiza su propio fragmento. Un GUID repetido en el
+    feed no identifica un solo item: esos items no se reescriben por GUID.
+    """
+
+    def __init__(self, head, segments, tail, newest_first=True, gap=""):
+        self.head = head
+        self.tail = tail
+        # Cada segmento es (espacio previo, fragmento <item>)
+        self.segments = segments
+        # GUID de cada segmento, en el mismo orden
+        self.guids = [_item_guid(fragment) for _, fragment in segments]
+        self._reindex()
+        self.newest_first = newest_first
+        self.gap = gap
+        self.mark_saved()
+
+    @classmethod
+    def parse(cls, text):
+        matches = list(ITEM_PATTERN.finditer(text))
+        if not matches:
+            closing = text.rindex("</channel>")
+            head = text[:closing].rstrip()
+            return cls.empty(head, text[len(head):])
+
+        head = text[:matches[0].start()]
+        tail = text[matches[-1].end():]
+        segments = [(match.group(1), match.group(2)) for match in matches]
+
+        first, last = _item_date(segments[0][1]), _item_date(segments[-1][1])
+        newest_first = not (first and last and first < last)
+        gap = segments[1][0] if len(segments) > 1 else segments[0][0]
+        return cls(head, segments, tail, newest_first, gap)
+
+    @classmethod
+    def empty(cls, head=DEFAULT_RSS_HEAD, tail=DEFAULT_RSS_TAIL):
+        # Los feeds indentados separan los items con salto de línea
+        return cls(head, [], tail, gap="\n    " if "\n" in tail else "")
+
+    def __len__(self):
+        return len(self.segments)
+
+    @property
+    def dirty(self):
+        """True si los items difieren de los del archivo en disco"""
+        return tuple(self.segments) != self._saved
+
+    def mark_saved(self):
+        self._saved = tuple(self.segments)
+
+    def _reindex(self):
+        """{GUID: posición} y los GUID que aparecen en más de un item"""
+        self.index, self.duplicates = {}, set()
+        for i, guid in enumerate(self.guids):
+            if guid in self.index:
+                self.duplicates.add(guid)
+            self.index[guid] = i
+
+    def __contains__(self, guid):
+        return guid in self.index
+
+    def upsert(self, guid, fragment):
+        """Añade o reemplaza un item; devuelve True si el feed cambió
+
+        Si el GUID está repetido no se sabe qué item reemplazar, así que
+        el feed no se toca y se lanza ValueError.
+        """
+        if guid in self.duplicates:
+            raise ValueError(f"GUID repetido en el feed: {guid}")
+        position = self.index.get(guid)
+        if position is not None:
+            return self.replace(position, fragment)
+        if self.newest_first:
+            self.segments.insert(0, (self.gap, fragment))
+            self.guids.insert(0, guid)
+            self.index = {key: i + 1 for key, i in self.index.items()}
+            self.index[guid] = 0
+        else:
+            self.segments.append((self.gap, fragment))
+            self.guids.append(guid)
+            self.index[guid] = len(self.segments) - 1
+        return True
+
+    def replace(self, position, fragment):
+        """Reemplaza el item de la posición ``position``; devuelve True si cambió"""
+        gap, current = self.segments[position]
+        if current == fragment:
+            return False
+        self.segments[position] = (gap, fragment)
+        return True
+
+    def render(self):
+        return self.head + "".join(gap + fragment for gap, fragment in self.segments) + self.tail
+
+    def pop_oldest(self, count):
+        """Quita y devuelve los ``count`` items más antiguos, en el orden del feed"""
+        split = len(self.segments) - count if self.newest_first else count
+        if self.newest_first:
+            removed, self.segments = self.segments[split:], self.segments[:split]
+            self.guids = self.guids[:split]
+        else:
+            removed, self.segments = self.segments[:split], self.segments[split:]
+            self.guids = self.guids[split:]
+        self._reindex()
+        return removed
+
+    def touch(self, build_date=None):
+        """Actualiza lastBuildDate de la cabecera"""
+        self.head = LAST_BUILD_PATTERN.sub(
+            lambda match: match.group(1) + (build_date or rfc822_now()) + match.group(3), self.head, count=1
+        )
+
+
+def write_if_changed(path, content):
+    """Escribe ``content`` de forma atómica solo si difiere del archivo actual"""
+    data = content.encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return True
+
+
+_documents = {}
+_documents_lock = threading.Lock()
+
+# Los documentos en caché y feeds_publicados.json se leen, modifican y
+# escriben: un solo hilo del proceso (app, trabajos en segundo plano) los
+# construye o sube a la vez. Es reentrante para quien encadene varios pasos.
+FEEDS_LOCK = threading.RLock()
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_feed(path, head=DEFAULT_RSS_HEAD, tail=DEFAULT_RSS_TAIL):
+    """Devuelve el FeedDocument de ``path``, reutilizándolo si el archivo no cambió"""
+    with _documents_lock:
+        if not os.path.exists(path):
+            return FeedDocument.empty(head, tail)
+        cached = _documents.get(os.path.abspath(path))
+        key = _stat_key(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            document = FeedDocument.parse(f.read())
+        _documents[os.path.abspath(path)] = (key, document)
+        return document
+
+
+def save_feed(path, document):
+    """Guarda el feed si tiene cambios; devuelve True si se escribió"""
+    if not document.dirty and os.path.exists(path):
+        return False
+    document.touch()
+    written = write_if_changed(path, document.render())
+    document.mark_saved()
+    with _documents_lock:
+        _documents[os.path.abspath(path)] = (_stat_key(path), document)
+    return written
+
+
+def archive_path(path, number):
+    """Ruta de la página de archivo ``number`` (desde 1, la más antigua) del feed ``path``"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_archivo_{number:03d}{extension}"
+
+
+def archive_paths(path):
+    """Páginas de archivo del feed, de la más antigua a la más reciente"""
+    paths = []
+    while os.path.exists(archive_path(path, len(paths) + 1)):
+        paths.append(archive_path(path, len(paths) + 1))
+    return paths
+
+
+def archived_pages(path):
+    """{GUID: página de archivo} de los episodios que ya están archivados
+
+    Un GUID que está en varias páginas se asocia a None.
+    """
+    pages = {}
+    for page in archive_paths(path):
+        for guid in load_feed(page).index:
+            pages[guid] = None if guid in pages else page
+    return pages
+
+
+def _feed_url(head, path):
+    """URL pública de ``path``: junto a FEED_BASE_URL o al atom:link rel="self" del feed"""
+    name = os.path.basename(path)
+    if FEED_BASE_URL:
+        return FEED_BASE_URL.rstrip("/") + "/" + name
+    link = SELF_LINK_PATTERN.search(head)
+    href = HREF_PATTERN.search(link.group(0)) if link else None
+    return href.group(1).rsplit("/", 1)[0] + "/" + name if href else name
+
+
+def _atom_link(href, rel):
+    return f'<atom:link href={quoteattr(href)} rel="{rel}"/>'
+
+
+def _insert_after_self_link(head, elements, gap):
+    link = SELF_LINK_PATTERN.search(head)
+    position = link.end() if link else len(head)
+    return head[:position] + "".join(gap + element for element in elements) + head[position:]
+
+
+def _head_with_prev_archive(head, href, gap):
+    """Cabecera del feed principal enlazando la página de archivo más reciente"""
+    link = _atom_link(href, "prev-archive")
+    if PREV_ARCHIVE_PATTERN.search(head):
+        return PREV_ARCHIVE_PATTERN.sub(lambda match: match.group(1) + link, head, count=1)
+    return _insert_after_self_link(head, [link], gap)
+
+
+def _archive_head(head, page_href, current_href, prev_href, gap):
+    """Cabecera de una página de archivo: la del canal marcada con fh:archive"""
+    head = RSS_OPEN_PATTERN.sub(
+        lambda match: match.group(0) if HISTORY_NAMESPACE in match.group(0)
+        else match.group(0)[:-1] + f' xmlns:fh="{HISTORY_NAMESPACE}">', head, count=1
+    )
+    head = PREV_ARCHIVE_PATTERN.sub("", head)
+    head = SELF_LINK_PATTERN.sub(
+        lambda match: HREF_PATTERN.sub(lambda _: f"href={quoteattr(page_href)}", match.group(0), count=1),
+        head, count=1
+    )
+    elements = ["<fh:archive/>", _atom_link(current_href, "current")]
+    if prev_href:
+        elements.append(_atom_link(prev_href, "prev-archive"))
+    return _insert_after_self_link(head, elements, gap)
+
+
+def archive_old_items(path, document, head_items=None, archive_items=None):
+    """Pasa los items más antiguos del feed a páginas de archivo nuevas
+
+    Mientras el feed tenga ``head_items`` + ``archive_items`` items o más,
+    los ``archive_items`` más antiguos se escriben en una página nueva.
+    Devuelve las rutas de las páginas creadas.
+    """
+    head_items = FEED_HEAD_ITEMS if head_items is None else head_items
+    archive_items = FEED_ARCHIVE_ITEMS if archive_items is None else archive_items
+    if not head_items or not archive_items:
+        return []
+
+    pages = archive_paths(path)
+    created = []
+    while len(document) >= head_items + archive_items:
+        page_path = archive_path(path, len(pages) + 1)
+        prev_href = _feed_url(document.head, pages[-1]) if pages else None
+        page = FeedDocument(
+            _archive_head(document.head, _feed_url(document.head, page_path), _feed_url(document.head, path),
+                          prev_href, document.gap),
+            document.pop_oldest(archive_items), document.tail, document.newest_first, document.gap
+        )
+        save_feed(page_path, page)
+        pages.append(page_path)
+        created.append(page_path)
+    if created:
+        document.head = _head_with_prev_archive(document.head, _feed_url(document.head, pages[-1]), document.gap)
+    return created
+
+
+def _upsert_archived(page, documents, guid, fragment):
+    """Actualiza el item de un episodio archivado en su página, cargada una vez en ``documents``"""
+    if page is None:
+        raise ValueError(f"GUID repetido en varias páginas de archivo: {guid}")
+    if page not in documents:
+        documents[page] = load_feed(page)
+    documents[page].upsert(guid, fragment)
+
+
+def build_feeds(episodes, profiles=None, head_items=None, add_new=True):
+    """Actualiza todos los feeds de destino en una sola pasada por los episodios
+
+    Cada episodio se escapa una vez y cada perfil solo formatea su item.
+    Un episodio que ya está en una página de archivo se actualiza en esa
+    página (p. ej. al completar su duración) y, en los perfiles con
+    ``archive``, los que sobran en el feed principal se archivan. Con
+    ``add_new`` en False solo se actualizan los items que ya tiene cada
+    feed. Los items con un GUID repetido no se reescriben. Devuelve
+    {nombre del perfil: True si su feed o alguna de sus páginas cambió}.
+    """
+    with FEEDS_LOCK:
+        profiles = FEED_PROFILES if profiles is None else profiles
+        documents = [load_feed(profile.path, profile.head, profile.tail) for profile in profiles]
+        archived = [archived_pages(profile.path) for profile in profiles]
+        touched = [{} for _ in profiles]
+        for episode in episodes:
+            fields = serialize_episode(episode)
+            guid = episode_guid(episode)
+            for profile, document, pages, pages_touched in zip(profiles, documents, archived, touched):
+                try:
+                    if guid in pages:
+                        _upsert_archived(pages[guid], pages_touched, guid, profile.render_item(fields))
+                    elif add_new or guid in document:
+                        document.upsert(guid, profile.render_item(fields))
+                except ValueError as e:
+                    print(f"⚠️ {profile.path}: {e}; no se actualiza")
+        for profile, document in zip(profiles, documents):
+            if profile.archive:
+                archive_old_items(profile.path, document, head_items)
+        changed = {}
+        for profile, document, pages_touched in zip(profiles, documents, touched):
+            pages_changed = [save_feed(page, page_document) for page, page_document in pages_touched.items()]
+            changed[profile.name] = save_feed(profile.path, document) or any(pages_changed)
+        return changed
+
+
+class FeedUploadState:
+    """Recuerda el hash y el archivo de Drive de cada feed ya subido"""
+
+    def __init__(self, path=FEED_UPLOAD_STATE):
+        self.path = path
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, name):
+        return self._read().get(name, {})
+
+    def file_ids(self):
+        """IDs de Drive de todos los feeds y páginas de archivo subidos"""
+        return [entry["file_id"] for entry in self._read().values() if entry.get("file_id")]
+
+    def pending(self, profiles=None):
+        """(nombre, ruta) de los feeds cuyo archivo local difiere del último subido
+
+        Las páginas de archivo (con su nombre de archivo como clave) van
+        antes que los feeds que las enlazan; solo se vuelven a subir si se
+        corrigió alguno de sus episodios.
+        """
+        profiles = FEED_PROFILES if profiles is None else profiles
+        state = self._read()
+        archives = [
+            (os.path.basename(page), page)
+            for profile in profiles for page in archive_paths(profile.path)
+            if state.get(os.path.basename(page), {}).get("sha256") != file_sha256(page)
+        ]
+        return archives + [
+            (profile.name, profile.path) for profile in profiles
+            if os.path.exists(profile.path)
+            and state.get(profile.name, {}).get("sha256") != file_sha256(profile.path)
+        ]
+
+    def mark_uploaded(self, name, path, url, file_id):
+        state = self._read()
+        state[name] = {"sha256": file_sha256(path), "url": url, "file_id": file_id}
+        write_if_changed(self.path, json.dumps(state, indent=2, ensure_ascii=False))
+
+
+def upload_pending_feeds(upload_file, state=None):
+    """Sube los feeds que cambiaron y devuelve {nombre: URL} de todos
+
+    ``upload_file(path, file_id)`` sube el archivo (reemplazando ``file_id``
+    si ya existe) y devuelve (URL, ID).
+    """
+    with FEEDS_LOCK:
+        state = state or FeedUploadState()
+        pending = state.pending()
+        names = {profile.name for profile in FEED_PROFILES}
+        heads = [(name, path) for name, path in pending if name in names]
+        archives = [(name, path) for name, path in pending if name not in names]
+        # Las páginas de archivo nuevas se suben antes que los feeds que las
+        # enlazan; las subidas de cada grupo van a la vez y el estado se guarda después
+        for group in (archives, heads):
+            results = run_concurrently(lambda item: upload_file(item[1], state.get(item[0]).get("file_id")), group)
+            for (name, path), (url, file_id) in zip(group, results):
+                if url:
+                    state.mark_uploaded(name, path, url, file_id)
+        return {profile.name: state.get(profile.name).get("url") for profile in FEED_PROFILES}
@@ -0,0 +1,240 @@
+"""Clientes autenticados de Google compartidos por todo el proceso
+
+googleapiclient, oauth2client y httplib2 se importan al pedir el primer
+cliente o credencial: arrancar la app o upload_task sin nada que publicar
+no paga su importación. Todos los clientes envían por el pool de conexiones
+de http_pool, así que un mismo cliente se usa desde varios hilos a la vez.
+
+Con ``GOOGLE_API_BASE_URL`` los clientes hablan con otro servidor en lugar
+de googleapis.com (p. ej. benchmarks/fake_google_api.py).
+"""
+import json
+import os
+import threading
+from datetime import timezone
+
+from http_pool import PooledHttp
+from metrics import CacheStats
+from quota import QUOTA
+from uploads import UPLOADS, bearer_headers, drive_upload_url, youtube_upload_url
+
+DRIVE_CREDENTIALS = "drive_credentials.json"
+YOUTUBE_CREDENTIALS = "youtube_credentials.json"
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL")
+
+
+class ServiceCache:
+    """Caché de credenciales y clientes de la API a nivel de proceso
+
+    Los clientes se construyen con los documentos de descubrimiento que
+    incluye googleapiclient, así que no se descarga nada al arrancar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._credentials = {}
+        self._services = {}
+        self.stats = CacheStats()
+
+    def _document(self, api, version):
+        key = (api, version)
+        if key not in self._documents:
+            from googleapiclient.discovery_cache import get_static_doc
+            document = get_static_doc(api, version)
+            if document is None:
+                raise LookupError(f"No hay documento de descubrimiento para {api} {version}")
+            if API_BASE_URL:
+                document = json.loads(document)
+                document["rootUrl"] = document["mtlsRootUrl"] = API_BASE_URL.rstrip("/") + "/"
+            self._documents[key] = document
+        return self._documents[key]
+
+    def credentials(self, storage_file):
+        """Credenciales guardadas en ``storage_file``, renovando el token si caducó"""
+        from oauth2client.file import Storage
+
+        with self._lock:
+            creds = self._credentials.get(storage_file)
+            if creds is None or creds.invalid:
+                self.stats.miss("credentials")
+                creds = Storage(storage_file).get()
+                if not creds or creds.invalid:
+                    self._credentials.pop(storage_file, None)
+                    return None
+                self._credentials[storage_file] = creds
+            else:
+                self.stats.hit("credentials")
+
+            if creds.access_token_expired:
+                self.stats.miss("token")
+                try:
+                    # El Storage asociado guarda el token renovado en disco
+                    creds.refresh(PooledHttp())
+                except Exception:
+                    self._credentials.pop(storage_file, None)
+                    return None
+            return creds
+
+    def service(self, api, version, storage_file):
+        """Cliente de la API para ``api``/``version`` o None si no hay credenciales"""
+        creds = self.credentials(storage_file)
+        if creds is None:
+            return None
+
+        key = (api, version, storage_file)
+        with self._lock:
+            cached = self._services.get(key)
+            if cached is not None and cached[0] is creds:
+                self.stats.hit(api)
+                return cached[1]
+
+            self.stats.miss(api)
+            from googleapiclient.discovery import build_from_document
+            service = build_from_document(self._document(api, version), http=creds.authorize(PooledHttp()))
+            self._services[key] = (creds, service)
+            return service
+
+    def invalidate(self, storage_file=None):
+        """Olvida credenciales y clientes (todos o los de un archivo)"""
+        with self._lock:
+            for key in list(self._credentials):
+                if storage_file in (None, key):
+                    del self._credentials[key]
+            for key in list(self._services):
+                if storage_file in (None, key[2]):
+                    del self._services[key]
+
+
+class FolderResolver:
+    """Resuelve (y crea si no existe) el ID de una carpeta de Drive, memorizándolo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self.stats = CacheStats()
+
+    def resolve(self, service, folder_name):
+        with self._lock:
+            if folder_name in self._ids:
+                self.stats.hit(folder_name)
+                return self._ids[folder_name]
+
+            self.stats.miss(folder_name)
+            results = QUOTA.execute(service.files().list(
+                q=f"mimeType='{FOLDER_MIME_TYPE}' and name='{folder_name}' and trashed=false",
+                spaces='drive',
+                fields="files(id, name)"
+            ), "drive.files.list")
+            items = results.get('files', [])
+            if items:
+                folder_id = items[0]['id']
+            else:
+                folder_id = QUOTA.execute(service.files().create(
+                    body={'name': folder_name, 'mimeType': FOLDER_MIME_TYPE},
+                    fields='id'
+                ), "drive.files.create")['id']
+            self._ids[folder_name] = folder_id
+            return folder_id
+
+    def forget(self, folder_name=None):
+        with self._lock:
+            if folder_name is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(folder_name, None)
+
+
+SERVICES = ServiceCache()
+FOLDERS = FolderResolver()
+
+
+def get_service(api, version, storage_file):
+    """Cliente compartido de la API, o None si falta autenticarse"""
+    return SERVICES.service(api, version, storage_file)
+
+
+def get_credentials(storage_file):
+    """Credenciales compartidas guardadas en ``storage_file``, o None"""
+    return SERVICES.credentials(storage_file)
+
+
+def resolve_folder_id(service, folder_name="Podcast"):
+    """ID de la carpeta de Drive ``folder_name``, con una sola búsqueda por proceso"""
+    return FOLDERS.resolve(service, folder_name)
+
+
+def upload_public_file(filepath, file_id=None, folder_name="Podcast", share=True):
+    """Sube ``filepath`` a Drive y devuelve (URL de descarga pública, ID)
+
+    Con ``file_id`` se reemplaza el contenido de ese archivo (la URL no
+    cambia); si no, se crea en ``folder_name`` y se hace público, salvo con
+    ``share=False`` (para hacer públicos muchos a la vez con
+    drive_bulk.share_publicly). La subida es reanudable. Lanza RuntimeError
+    si no hay credenciales de Drive.
+    """
+    service = get_service("drive", "v3", DRIVE_CREDENTIALS)
+    if not service:
+        raise RuntimeError("Credenciales de Drive inválidas")
+
+    auth_headers = bearer_headers(get_credentials(DRIVE_CREDENTIALS))
+    if file_id:
+        QUOTA.run(lambda: UPLOADS.upload(filepath, drive_upload_url(file_id), {}, auth_headers=auth_headers,
+                                         method="PATCH"), "drive.files.update")
+    else:
+        folder_id = resolve_folder_id(service, folder_name)
+        file_metadata = {"name": os.path.basename(filepath), "parents": [folder_id]}
+        file_id = QUOTA.run(lambda: UPLOADS.upload(filepath, drive_upload_url(), file_metadata,
+                                                   auth_headers=auth_headers), "drive.files.create")["id"]
+        if share:
+            QUOTA.execute(service.permissions().create(fileId=file_id, body={"role": "reader", "type": "anyone"}),
+                          "drive.permissions.create")
+    return f"https://drive.google.com/uc?export=download&id={file_id}", file_id
+
+
+def upload_youtube_video(video_path, title, description, tags, privacy_status="private",
+                         scheduled_time=None, progress=None):
+    """Sube un video a YouTube por trozos y devuelve su ID
+
+    ``scheduled_time`` solo se aplica a videos privados. Lanza RuntimeError
+    si no hay credenciales de YouTube.
+    """
+    credentials = get_credentials(YOUTUBE_CREDENTIALS)
+    if not credentials:
+        raise RuntimeError("Credenciales de YouTube inválidas")
+
+    body = {
+        'snippet': {
+            'title': title,
+            'description': description,
+            'tags': tags,
+            'categoryId': '22'  # People & Blogs
+        },
+        'status': {
+            'privacyStatus': privacy_status
+        }
+    }
+    if scheduled_time and privacy_status == "private":
+        if scheduled_time.tzinfo:
+            scheduled_time = scheduled_time.astimezone(timezone.utc).replace(tzinfo=None)
+        body['status']['publishAt'] = scheduled_time.isoformat() + 'Z'
+
+    # La subida va antes que cualquier listado y tiene su cuota reservada
+    response = QUOTA.run(lambda: UPLOADS.upload(
+        video_path,
+        youtube_upload_url(part=','.join(body.keys())),
+        body,
+        auth_headers=bearer_headers(credentials),
+        progress=progress
+    ), "videos.insert")
+    return response['id']
+
+
+def cache_summary():
+    return {
+        "clientes": SERVICES.stats.summary(),
+        "carpetas": FOLDERS.stats.summary(),
+    }
@@ -0,0 +1,62 @@
+"""Pool de conexiones HTTP compartido por todo el tráfico con Google
+
+Los clientes de la API, las subidas reanudables y las descargas por rangos
+usan la misma ``requests.Session``: las conexiones quedan abiertas
+(keep-alive) y se reutilizan entre llamadas y entre hilos, hasta
+``HTTP_POOL_SIZE`` por host, en lugar de abrir una por cliente e hilo.
+
+``PooledHttp`` adapta la sesión a la interfaz de httplib2 que esperan
+googleapiclient y oauth2client, así que un mismo cliente de la API sirve a
+todos los hilos y sus llamadas se pueden lanzar a la vez (ver
+``pipeline.run_concurrently``).
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+TIMEOUT = 60
+
+# Cabeceras que dejan de ser ciertas porque requests ya descomprime el cuerpo
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def pooled_session(pool_size=POOL_SIZE):
+    """Sesión con hasta ``pool_size`` conexiones abiertas por host"""
+    session = requests.Session()
+    # Un pool por host: www.googleapis.com, youtube.googleapis.com, oauth2...
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = pooled_session()
+
+
+class PooledHttp:
+    """Objeto con la interfaz de ``httplib2.Http`` que envía por el pool compartido
+
+    A diferencia de httplib2, se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(self, session=None, timeout=TIMEOUT):
+        self.session = session or SESSION
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        import httplib2
+
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout,
+                                        allow_redirects=redirections > 0)
+        info = {name.lower(): value for name, value in response.headers.items()
+                if name.lower() not in _DROPPED_HEADERS}
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self):
+        # La sesión es de todo el proceso y sigue abierta para los demás clientes
+        pass
@@ -0,0 +1,311 @@
+"""Cola persistente de trabajos en segundo plano para las tareas programadas
+
+Cada trabajo recorre tres etapas con su propio límite de concurrencia:
+descarga (red), extracción del audio (CPU, ffmpeg) y subida (red). Así un
+lote grande ocupa todos los núcleos en la extracción sin saturar la red ni
+la cuota de Drive. El estado de cada trabajo se guarda en SQLite, de modo
+que la interfaz solo consulta la tabla y los trabajos sin terminar se
+retoman al reiniciar la app.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+from dedupe import ContentIndex, source_key
+from feeds import build_feeds, episode_guid, rfc822_now, upload_pending_feeds
+from google_services import upload_public_file, upload_youtube_video
+from media import AUDIO_METADATA_KEYS
+from pipeline import run_publish_pipeline
+from storage import STORE_DB, TASK_YOUTUBE, PodcastStore
+from youtube_download import download_audio
+
+STAGE_DOWNLOAD = "descarga"
+STAGE_TRANSCODE = "audio"
+STAGE_UPLOAD = "subida"
+
+# Trabajos que pueden estar a la vez en cada etapa
+STAGE_LIMITS = {
+    STAGE_DOWNLOAD: int(os.getenv("JOBS_DOWNLOADS", "3")),
+    STAGE_TRANSCODE: int(os.getenv("JOBS_TRANSCODES", str(os.cpu_count() or 2))),
+    STAGE_UPLOAD: int(os.getenv("JOBS_UPLOADS", "2")),
+}
+
+JOB_QUEUED = "queued"
+JOB_WAITING = "waiting"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_SKIPPED = "skipped"
+ACTIVE_STATES = (JOB_QUEUED, JOB_WAITING, JOB_RUNNING)
+
+
+class JobSkipped(Exception):
+    """El trabajo no se ejecuta ahora (p. ej. no queda tiempo); su tarea sigue pendiente"""
+
+
+class JobQueue:
+    """Trabajos de un tipo de tarea y su estado en la base de datos del podcast"""
+
+    def __init__(self, path=STORE_DB, kind=TASK_YOUTUBE):
+        self.path = path
+        self.kind = kind
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    task_id INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    stage TEXT,
+                    error TEXT,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (kind, state)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_task ON jobs (task_id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def enqueue(self, tasks):
+        """Crea un trabajo por tarea (salvo si ya tiene uno activo); devuelve [(id, tarea)]"""
+        created = []
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            for task in tasks:
+                active = conn.execute(
+                    f"SELECT 1 FROM jobs WHERE task_id = ? AND state IN ({','.join('?' * len(ACTIVE_STATES))})",
+                    (task['id'], *ACTIVE_STATES)
+                ).fetchone()
+                if active:
+                    continue
+                cursor = conn.execute(
+                    "INSERT INTO jobs (kind, task_id, title, state, data, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.kind, task['id'], task.get('title', ""), JOB_QUEUED,
+                     json.dumps(task, ensure_ascii=False), now, now)
+                )
+                created.append((cursor.lastrowid, task))
+        return created
+
+    def update(self, job_id, state, stage=None, error=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, stage = ?, error = ?, updated_at = ? WHERE id = ?",
+                (state, stage, error, time.time(), job_id)
+            )
+
+    def unfinished(self):
+        """Trabajos que quedaron a medias (p. ej. por un reinicio), devueltos a la cola"""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                f"SELECT id, data FROM jobs WHERE kind = ? AND state IN ({','.join('?' * len(ACTIVE_STATES))}) "
+                "ORDER BY id", (self.kind, *ACTIVE_STATES)
+            ).fetchall()
+            conn.execute(
+                f"UPDATE jobs SET state = ?, stage = NULL "
+                f"WHERE kind = ? AND state IN ({','.join('?' * len(ACTIVE_STATES))})",
+                (JOB_QUEUED, self.kind, *ACTIVE_STATES)
+            )
+        return [(job_id, json.loads(data)) for job_id, data in rows]
+
+    def latest(self, task_id):
+        """El último trabajo de la tarea, o None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, state, error FROM jobs WHERE kind = ? AND task_id = ? ORDER BY id DESC LIMIT 1",
+                (self.kind, task_id)
+            ).fetchone()
+        return dict(zip(("id", "state", "error"), row)) if row else None
+
+    def jobs(self, limit=50):
+        """Los trabajos más recientes, del último al primero"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, task_id, title, state, stage, error, created_at, updated_at "
+                "FROM jobs WHERE kind = ? ORDER BY id DESC LIMIT ?", (self.kind, limit)
+            ).fetchall()
+        keys = ("id", "task_id", "title", "state", "stage", "error", "created_at", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def counts(self):
+        """Devuelve {estado: número de trabajos}"""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT state, COUNT(*) FROM jobs WHERE kind = ? GROUP BY state", (self.kind,)))
+
+
+class JobExecutor:
+    """Ejecuta trabajos en un pool de hilos limitando cuántos hay en cada etapa
+
+    ``handler(task, stage)`` procesa una tarea y envuelve cada etapa en
+    ``with stage(nombre):``, que espera un hueco en esa etapa y registra el
+    avance del trabajo en la cola.
+    """
+
+    def __init__(self, handler, queue=None, stage_limits=None, max_workers=None):
+        self.handler = handler
+        self.queue = queue or JobQueue()
+        limits = stage_limits or STAGE_LIMITS
+        self._semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or sum(limits.values()),
+                                        thread_name_prefix="trabajo")
+        self._lock = threading.Lock()
+        self._submitted = set()
+
+    def resume(self):
+        """Vuelve a lanzar los trabajos que no terminaron; devuelve sus IDs"""
+        pending = self.queue.unfinished()
+        for job_id, task in pending:
+            self._submit(job_id, task)
+        return [job_id for job_id, _ in pending]
+
+    def submit(self, tasks):
+        """Encola las tareas y devuelve los IDs de los trabajos creados"""
+        created = self.queue.enqueue(tasks)
+        for job_id, task in created:
+            self._submit(job_id, task)
+        return [job_id for job_id, _ in created]
+
+    def _submit(self, job_id, task):
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self._pool.submit(self._run, job_id, task)
+
+    @contextmanager
+    def stage(self, job_id, name):
+        self.queue.update(job_id, JOB_WAITING, name)
+        with self._semaphores[name]:
+            self.queue.update(job_id, JOB_RUNNING, name)
+            yield
+
+    def _run(self, job_id, task):
+        try:
+            self.handler(task, lambda name: self.stage(job_id, name))
+        except JobSkipped as e:
+            self.queue.update(job_id, JOB_SKIPPED, error=str(e))
+        except Exception as e:
+            self.queue.update(job_id, JOB_FAILED, error=str(e))
+        else:
+            self.queue.update(job_id, JOB_DONE)
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def process_youtube_task(task, stage, store=None, index=None):
+    """Descarga el audio del video de la tarea, lo prepara, lo sube y lo publica en los feeds"""
+    store = store or PodcastStore()
+    index = index or ContentIndex()
+    workdir = tempfile.mkdtemp(prefix="tarea_")
+    try:
+        with stage(STAGE_DOWNLOAD):
+            source_path = download_audio(task['youtube_url'], task['video_id'])
+            key = source_key(source_path)
+
+        # Si este audio ya se publicó no se extrae ni se sube de nuevo
+        audio = index.published_audio(key)
+        if audio is None:
+            with stage(STAGE_TRANSCODE):
+                # Solo se recodifica si el códec descargado no sirve para podcast
+                audio = index.extract(source_path, os.path.join(workdir, f"{task['video_id']}.mp3"), key)
+
+        with stage(STAGE_UPLOAD):
+            if audio['path']:
+                audio['url'], audio['file_id'] = index.upload(audio, upload_public_file)
+            episode = {
+                'title': task['title'],
+                'description': task.get('description', ""),
+                'audio_url': audio['url'],
+                'pub_date': rfc822_now(),
+                'youtube_id': task['video_id'],
+                **{field: audio[field] for field in AUDIO_METADATA_KEYS if field in audio}
+            }
+            # Si un intento anterior ya lo guardó, el episodio conserva su
+            # fecha de publicación y los clientes no lo ven como nuevo
+            previous = store.episode(episode_guid(episode))
+            if previous:
+                episode['pub_date'] = previous['pub_date']
+            store.add_episode(episode)
+            build_feeds([episode])
+            upload_pending_feeds(upload_public_file)
+
+        store.mark_processed(task['id'])
+        os.remove(source_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def process_folder_video(task, stage, store=None, index=None):
+    """Sube a YouTube un video local y publica su audio en el podcast a la vez
+
+    La tarea trae la ruta del video (``path``), su clave de contenido
+    (``video_id``) y los metadatos para YouTube. Devuelve el ID de YouTube.
+
+    El ID del video subido y el GUID del episodio se guardan en la tarea en
+    cuanto se obtienen: si un paso posterior falla, al reintentar la tarea
+    no se sube otro video ni se crea otro episodio.
+    """
+    store = store or PodcastStore()
+    index = index or ContentIndex()
+    # Los datos del trabajo son de cuando se encoló; los de la tarea, los últimos
+    task = {**task, **(store.task(task['id']) or {})}
+    publish_at = datetime.fromisoformat(task['publish_at']) if task.get('publish_at') else None
+    workdir = tempfile.mkdtemp(prefix="tarea_")
+    try:
+        def _upload_video():
+            if task.get('youtube_id'):
+                return task['youtube_id']
+            with stage(STAGE_UPLOAD):
+                video_id = upload_youtube_video(task['path'], task['title'], task.get('description', ""),
+                                                task.get('tags', []), task.get('privacy', "private"),
+                                                publish_at)
+            store.update_task(task['id'], youtube_id=video_id)
+            return video_id
+
+        def _prepare_audio():
+            audio = index.published_audio(task['video_id'])
+            if audio is None:
+                with stage(STAGE_TRANSCODE):
+                    audio = index.extract(task['path'], os.path.join(workdir, "audio.mp3"), task['video_id'])
+                with stage(STAGE_UPLOAD):
+                    audio['url'], audio['file_id'] = index.upload(audio, upload_public_file)
+            return audio
+
+        def _publish(video_id, audio):
+            episode = store.episode(task['episode_guid']) if task.get('episode_guid') else None
+            if episode is None:
+                episode = {
+                    'title': task['title'],
+                    'description': task.get('description', ""),
+                    'audio_url': audio['url'],
+                    'pub_date': rfc822_now(),
+                    'youtube_id': video_id,
+                    **{field: audio[field] for field in AUDIO_METADATA_KEYS if field in audio}
+                }
+                store.add_episode(episode)
+                store.update_task(task['id'], episode_guid=episode_guid(episode))
+            build_feeds([episode])
+            upload_pending_feeds(upload_public_file)
+            return episode
+
+        video_id, _, _ = run_publish_pipeline(_upload_video, _prepare_audio, _publish)
+        store.mark_processed(task['id'])
+        return video_id
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
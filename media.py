@@ -0,0 +1,225 @@
+"""Utilidades para manejar los archivos de video y audio en disco"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+# Tamaño del bloque al volcar archivos a disco: acota la memoria usada
+SPOOL_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Códecs que las plataformas de podcast aceptan tal cual: se copian sin
+# recodificar al contenedor indicado
+PODCAST_COPY_CODECS = {
+    "mp3": (".mp3", "audio/mpeg"),
+    "aac": (".m4a", "audio/mp4"),
+}
+
+# Recodificación cuando el códec de origen no es apto para podcast
+TRANSCODE_ARGS = ["-c:a", "libmp3lame", "-q:a", "2"]
+
+# Bloque de lectura al calcular el hash del audio
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Campos del episodio que describen el archivo de audio publicado
+AUDIO_METADATA_KEYS = ("audio_bytes", "duration", "bitrate", "audio_sha256", "audio_type")
+
+
+def spool_to_disk(fileobj, suffix=".mp4", chunk_size=SPOOL_CHUNK_SIZE, dir=None):
+    """Vuelca un archivo subido a un temporal por bloques y devuelve su ruta
+
+    Si el objeto expone ``getbuffer()`` (como el UploadedFile de Streamlit)
+    se escriben vistas del buffer existente sin copiarlo; si no, se lee con
+    un único buffer reutilizable de ``chunk_size`` bytes.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            getbuffer = getattr(fileobj, "getbuffer", None)
+            if getbuffer is not None:
+                with getbuffer() as view:
+                    for start in range(0, len(view), chunk_size):
+                        out.write(view[start:start + chunk_size])
+            else:
+                fileobj.seek(0)
+                buffer = bytearray(chunk_size)
+                with memoryview(buffer) as view:
+                    while True:
+                        read = fileobj.readinto(buffer)
+                        if not read:
+                            break
+                        out.write(view[:read])
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def ffmpeg_binary():
+    """Ruta de ffmpeg: FFMPEG_BINARY, el PATH o el binario de imageio-ffmpeg"""
+    binary = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        return None
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def ffprobe_binary():
+    return os.getenv("FFPROBE_BINARY") or shutil.which("ffprobe")
+
+
+def probe_audio_codec(path):
+    """Devuelve el códec de la primera pista de audio, o None si no tiene"""
+    ffprobe = ffprobe_binary()
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=codec_name", "-of", "default=nw=1:nk=1", path],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip() or None
+
+    # Sin ffprobe (p. ej. solo el binario de imageio-ffmpeg) se lee la
+    # cabecera que imprime ffmpeg -i
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    match = re.search(r"Stream #\S+.*?: Audio: (\w+)", result.stderr)
+    return match.group(1) if match else None
+
+
+def _probe_format(source):
+    """Duración (s), bitrate (bit/s) y tamaño del contenedor; None si no se conocen"""
+    ffprobe = ffprobe_binary()
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration,bit_rate,size", "-of", "json", source],
+            capture_output=True, text=True, check=True
+        )
+        info = json.loads(result.stdout or "{}").get("format", {})
+
+        def _number(key, kind):
+            try:
+                return kind(info[key])
+            except (KeyError, ValueError):
+                return None
+        return _number("duration", float), _number("bit_rate", int), _number("size", int)
+
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", source], capture_output=True, text=True)
+    duration = bitrate = None
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    match = re.search(r"bitrate: (\d+) kb/s", result.stderr)
+    if match:
+        bitrate = int(match.group(1)) * 1000
+    return duration, bitrate, None
+
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    with open(path, "rb", buffering=0) as f, memoryview(buffer) as view:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def probe_audio_metadata(source, with_hash=True):
+    """Metadatos del enclosure: tamaño, duración, bitrate, hash y tipo MIME
+
+    ``source`` puede ser una ruta local o una URL; en las URLs ffprobe solo
+    lee la cabecera del contenedor, así que no se calcula el hash. Se
+    guardan en el episodio para que el feed no tenga que volver a abrir el
+    audio.
+    """
+    duration, bitrate, size = _probe_format(source)
+    remote = "://" in source
+    if not remote:
+        size = os.path.getsize(source)
+    if not bitrate and size and duration:
+        bitrate = int(size * 8 / duration)
+    metadata = {
+        "audio_bytes": size or 0,
+        "duration": int(round(duration)) if duration else 0,
+        "bitrate": bitrate or 0,
+        "audio_type": audio_mime_type(source.split("?", 1)[0]) if not remote else None,
+    }
+    if with_hash and not remote:
+        metadata["audio_sha256"] = file_sha256(source)
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def audio_mime_type(path):
+    """Tipo MIME del audio según su extensión"""
+    for extension, mime_type in PODCAST_COPY_CODECS.values():
+        if path.endswith(extension):
+            return mime_type
+    return "audio/mpeg"
+
+
+def extract_audio_ffmpeg(video_path, output_path):
+    """Extrae el audio con ffmpeg y devuelve la ruta final
+
+    Si el códec ya es apto para podcast se copia la pista sin recodificar
+    (la extensión de ``output_path`` se ajusta al contenedor); si no, se
+    recodifica a MP3 en una sola pasada.
+    """
+    ffmpeg = ffmpeg_binary()
+    if not ffmpeg:
+        raise FileNotFoundError("No se encontró ffmpeg")
+
+    codec = probe_audio_codec(video_path)
+    if codec is None:
+        raise ValueError("El video no tiene pista de audio")
+
+    base = os.path.splitext(output_path)[0]
+    if codec in PODCAST_COPY_CODECS:
+        extension = PODCAST_COPY_CODECS[codec][0]
+        output_path = base + extension
+        codec_args = ["-c:a", "copy"]
+        if extension == ".m4a":
+            codec_args += ["-movflags", "+faststart"]
+    else:
+        output_path = base + ".mp3"
+        codec_args = TRANSCODE_ARGS
+
+    try:
+        subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", video_path,
+             "-map", "0:a:0", "-vn", *codec_args, output_path],
+            capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        # No dejar el archivo a medias (p. ej. un .m4a) antes de recurrir a moviepy
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return output_path
+
+
+def extract_audio_moviepy(video_path, output_path):
+    """Extrae el audio decodificándolo con moviepy (método lento de reserva)"""
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(video_path)
+    try:
+        clip.audio.write_audiofile(output_path, verbose=False, logger=None)
+    finally:
+        clip.close()
+    return output_path
+
+
+def extract_audio(video_path, output_path):
+    """Extrae el audio con ffmpeg y, si falla, con moviepy; devuelve la ruta final"""
+    try:
+        return extract_audio_ffmpeg(video_path, output_path)
+    except (OSError, subprocess.CalledProcessError):
+        return extract_audio_moviepy(video_path, output_path)
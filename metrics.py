@@ -0,0 +1,90 @@
+"""Contadores y métricas de rendimiento compartidos por la app y las tareas"""
+import threading
+import time
+from collections import Counter
+
+
+class ApiCallCounter:
+    """Cuenta las llamadas a la API, los viajes HTTP y el tiempo total
+
+    Con ``scheduler`` (ver quota.QUOTA) cada petición pasa por el planificador
+    de cuota antes de enviarse.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.round_trips = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def record(self, *methods):
+        """Registra un viaje HTTP que incluye las llamadas indicadas"""
+        with self._lock:
+            self.round_trips += 1
+            self.calls.update(methods)
+
+    def run(self, func, *methods):
+        """Hace la petición ``func()``, que incluye las llamadas indicadas, contándola"""
+        self.record(*methods)
+        if self.scheduler:
+            return self.scheduler.run(func, *methods)
+        return func()
+
+    def execute(self, request, method, **kwargs):
+        """Ejecuta una petición de googleapiclient contándola"""
+        return self.run(lambda: request.execute(**kwargs), method)
+
+    def summary(self):
+        return (f"{self.total_calls} llamadas a la API en {self.round_trips} "
+                f"peticiones HTTP, {self.elapsed:.2f}s")
+
+
+class CacheStats:
+    """Aciertos y fallos de una caché, separados por clave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def hit(self, key):
+        with self._lock:
+            self.hits[key] += 1
+
+    def miss(self, key):
+        with self._lock:
+            self.misses[key] += 1
+
+    def snapshot(self):
+        """Devuelve {clave: (aciertos, fallos)}"""
+        with self._lock:
+            return {key: (self.hits[key], self.misses[key]) for key in sorted(self.hits | self.misses)}
+
+    def summary(self):
+        return ", ".join(
+            f"{key}: {hits} aciertos / {misses} fallos" for key, (hits, misses) in self.snapshot().items()
+        ) or "sin uso"
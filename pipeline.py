@@ -0,0 +1,43 @@
+"""Pipeline de publicación: la subida a YouTube y el audio del podcast en paralelo"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Peticiones independientes a la API que se lanzan a la vez
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "8"))
+
+
+def run_publish_pipeline(upload_video, produce_audio, publish, initializer=None):
+    """Ejecuta la subida del video y la preparación del audio a la vez
+
+    ``upload_video()`` devuelve el ID de YouTube y ``produce_audio()`` el
+    audio ya extraído y subido a Drive; ninguno depende del otro. Cuando
+    ambos terminan se llama a ``publish(video_id, audio)``, que crea el
+    episodio y el feed. Devuelve ``(video_id, audio, publicado)``; si una
+    de las dos etapas falla (devuelve un valor falso) no se publica nada.
+    """
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="publicar", initializer=initializer) as pool:
+        video_future = pool.submit(upload_video)
+        audio_future = pool.submit(produce_audio)
+        video_id = video_future.result()
+        audio = audio_future.result()
+
+    if not video_id or not audio:
+        return video_id, audio, None
+    return video_id, audio, publish(video_id, audio)
+
+
+def run_concurrently(func, items, workers=API_CONCURRENCY):
+    """Devuelve ``[func(item) for item in items]`` con hasta ``workers`` llamadas a la vez
+
+    Para peticiones independientes a la API (páginas de detalles, subidas de
+    feeds): los clientes comparten el pool de conexiones y el planificador
+    de cuota sigue limitando el ritmo. Cada llamada hereda el contexto del
+    hilo que la lanza, así que cuenta en el span de traza activo.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="api") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, func, item) for item in items]
+        return [future.result() for future in futures]
@@ -0,0 +1,293 @@
+"""Planificador de llamadas a las APIs de YouTube y Drive según su cuota
+
+La API de YouTube descuenta de una cuota diaria (10 000 unidades por
+defecto) un coste fijo por método: una subida cuesta 1600 unidades y cada
+listado 1. Todas las llamadas pasan por ``QUOTA``, que:
+
+- apunta las unidades gastadas por día en la base de datos, así que la app,
+  upload_task y watch_folder comparten el mismo presupuesto;
+- rechaza los listados que dejarían sin unidades para una subida
+  (``YOUTUBE_UPLOAD_RESERVE``) y deja pasar antes a las subidas cuando hay
+  varias llamadas esperando;
+- reparte las llamadas con un cubo de fichas por API para no mandar
+  ráfagas (``API_RATE`` llamadas por segundo, hasta ``API_BURST`` seguidas);
+- ante ``rateLimitExceeded`` espera con retroceso exponencial y reintenta, y
+  ante ``quotaExceeded`` da la cuota del día por agotada.
+
+La cuota de YouTube se renueva a medianoche, hora del Pacífico.
+"""
+import heapq
+import itertools
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import closing
+from datetime import datetime
+
+import pytz
+
+from storage import STORE_DB
+from tracing import record_api_call, record_retry
+from uploads import MAX_BACKOFF, MAX_RETRIES
+
+API_YOUTUBE = "youtube"
+API_DRIVE = "drive"
+
+# Unidades de cuota por método de la API de YouTube (los no listados cuestan 1)
+YOUTUBE_COSTS = {
+    "videos.insert": 1600,
+    "videos.update": 50,
+    "videos.delete": 50,
+    "thumbnails.set": 50,
+    "search.list": 100,
+    "videos.list": 1,
+    "playlistItems.list": 1,
+    "channels.list": 1,
+}
+
+DAILY_QUOTA = {
+    API_YOUTUBE: int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000")),
+    # Drive no tiene cuota diaria por unidades, solo límite de ritmo
+    API_DRIVE: None,
+}
+
+# Unidades que los listados no pueden gastar para que siempre quepa una subida
+UPLOAD_RESERVE = int(os.getenv("YOUTUBE_UPLOAD_RESERVE", str(YOUTUBE_COSTS["videos.insert"])))
+
+RATE = float(os.getenv("API_RATE", "5"))
+BURST = int(os.getenv("API_BURST", "10"))
+
+PRIORITY_UPLOAD = 0
+PRIORITY_WRITE = 1
+PRIORITY_LIST = 2
+
+QUOTA_TIMEZONE = "America/Los_Angeles"
+
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+QUOTA_REASONS = ("quotaExceeded", "dailyLimitExceeded")
+
+
+class QuotaExceeded(Exception):
+    """No quedan unidades de cuota para esta llamada hoy"""
+
+
+def api_for(method):
+    """API a la que pertenece el método (los de Drive empiezan por 'drive.')"""
+    return API_DRIVE if method.startswith("drive.") else API_YOUTUBE
+
+
+def method_cost(method):
+    return YOUTUBE_COSTS.get(method, 1) if api_for(method) == API_YOUTUBE else 0
+
+
+def method_priority(method):
+    if method.endswith(".insert"):
+        return PRIORITY_UPLOAD
+    if method.endswith(".list"):
+        return PRIORITY_LIST
+    return PRIORITY_WRITE
+
+
+def error_reason(error):
+    """'rate', 'quota' o None según el motivo de un error de la API"""
+    text = str(error)
+    content = getattr(error, "content", None)
+    if isinstance(content, bytes):
+        text += content.decode("utf-8", "replace")
+    if any(reason in text for reason in QUOTA_REASONS):
+        return "quota"
+    if any(reason in text for reason in RATE_LIMIT_REASONS):
+        return "rate"
+    return None
+
+
+def quota_day(now=None):
+    zona = pytz.timezone(QUOTA_TIMEZONE)
+    return (now or datetime.now(zona)).astimezone(zona).date().isoformat()
+
+
+class TokenBucket:
+    """Cubo de fichas en el que, entre las llamadas que esperan, pasa antes la de más prioridad"""
+
+    def __init__(self, rate=RATE, burst=BURST, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._order = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Ninguna llamada sale hasta dentro de ``seconds`` (p. ej. tras rateLimitExceeded)"""
+        with self._condition:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def acquire(self, priority=PRIORITY_WRITE):
+        """Espera una ficha; devuelve los segundos esperados"""
+        entry = (priority, next(self._order))
+        started = self.clock()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    if self._waiting[0] == entry and now >= self.paused_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - started
+                    wait = max(self.paused_until - now, (1 - self.tokens) / self.rate, 0.001)
+                    self._condition.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+
+class QuotaScheduler:
+    """Reparte las llamadas a la API respetando la cuota diaria y el ritmo"""
+
+    def __init__(self, path=STORE_DB, daily_quota=None, reserve=UPLOAD_RESERVE, rate=RATE, burst=BURST,
+                 max_retries=MAX_RETRIES, sleep=time.sleep, clock=time.monotonic):
+        self.path = path
+        self.daily_quota = {**DAILY_QUOTA, **(daily_quota or {})}
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.buckets = {api: TokenBucket(rate, burst, clock) for api in self.daily_quota}
+        self.units = Counter()
+        self.calls = Counter()
+        self.retries = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS quota_usage (
+                        day TEXT NOT NULL,
+                        api TEXT NOT NULL,
+                        units INTEGER NOT NULL,
+                        calls INTEGER NOT NULL,
+                        PRIMARY KEY (day, api)
+                    )
+                """)
+            self._schema_ready = True
+        return conn
+
+    def used(self, api=API_YOUTUBE, day=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT units FROM quota_usage WHERE day = ? AND api = ?", (day or quota_day(), api)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self, api=API_YOUTUBE):
+        """Unidades que quedan hoy, o None si la API no tiene cuota diaria"""
+        limit = self.daily_quota.get(api)
+        return None if limit is None else max(0, limit - self.used(api))
+
+    def _charge(self, method, priority):
+        """Descuenta el coste del método si cabe en el presupuesto del día"""
+        api, cost = api_for(method), method_cost(method)
+        limit = self.daily_quota.get(api)
+        if limit is not None and priority > PRIORITY_UPLOAD:
+            limit -= self.reserve
+        if limit is not None and cost > limit:
+            raise QuotaExceeded(f"{method} cuesta {cost} unidades y quedan {self.remaining(api)}")
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO quota_usage (day, api, units, calls) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (day, api) DO UPDATE SET units = units + excluded.units, calls = calls + 1 "
+                "WHERE ? IS NULL OR units + excluded.units <= ?",
+                (quota_day(), api, cost, limit, limit)
+            )
+            if not cursor.rowcount:
+                raise QuotaExceeded(f"{method} cuesta {cost} unidades y quedan {self.remaining(api)}"
+                                    + (" (reservadas para subidas)" if priority > PRIORITY_UPLOAD else ""))
+        with self._lock:
+            self.units[method] += cost
+            self.calls[method] += 1
+
+    def exhaust(self, api=API_YOUTUBE):
+        """Da por gastada la cuota de hoy (la API respondió quotaExceeded)"""
+        limit = self.daily_quota.get(api)
+        if limit is None:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO quota_usage (day, api, units, calls) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT (day, api) DO UPDATE SET units = MAX(units, excluded.units)",
+                (quota_day(), api, limit)
+            )
+
+    def run(self, func, *methods, priority=None):
+        """Llama a ``func()``, que hace una petición con los métodos indicados
+
+        Una petición por lotes incluye varios métodos y se cobra la suma,
+        una sola vez: los reintentos tras rateLimitExceeded no se cobran,
+        porque la API no contó esas llamadas. Lanza QuotaExceeded si no
+        caben en el presupuesto del día.
+        """
+        if priority is None:
+            priority = min(method_priority(method) for method in methods)
+        api = api_for(methods[0])
+        bucket = self.buckets[api]
+        attempt = 0
+        while True:
+            waited = bucket.acquire(priority)
+            if not attempt:
+                for method in methods:
+                    self._charge(method, priority)
+            with self._lock:
+                self.waited += waited
+            record_api_call(len(methods))
+            try:
+                return func()
+            except Exception as e:
+                reason = error_reason(e)
+                if reason == "quota":
+                    self.exhaust(api)
+                    raise QuotaExceeded(f"Cuota diaria de {api} agotada") from e
+                if reason != "rate" or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                record_retry()
+                delay = min(2 ** attempt, MAX_BACKOFF) + random.random()
+                bucket.pause(delay)
+                self.sleep(delay)
+
+    def execute(self, request, method, priority=None, **kwargs):
+        """Ejecuta una petición de googleapiclient a través del planificador"""
+        return self.run(lambda: request.execute(**kwargs), method, priority=priority)
+
+    def snapshot(self):
+        """Devuelve {api: (unidades usadas hoy, límite o None)}"""
+        return {api: (self.used(api), limit) for api, limit in self.daily_quota.items()}
+
+    def summary(self):
+        partes = []
+        for api, (used, limit) in self.snapshot().items():
+            if limit is not None:
+                partes.append(f"{api}: {used}/{limit} unidades hoy, quedan {max(0, limit - used)}")
+        with self._lock:
+            partes.append(f"{sum(self.calls.values())} llamadas en este proceso, "
+                          f"{self.waited:.1f}s de espera, {self.retries} reintentos por límite de ritmo")
+        return "; ".join(partes)
+
+
+QUOTA = QuotaScheduler()
@@ -0,0 +1,302 @@
+"""Episodios y tareas programadas del podcast en SQLite
+
+Sustituye a episodios.json, tareas_automaticas.json y schedule.json: cada
+cambio es una transacción sobre una sola fila y las consultas de tareas
+pendientes usan índices en lugar de recorrer la lista entera.
+
+Uso: python storage.py [--db podcast.db] para importar los JSON existentes.
+"""
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from feeds import episode_guid
+
+STORE_DB = "podcast.db"
+
+# Archivos JSON de versiones anteriores que se importan una sola vez
+EPISODES_FILE = "episodios.json"
+TASKS_FILE = "tareas_automaticas.json"
+SCHEDULE_FILE = "schedule.json"
+
+# Tipos de tarea: procesar un video del canal (app), uno subido a Drive
+# (upload_task) o uno dejado en la carpeta Pendientes (watch_folder)
+TASK_YOUTUBE = "youtube"
+TASK_DRIVE = "drive"
+TASK_FOLDER = "carpeta"
+
+
+def canonical_date(value):
+    """Fecha en un único formato ISO (hora local, sin zona) para compararla como texto
+
+    schedule.json se edita a mano: admite espacio en lugar de "T", solo la
+    fecha, o una zona horaria ("Z", "+02:00"), que se pasa a hora local como
+    la de datetime.now(). Si no es una fecha se devuelve tal cual.
+    """
+    try:
+        date = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return value
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return date.isoformat()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class PodcastStore:
+    """Episodios y tareas en SQLite (modo WAL) con índices para las consultas habituales"""
+
+    def __init__(self, path=STORE_DB):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS episodes (
+                    id INTEGER PRIMARY KEY,
+                    guid TEXT NOT NULL UNIQUE,
+                    youtube_id TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS episodes_youtube ON episodes (youtube_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    scheduled_date TEXT NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL,
+                    UNIQUE (kind, video_id, scheduled_date)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_video ON tasks (video_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_scheduled ON tasks (scheduled_date)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (processed, scheduled_date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if not self._get_meta(conn, "canonical_dates"):
+                # Tareas importadas antes de normalizar las fechas
+                conn.executemany(
+                    "UPDATE OR IGNORE tasks SET scheduled_date = ? WHERE id = ?",
+                    [(canonical_date(date), task_id)
+                     for task_id, date in conn.execute("SELECT id, scheduled_date FROM tasks").fetchall()]
+                )
+                self._set_meta(conn, "canonical_dates", "1")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ------------------------------------------------------------------
+    # Episodios
+    # ------------------------------------------------------------------
+
+    def _upsert_episodes(self, conn, episodes):
+        conn.executemany(
+            "INSERT INTO episodes (guid, youtube_id, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (guid) DO UPDATE SET youtube_id = excluded.youtube_id, data = excluded.data",
+            [
+                (episode_guid(episode), episode.get('youtube_id'), json.dumps(episode, ensure_ascii=False))
+                for episode in episodes
+            ]
+        )
+
+    def add_episode(self, episode):
+        """Guarda el episodio (o lo reemplaza si ya existe su GUID)"""
+        with closing(self._connect()) as conn, conn:
+            self._upsert_episodes(conn, [episode])
+
+    def episode(self, guid):
+        """El episodio con ese GUID, o None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT data FROM episodes WHERE guid = ?", (guid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_episode(self, guid, **fields):
+        """Actualiza campos de un episodio y devuelve el episodio resultante, o None"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT data FROM episodes WHERE guid = ?", (guid,)).fetchone()
+            if row is None:
+                return None
+            episode = {**json.loads(row[0]), **fields}
+            conn.execute(
+                "UPDATE episodes SET youtube_id = ?, data = ? WHERE guid = ?",
+                (episode.get('youtube_id'), json.dumps(episode, ensure_ascii=False), guid)
+            )
+            return episode
+
+    def episodes(self):
+        """Episodios en el orden en que se publicaron"""
+        with closing(self._connect()) as conn:
+            return [json.loads(data) for data, in conn.execute("SELECT data FROM episodes ORDER BY id")]
+
+    def episode_for_video(self, youtube_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT data FROM episodes WHERE youtube_id = ? ORDER BY id DESC LIMIT 1", (youtube_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ------------------------------------------------------------------
+    # Tareas
+    # ------------------------------------------------------------------
+
+    def _task(self, row):
+        task_id, processed, data = row
+        return {**json.loads(data), 'id': task_id, 'processed': bool(processed)}
+
+    def _insert_tasks(self, conn, kind, tasks):
+        # La columna lleva la fecha normalizada para compararla y ordenarla como
+        # texto; en data queda la original, que es la que aparece en schedule.json
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO tasks (kind, video_id, scheduled_date, processed, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (kind, task['video_id'], canonical_date(task['scheduled_date']), int(bool(task.get('processed'))),
+                 json.dumps({key: value for key, value in task.items() if key not in ('id', 'processed')},
+                            ensure_ascii=False))
+                for task in tasks
+            ]
+        )
+        return cursor.rowcount
+
+    def add_tasks(self, tasks, kind=TASK_YOUTUBE):
+        """Añade tareas (ignorando las repetidas) y devuelve cuántas se crearon"""
+        with closing(self._connect()) as conn, conn:
+            return self._insert_tasks(conn, kind, tasks)
+
+    def tasks(self, kind=TASK_YOUTUBE):
+        """Todas las tareas del tipo indicado, por fecha programada"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, processed, data FROM tasks WHERE kind = ? ORDER BY scheduled_date, id", (kind,)
+            ).fetchall()
+        return [self._task(row) for row in rows]
+
+    def tasks_page(self, kind=TASK_YOUTUBE, offset=0, limit=50):
+        """Una página de tareas por fecha programada y el total de tareas del tipo"""
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COUNT(*) FROM tasks WHERE kind = ?", (kind,)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT id, processed, data FROM tasks WHERE kind = ? ORDER BY scheduled_date, id LIMIT ? OFFSET ?",
+                (kind, limit, offset)
+            ).fetchall()
+        return [self._task(row) for row in rows], total
+
+    def scheduled_video_ids(self, kind=TASK_YOUTUBE):
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT DISTINCT video_id FROM tasks WHERE kind = ?", (kind,))}
+
+    def task_for_video(self, video_id, kind=TASK_YOUTUBE):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, processed, data FROM tasks WHERE kind = ? AND video_id = ? ORDER BY id DESC LIMIT 1",
+                (kind, video_id)
+            ).fetchone()
+        return self._task(row) if row else None
+
+    def task(self, task_id):
+        """La tarea con ese ID, o None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT id, processed, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._task(row) if row else None
+
+    def update_task(self, task_id, **fields):
+        """Guarda campos en los datos de una tarea (p. ej. los resultados de sus pasos)"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET data = ? WHERE id = ?",
+                             (json.dumps({**json.loads(row[0]), **fields}, ensure_ascii=False), task_id))
+
+    def pending_tasks(self, kind=TASK_YOUTUBE, now=None, limit=None):
+        """Tareas sin procesar cuya fecha ya pasó, de la más antigua a la más reciente"""
+        now = (now or datetime.now()).isoformat()
+        query = ("SELECT id, processed, data FROM tasks "
+                 "WHERE processed = 0 AND scheduled_date <= ? AND kind = ? ORDER BY scheduled_date, id")
+        params = [now, kind]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            return [self._task(row) for row in conn.execute(query, params)]
+
+    def mark_processed(self, task_id, processed=True):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE tasks SET processed = ? WHERE id = ?", (int(processed), task_id))
+
+    # ------------------------------------------------------------------
+    # Importación de los JSON anteriores
+    # ------------------------------------------------------------------
+
+    def _import_file(self, conn, path, load):
+        """Importa ``path`` si cambió desde la última importación; devuelve filas nuevas"""
+        if not path or not os.path.exists(path):
+            return 0
+        signature = _file_signature(path)
+        if self._get_meta(conn, f"import:{os.path.abspath(path)}") == signature:
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            imported = load(json.load(f))
+        self._set_meta(conn, f"import:{os.path.abspath(path)}", signature)
+        return imported
+
+    def _load_episodes(self, conn, episodes):
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO episodes (guid, youtube_id, data) VALUES (?, ?, ?)",
+            [(episode_guid(e), e.get('youtube_id'), json.dumps(e, ensure_ascii=False)) for e in episodes]
+        )
+        return conn.total_changes - before
+
+    def _load_schedule(self, conn, plan):
+        # schedule.json usa file_id/name/uploaded; se guardan tal cual en data
+        tasks = [
+            {**entry, 'video_id': entry['file_id'], 'title': entry.get('name', ""), 'processed': entry.get('uploaded')}
+            for entry in plan
+        ]
+        created = self._insert_tasks(conn, TASK_DRIVE, tasks)
+        # Las marcadas como subidas en el JSON también se dan por procesadas aquí
+        conn.executemany(
+            "UPDATE tasks SET processed = 1 WHERE kind = ? AND video_id = ? AND scheduled_date = ?",
+            [(TASK_DRIVE, task['video_id'], canonical_date(task['scheduled_date']))
+             for task in tasks if task['processed']]
+        )
+        return created
+
+    def import_json(self, episodes_file=EPISODES_FILE, tasks_file=TASKS_FILE, schedule_file=SCHEDULE_FILE):
+        """Importa los JSON de versiones anteriores; es idempotente y barato si no cambiaron
+
+        Devuelve {archivo: filas importadas}.
+        """
+        with closing(self._connect()) as conn, conn:
+            return {
+                EPISODES_FILE: self._import_file(conn, episodes_file, lambda data: self._load_episodes(conn, data)),
+                TASKS_FILE: self._import_file(conn, tasks_file,
+                                              lambda data: self._insert_tasks(conn, TASK_YOUTUBE, data)),
+                SCHEDULE_FILE: self._import_file(conn, schedule_file, lambda data: self._load_schedule(conn, data)),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa episodios y tareas de los JSON anteriores a SQLite")
+    parser.add_argument("--db", default=STORE_DB)
+    args = parser.parse_args()
+    for path, count in PodcastStore(args.db).import_json().items():
+        print(f"📥 {path}: {count} registros importados")
+
+
+if __name__ == "__main__":
+    main()
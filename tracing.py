@@ -0,0 +1,193 @@
+"""Trazas por etapa de la publicación: tiempo, bytes, llamadas a la API y reintentos
+
+Cada publicación (o cada ejecución de upload_task) crea un ``Trace`` y
+envuelve cada etapa en ``with trace.span("etapa") as span:``. Al cerrarse,
+cada span se añade como una línea JSON a ``TRACE_FILE`` y se acumula en
+``METRICS``, que se exporta en formato de texto de Prometheus.
+
+Las llamadas a la API y los reintentos se apuntan en el span activo del
+hilo (quota, uploads y downloads llaman a ``record_api_call`` y
+``record_retry``), así que dos etapas en paralelo no se mezclan.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Vacío para no escribir las trazas en disco
+TRACE_FILE = os.getenv("TRACE_FILE", "trazas.jsonl")
+PROMETHEUS_FILE = os.getenv("PROMETHEUS_FILE", "metricas.prom")
+
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+def record_api_call(count=1):
+    span = _current_span.get()
+    if span is not None:
+        span.add(api_calls=count)
+
+
+def record_retry(count=1):
+    span = _current_span.get()
+    if span is not None:
+        span.add(retries=count)
+
+
+class Span:
+    """Una etapa de una ejecución"""
+
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.bytes = 0
+        self.api_calls = 0
+        self.retries = 0
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add(self, bytes=0, api_calls=0, retries=0):
+        with self._lock:
+            self.bytes += bytes
+            self.api_calls += api_calls
+            self.retries += retries
+
+    def add_bytes(self, count):
+        self.add(bytes=count or 0)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    @property
+    def mb_per_second(self):
+        if not self.bytes or not self.duration:
+            return None
+        return self.bytes / self.duration / (1024 * 1024)
+
+    def as_dict(self):
+        return {
+            "stage": self.stage,
+            "start": self.started_at,
+            "duration": round(self.duration, 4),
+            "bytes": self.bytes,
+            "mb_s": round(self.mb_per_second, 2) if self.mb_per_second else None,
+            "api_calls": self.api_calls,
+            "retries": self.retries,
+            "error": self.error,
+            **({"attrs": self.attrs} if self.attrs else {}),
+        }
+
+
+class Trace:
+    """Spans de una ejecución, para mostrar el desglose de tiempos al terminar"""
+
+    def __init__(self, name, trace_file=TRACE_FILE, metrics=None):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_file = trace_file
+        self.metrics = metrics or METRICS
+        self.spans = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        span = Span(stage, attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self.trace_file:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"run": self.run_id, "trace": self.name, **span.as_dict()},
+                                       ensure_ascii=False) + "\n")
+        self.metrics.observe(span)
+
+    def breakdown(self):
+        """Spans por orden de inicio, como dicts"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.started_at)
+        return [span.as_dict() for span in spans]
+
+    def summary(self):
+        partes = [
+            f"{span['stage']} {span['duration']:.1f}s"
+            + (f" ({span['mb_s']:.1f} MB/s)" if span['mb_s'] else "")
+            for span in self.breakdown()
+        ]
+        return f"{self.elapsed:.1f}s en total: " + ", ".join(partes)
+
+
+class StageMetrics:
+    """Totales por etapa de todas las ejecuciones del proceso, para Prometheus"""
+
+    FIELDS = ("count", "errors", "seconds", "bytes", "api_calls", "retries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def observe(self, span):
+        with self._lock:
+            totals = self._totals[span.stage]
+            totals["count"] += 1
+            totals["errors"] += span.error is not None
+            totals["seconds"] += span.duration
+            totals["bytes"] += span.bytes
+            totals["api_calls"] += span.api_calls
+            totals["retries"] += span.retries
+
+    def snapshot(self):
+        """Devuelve {etapa: totales}"""
+        with self._lock:
+            return {stage: dict(totals) for stage, totals in sorted(self._totals.items())}
+
+    def prometheus_text(self):
+        metrics = [
+            ("podcast_stage_runs_total", "count", "Etapas ejecutadas"),
+            ("podcast_stage_errors_total", "errors", "Etapas que terminaron con error"),
+            ("podcast_stage_seconds_total", "seconds", "Segundos dedicados a cada etapa"),
+            ("podcast_stage_bytes_total", "bytes", "Bytes movidos en cada etapa"),
+            ("podcast_stage_api_calls_total", "api_calls", "Llamadas a la API de cada etapa"),
+            ("podcast_stage_retries_total", "retries", "Reintentos de cada etapa"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for name, field, help_text in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, totals in snapshot.items():
+                label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                value = totals[field]
+                lines.append(f'{name}{{stage="{label}"}} {value if isinstance(value, int) else f"{value:.6f}"}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=PROMETHEUS_FILE):
+        """Escribe las métricas de forma atómica (para el textfile collector de node_exporter)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+METRICS = StageMetrics()
@@ -1,12 +1,23 @@
+import argparse
 import os
 import json
-from datetime import datetime
-from moviepy.editor import VideoFileClip
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from oauth2client.file import Storage
-from oauth2client.client import flow_from_clientsecrets
-from feedgen.feed import FeedGenerator
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from dedupe import ContentIndex, drive_source_key
+from feeds import FeedUploadState, build_feeds, episode_guid, rfc822_now, upload_pending_feeds
+from downloads import DOWNLOADS, drive_download_path
+from drive_bulk import share_publicly
+from google_services import DRIVE_CREDENTIALS, cache_summary, get_credentials, get_service, upload_public_file
+from jobs import (JOB_DONE, JOB_SKIPPED, STAGE_DOWNLOAD, STAGE_TRANSCODE, STAGE_UPLOAD,
+                  JobExecutor, JobQueue, JobSkipped)
+from media import AUDIO_METADATA_KEYS
+from quota import QUOTA
+from storage import SCHEDULE_FILE, TASK_DRIVE, PodcastStore
+from tracing import METRICS, Trace
+from uploads import bearer_headers
 
 # ============
 # CONFIGURACIÓN
@@ -14,103 +25,228 @@ from feedgen.feed import FeedGenerator
 DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
 YT_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
-# Cargar credenciales desde variables de entorno (como en tu app)
-yt_json_str = os.getenv("YOUTUBE_JSON")
-drive_json_str = os.getenv("DRIVE_JSON")
+def write_client_secrets():
+    # Cargar credenciales desde variables de entorno (como en tu app)
+    yt_json_str = os.getenv("YOUTUBE_JSON")
+    drive_json_str = os.getenv("DRIVE_JSON")
 
-with open("client_secret.json", "w") as f:
-    f.write(yt_json_str)
-with open("client_secret_drive.json", "w") as f:
-    f.write(drive_json_str)
+    with open("client_secret.json", "w") as f:
+        f.write(yt_json_str)
+    with open("client_secret_drive.json", "w") as f:
+        f.write(drive_json_str)
 
 def get_drive_service():
-    flow = flow_from_clientsecrets("client_secret_drive.json", DRIVE_SCOPES)
-    storage = Storage("drive_credentials.json")
-    creds = storage.get()
-    if not creds or creds.invalid:
+    service = get_service("drive", "v3", DRIVE_CREDENTIALS)
+    if not service:
         raise RuntimeError("Credenciales de Drive inválidas")
-    return build("drive", "v3", credentials=creds)
-
-def upload_or_update_file(filepath, file_id=None):
-    service = get_drive_service()
-    folder_name = "Podcast"
-    results = service.files().list(
-        q=f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false",
-        spaces='drive',
-        fields="files(id, name)"
-    ).execute()
-    items = results.get('files', [])
-    folder_id = items[0]['id'] if items else service.files().create(
-        body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}, fields='id'
-    ).execute()['id']
-
-    media = MediaFileUpload(filepath, resumable=True)
-    if file_id:
-        file = service.files().update(fileId=file_id, media_body=media).execute()
-    else:
-        file_metadata = {"name": os.path.basename(filepath), "parents": [folder_id]}
-        file = service.files().create(body=file_metadata, media_body=media, fields="id").execute()
-        file_id = file["id"]
-        service.permissions().create(fileId=file_id, body={"role": "reader", "type": "anyone"}).execute()
-    return f"https://drive.google.com/uc?export=download&id={file_id}", file_id
+    return service
+
+def upload_or_update_file(filepath, file_id=None, new_files=None):
+    # Subida reanudable: si el job se reinicia, continúa donde se quedó. Con
+    # ``new_files`` los archivos nuevos no se comparten uno a uno: se apuntan
+    # ahí y share_new_files los hace públicos todos a la vez
+    if new_files is None:
+        return upload_public_file(filepath, file_id, "Podcast")
+    url, new_id = upload_public_file(filepath, file_id, "Podcast", share=False)
+    if not file_id:
+        new_files.append(new_id)
+    return url, new_id
+
+def share_new_files(new_files, trace, index=None):
+    """Hace públicos en lotes los archivos de ``new_files`` y vacía la lista
+
+    Con ``index`` también se comparten los audios del índice por contenido
+    que una ejecución anterior subió y no llegó a compartir (así un audio
+    reutilizado nunca queda privado), y se apuntan como compartidos los
+    que lo consiguen.
+    """
+    file_ids = list(dict.fromkeys([*new_files, *(index.unshared_file_ids() if index else [])]))
+    if not file_ids:
+        return
+    with trace.span("permisos de Drive", archivos=len(file_ids)):
+        result = share_publicly(get_drive_service(), file_ids)
+    for file_id, error in result.errors.items():
+        print(f"❌ No se pudo hacer público {file_id}: {error} (se reintenta en la siguiente ejecución)")
+    if index:
+        index.mark_shared([file_id for file_id in file_ids if file_id not in result.errors])
+    new_files.clear()
 
 # ============
-# PROCESAR SIGUIENTE TAREA
+# PROCESAR UNA TAREA
 # ============
-if not os.path.exists("schedule.json"):
-    print("❌ No existe el archivo schedule.json")
-    exit(0)
-
-with open("schedule.json") as f:
-    plan = json.load(f)
-
-pendiente = None
-for tarea in plan:
-    fecha = datetime.fromisoformat(tarea["scheduled_date"])
-    if not tarea["uploaded"] and datetime.now() >= fecha:
-        pendiente = tarea
-        break
-
-if not pendiente:
-    print("🕒 No hay publicaciones pendientes por fecha.")
-    exit(0)
-
-print(f"📤 Procesando tarea: {pendiente['name']}")
-
-# Descargar vídeo desde Drive
-service = get_drive_service()
-request = service.files().get_media(fileId=pendiente["file_id"])
-with open("temp_video.mp4", "wb") as f:
-    downloader = service._http.request(request.uri)
-    f.write(downloader[1])
-
-# Extraer audio
-clip = VideoFileClip("temp_video.mp4")
-clip.audio.write_audiofile("episode.mp3")
-clip.close()
-
-# Subir audio a Drive
-audio_url, _ = upload_or_update_file("episode.mp3")
-
-# Actualizar feed RSS
-fg = FeedGenerator()
-fg.load_extension("podcast")
-fg.title("Mi Podcast Automatizado")
-fg.link(href="https://tusitio.com/feed.xml", rel="self")
-fg.description("Podcast generado automáticamente desde GitHub Actions")
-fg.language("es")
-
-entry = fg.add_entry()
-entry.id(audio_url)
-entry.title(pendiente["name"])
-entry.enclosure(audio_url, 0, "audio/mpeg")
-fg.rss_file("feed.xml")
-
-feed_url, _ = upload_or_update_file("feed.xml")
-
-# Marcar como completado
-pendiente["uploaded"] = True
-with open("schedule.json", "w") as f:
-    json.dump(plan, f, indent=2)
-
-print(f"✅ Publicación completada y feed actualizado: {feed_url}")
+
+def make_task_handler(store, index, deadline, published, trace, new_files=None):
+    """Procesa una tarea de Drive por etapas; los episodios listos se añaden a ``published``
+
+    Las tareas que empiezan después de ``deadline`` (time.monotonic) se
+    omiten y quedan pendientes para la siguiente ejecución. Cada etapa se
+    mide en ``trace``. Los audios subidos se apuntan en ``new_files`` para
+    compartirlos después en lote. Las tareas no se marcan como procesadas
+    aquí sino cuando los feeds con sus episodios ya están subidos.
+    """
+    lock = threading.Lock()
+
+    def _handler(tarea, stage):
+        if deadline is not None and time.monotonic() > deadline:
+            raise JobSkipped("Sin tiempo en esta ejecución")
+
+        workdir = tempfile.mkdtemp(prefix="tarea_")
+        try:
+            # Drive ya da el MD5 del video: si su audio se publicó antes, no
+            # hace falta ni descargarlo
+            auth_headers = bearer_headers(get_credentials(DRIVE_CREDENTIALS))
+            with trace.span("metadatos de Drive", tarea=tarea["name"]):
+                metadata = DOWNLOADS.metadata(tarea["file_id"], auth_headers)
+            clave = drive_source_key(metadata["md5Checksum"])
+            audio = index.published_audio(clave)
+
+            if audio is None:
+                # Descargar vídeo desde Drive por rangos en paralelo a una ruta fija
+                # por archivo: si la tarea falla o el proceso muere, la siguiente
+                # ejecución continúa con los trozos que faltan y se verifica el MD5
+                with stage(STAGE_DOWNLOAD), trace.span("descarga", tarea=tarea["name"]) as span:
+                    video_path = DOWNLOADS.download(tarea["file_id"], drive_download_path(tarea["file_id"]),
+                                                    auth_headers=auth_headers)
+                    span.add_bytes(os.path.getsize(video_path))
+
+                # Extraer audio (copia directa de la pista si el códec lo permite)
+                with stage(STAGE_TRANSCODE), trace.span("extracción de audio", tarea=tarea["name"]) as span:
+                    audio = index.extract(video_path, os.path.join(workdir, f"{tarea['file_id']}.mp3"), clave)
+                    span.add_bytes(audio.get('audio_bytes'))
+
+                # Subir audio a Drive, salvo que ya esté ese mismo contenido
+                with stage(STAGE_UPLOAD), trace.span("subida a Drive", tarea=tarea["name"]) as span:
+                    span.add_bytes(audio.get('audio_bytes'))
+                    audio['url'], audio['file_id'] = index.upload(
+                        audio, lambda path: upload_or_update_file(path, new_files=new_files),
+                        shared=new_files is None)
+
+            episodio = {
+                'title': tarea["name"],
+                'description': tarea.get("description", ""),
+                'audio_url': audio['url'],
+                'pub_date': rfc822_now(),
+                **{campo: audio[campo] for campo in AUDIO_METADATA_KEYS if campo in audio}
+            }
+            # Si una ejecución anterior ya lo guardó (y no llegó a subir los
+            # feeds) el episodio conserva su fecha de publicación
+            anterior = store.episode(episode_guid(episodio))
+            if anterior:
+                episodio['pub_date'] = anterior['pub_date']
+            store.add_episode(episodio)
+            with lock:
+                published.append((tarea, episodio))
+            # El video descargado solo se conserva mientras la tarea no termina
+            if os.path.exists(drive_download_path(tarea["file_id"])):
+                os.remove(drive_download_path(tarea["file_id"]))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return _handler
+
+def mark_schedule_uploaded(tareas):
+    """Marca las tareas como subidas en schedule.json, para quien lo edite a mano"""
+    hechas = {(tarea["file_id"], tarea["scheduled_date"]) for tarea in tareas}
+    with open(SCHEDULE_FILE) as f:
+        plan = json.load(f)
+    for tarea in plan:
+        if (tarea["file_id"], tarea["scheduled_date"]) in hechas:
+            tarea["uploaded"] = True
+    with open(SCHEDULE_FILE, "w") as f:
+        json.dump(plan, f, indent=2)
+
+# ============
+# PROCESAR TODAS LAS TAREAS VENCIDAS
+# ============
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica las tareas de schedule.json cuya fecha ya pasó")
+    parser.add_argument("--max-items", type=int, default=None, help="máximo de tareas en esta ejecución")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="segundos tras los que no se empiezan más tareas")
+    args = parser.parse_args()
+    started = time.monotonic()
+    deadline = started + args.deadline if args.deadline else None
+
+    write_client_secrets()
+
+    if not os.path.exists(SCHEDULE_FILE):
+        print(f"❌ No existe el archivo {SCHEDULE_FILE}")
+        return 0
+
+    # schedule.json se sigue editando a mano: las entradas nuevas se importan
+    # a la base de datos y las tareas vencidas se buscan por índice
+    store = PodcastStore()
+    store.import_json(episodes_file=None, tasks_file=None)
+    pendientes = store.pending_tasks(kind=TASK_DRIVE, limit=args.max_items)
+
+    if not pendientes:
+        print("🕒 No hay publicaciones pendientes por fecha.")
+        # Una ejecución anterior pudo fallar al subir los feeds
+        if FeedUploadState().pending():
+            get_drive_service()
+            for nombre, feed_url in upload_pending_feeds(upload_or_update_file).items():
+                print(f"   {nombre}: {feed_url}")
+        return 0
+
+    get_drive_service()  # falla pronto si las credenciales no son válidas
+    print(f"📤 Procesando {len(pendientes)} tareas: " + ", ".join(tarea["name"] for tarea in pendientes))
+
+    # Descargas, extracciones y subidas de distintas tareas se solapan, con
+    # un límite de tareas a la vez en cada etapa
+    published = []
+    trace = Trace("upload_task")
+    queue = JobQueue(kind=TASK_DRIVE)
+    index = ContentIndex()
+    new_files = []
+    executor = JobExecutor(make_task_handler(store, index, deadline, published, trace, new_files), queue)
+    # Primero los trabajos que una ejecución anterior dejó a medias
+    job_ids = executor.resume() + executor.submit(pendientes)
+    executor.shutdown(wait=True)
+
+    # Los audios nuevos se hacen públicos en peticiones por lotes antes de
+    # que los feeds apunten a ellos (también los de tareas que fallaron)
+    share_new_files(new_files, trace, index)
+
+    # Todos los episodios nuevos entran en los feeds de una vez y cada feed
+    # que cambió se sube una sola vez
+    feed_urls = {}
+    if published:
+        published.sort(key=lambda item: item[0]["scheduled_date"])
+        with trace.span("generación de feeds"):
+            build_feeds([episodio for _, episodio in published])
+        with trace.span("subida de feeds"):
+            feed_urls = upload_pending_feeds(
+                lambda path, file_id: upload_or_update_file(path, file_id, new_files))
+        share_new_files(new_files, trace)
+        # Solo ahora, con los feeds subidos, las tareas dejan de estar pendientes
+        for tarea, _ in published:
+            store.mark_processed(tarea["id"])
+        mark_schedule_uploaded([tarea for tarea, _ in published])
+
+    trabajos = [trabajo for trabajo in queue.jobs(limit=len(job_ids)) if trabajo["id"] in job_ids]
+    fallidos = [trabajo for trabajo in trabajos if trabajo["state"] not in (JOB_DONE, JOB_SKIPPED)]
+    omitidos = [trabajo for trabajo in trabajos if trabajo["state"] == JOB_SKIPPED]
+
+    print(f"✅ {len(published)} episodios publicados en {time.monotonic() - started:.0f}s")
+    for trabajo in fallidos:
+        print(f"❌ {trabajo['title']}: {trabajo['error']}")
+    if omitidos:
+        print(f"⏭️ {len(omitidos)} tareas quedan para la siguiente ejecución (--deadline)")
+    for nombre, feed_url in feed_urls.items():
+        print(f"   {nombre}: {feed_url}")
+    for nombre, resumen in cache_summary().items():
+        print(f"📊 Caché de {nombre}: {resumen}")
+    print(f"📊 Contenido ya publicado: {index.stats.summary()}")
+    print(f"📉 Cuota: {QUOTA.summary()}")
+    print(f"⏱️ Tiempos por etapa ({trace.elapsed:.0f}s en total):")
+    for etapa, totales in METRICS.snapshot().items():
+        mb = totales['bytes'] / (1024 * 1024)
+        velocidad = f", {mb / totales['seconds']:.1f} MB/s" if mb and totales['seconds'] else ""
+        print(f"   {etapa}: {totales['count']} × {totales['seconds'] / totales['count']:.1f}s de media, "
+              f"{mb:.1f} MB{velocidad}, {totales['api_calls']} llamadas, {totales['retries']} reintentos")
+    METRICS.write_prometheus()
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
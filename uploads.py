@@ -0,0 +1,267 @@
+"""Subidas reanudables a YouTube y Drive con la sesión persistida en disco"""
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import threading
+import time
+
+import requests
+
+from http_pool import SESSION
+from tracing import record_retry
+
+# Se puede apuntar a un servidor local de pruebas (benchmarks/fake_google_api.py)
+UPLOAD_BASE_URL = os.getenv("GOOGLE_UPLOAD_BASE_URL", "https://www.googleapis.com/upload")
+
+# Sesiones en curso: URI de subida y último byte confirmado por el servidor
+UPLOAD_STATE_FILE = "subidas_pendientes.json"
+
+# Google exige trozos múltiplos de 256 KiB (salvo el último)
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_MB", "16")) * 1024 * 1024
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 8
+MAX_BACKOFF = 64
+
+
+class UploadError(Exception):
+    """La subida no se pudo completar"""
+
+
+def youtube_upload_url(part="snippet,status"):
+    return f"{UPLOAD_BASE_URL}/youtube/v3/videos?uploadType=resumable&part={part}"
+
+
+def drive_upload_url(file_id=None, fields="id"):
+    if file_id:
+        return f"{UPLOAD_BASE_URL}/drive/v3/files/{file_id}?uploadType=resumable&fields={fields}"
+    return f"{UPLOAD_BASE_URL}/drive/v3/files?uploadType=resumable&fields={fields}"
+
+
+def bearer_headers(credentials):
+    """Cabeceras de autorización con el token de unas credenciales de oauth2client"""
+    def _headers():
+        return {"Authorization": f"Bearer {credentials.get_access_token().access_token}"}
+    return _headers
+
+
+def file_fingerprint(filepath, sample=64 * 1024):
+    """Huella rápida del archivo: tamaño más el principio y el final del contenido"""
+    size = os.path.getsize(filepath)
+    digest = hashlib.sha256(str(size).encode())
+    with open(filepath, "rb") as f:
+        digest.update(f.read(sample))
+        if size > sample:
+            f.seek(max(sample, size - sample))
+            digest.update(f.read(sample))
+    return digest.hexdigest()
+
+
+class UploadStateStore:
+    """Guarda el estado de las subidas en un JSON escrito de forma atómica"""
+
+    def __init__(self, path=UPLOAD_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, states):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(states, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        with self._lock:
+            return self._read().get(key)
+
+    def save(self, key, state):
+        with self._lock:
+            states = self._read()
+            states[key] = state
+            self._write(states)
+
+    def delete(self, key):
+        with self._lock:
+            states = self._read()
+            if states.pop(key, None) is not None:
+                self._write(states)
+
+
+class ResumableUploadManager:
+    """Sube archivos con el protocolo reanudable de Google por trozos
+
+    Tras cada trozo confirmado se persiste la URI de la sesión y el offset,
+    así que si el proceso muere la siguiente llamada con el mismo archivo y
+    metadatos pregunta al servidor cuánto recibió y continúa desde ahí. Los
+    errores 5xx/429 y de conexión se reintentan con espera exponencial.
+    """
+
+    def __init__(self, state_file=UPLOAD_STATE_FILE, chunk_size=DEFAULT_CHUNK_SIZE,
+                 max_retries=MAX_RETRIES, session=None, sleep=time.sleep):
+        self.store = UploadStateStore(state_file)
+        self.chunk_size = max(CHUNK_GRANULARITY, chunk_size - chunk_size % CHUNK_GRANULARITY)
+        self.max_retries = max_retries
+        self.session = session or requests.Session()
+        self.sleep = sleep
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        if attempt > self.max_retries:
+            raise UploadError(f"Demasiados reintentos ({self.max_retries})")
+        with self._lock:
+            self.retries += 1
+        record_retry()
+        self.sleep(min(2 ** attempt, MAX_BACKOFF) + random.random())
+
+    def _initiate(self, init_url, metadata, total, content_type, auth_headers, method):
+        headers = {
+            "X-Upload-Content-Length": str(total),
+            "X-Upload-Content-Type": content_type,
+            **(auth_headers() if auth_headers else {}),
+        }
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, init_url, json=metadata, headers=headers, timeout=60)
+            except requests.RequestException:
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code != 200 or "Location" not in response.headers:
+                raise UploadError(f"No se pudo iniciar la subida ({response.status_code}): {response.text[:200]}")
+            return response.headers["Location"]
+
+    def _confirmed_offset(self, response):
+        """Siguiente byte a enviar según la cabecera Range de una respuesta 308"""
+        received = response.headers.get("Range")
+        if not received:
+            return 0
+        return int(received.rsplit("-", 1)[1]) + 1
+
+    def _query_offset(self, uri, total):
+        """Pregunta al servidor cuántos bytes tiene; None si la sesión caducó"""
+        attempt = 0
+        while True:
+            try:
+                response = self.session.put(
+                    uri, headers={"Content-Range": f"bytes */{total}", "Content-Length": "0"}, timeout=60
+                )
+            except requests.RequestException:
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                attempt += 1
+                self._backoff(attempt)
+                continue
+            if response.status_code == 308:
+                return self._confirmed_offset(response)
+            if response.status_code in (200, 201):
+                return total
+            if response.status_code in (404, 410):
+                return None
+            raise UploadError(f"Estado de subida inesperado ({response.status_code})")
+
+    def upload(self, filepath, init_url, metadata, auth_headers=None, content_type=None,
+               progress=None, key=None, method="POST"):
+        """Sube ``filepath`` y devuelve el JSON final de la API
+
+        ``init_url`` es la URL de inicio de sesión (ver youtube_upload_url y
+        drive_upload_url) y ``metadata`` el cuerpo JSON del recurso. ``key``
+        identifica la subida en el estado persistido; por defecto se deriva
+        del contenido del archivo, la URL y los metadatos.
+        """
+        total = os.path.getsize(filepath)
+        content_type = content_type or mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+        if key is None:
+            key = hashlib.sha256(json.dumps(
+                [file_fingerprint(filepath), init_url, metadata], sort_keys=True
+            ).encode()).hexdigest()
+
+        state = self.store.get(key)
+        for _ in range(self.max_retries + 1):
+            uri, offset = None, 0
+            if state and state.get("size") == total:
+                offset = self._query_offset(state["uri"], total)
+                if offset is not None:
+                    uri = state["uri"]
+            if uri is None:
+                uri, offset = self._initiate(init_url, metadata, total, content_type, auth_headers, method), 0
+            self.store.save(key, {"uri": uri, "offset": offset, "size": total, "path": os.path.abspath(filepath)})
+
+            result = self._send(filepath, uri, offset, total, key, progress)
+            if result is not None:
+                return result
+            # La sesión caducó: se empieza una nueva desde cero
+            self.store.delete(key)
+            state = None
+        raise UploadError(f"La sesión de subida caducó {self.max_retries + 1} veces")
+
+    def _send(self, filepath, uri, offset, total, key, progress):
+        """Envía el archivo desde ``offset``; devuelve el JSON final o None si la sesión caducó"""
+        attempt = 0
+        with open(filepath, "rb") as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                if chunk:
+                    content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{total}"
+                else:
+                    content_range = f"bytes */{total}"
+                try:
+                    response = self.session.put(
+                        uri, data=chunk,
+                        headers={"Content-Range": content_range, "Content-Length": str(len(chunk))},
+                        timeout=300
+                    )
+                except requests.RequestException:
+                    response = None
+
+                if response is not None and response.status_code in (200, 201):
+                    self.store.delete(key)
+                    if progress:
+                        progress(1.0)
+                    return response.json()
+
+                if response is not None and response.status_code == 308:
+                    offset = self._confirmed_offset(response)
+                    attempt = 0
+                    self.store.save(key, {"uri": uri, "offset": offset, "size": total,
+                                          "path": os.path.abspath(filepath)})
+                    if progress and total:
+                        progress(offset / total)
+                    continue
+
+                if response is not None and response.status_code in (404, 410):
+                    return None
+
+                if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                    raise UploadError(f"Error en la subida ({response.status_code}): {response.text[:200]}")
+
+                # Error transitorio: esperar y preguntar qué llegó antes de seguir
+                attempt += 1
+                self._backoff(attempt)
+                offset = self._query_offset(uri, total)
+                if offset is None:
+                    return None
+
+
+# Comparte el pool de conexiones con los clientes de la API
+UPLOADS = ResumableUploadManager(session=SESSION)
@@ -0,0 +1,302 @@
+"""Publica automáticamente los videos que se dejan en la carpeta Pendientes
+
+Cada video que aparece en la carpeta se sube a YouTube y su audio se
+publica en el podcast con el mismo proceso que la pestaña de subida, pero
+directamente desde disco. Un video se procesa cuando lleva ``--settle``
+segundos sin cambiar de tamaño (se está copiando mientras crece). Los
+cambios se detectan con inotify (watchdog) y, si no está disponible,
+revisando la carpeta cada ``--interval`` segundos.
+
+Los metadatos de cada video van en un JSON con el mismo nombre
+(``clase.mp4`` → ``clase.json``), que debe estar antes que el video::
+
+    {"title": "Clase de Yoga Matutina", "description": "...",
+     "tags": ["yoga", "meditación"], "privacy": "privado",
+     "publish_at": "2026-01-15T09:00"}
+
+Sin ese archivo el título es el nombre del video y se sube como privado.
+Los videos publicados se mueven a ``Pendientes/publicados``.
+
+Uso: python watch_folder.py [--workers 2] [--once]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+from dedupe import ContentIndex, source_key
+from google_services import DRIVE_CREDENTIALS, YOUTUBE_CREDENTIALS, get_service
+from jobs import ACTIVE_STATES, JobExecutor, JobQueue, process_folder_video
+from quota import QUOTA
+from storage import TASK_FOLDER, PodcastStore
+
+PENDING_DIR = "Pendientes"
+PUBLISHED_SUBDIR = "publicados"
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "10"))
+POLL_INTERVAL = float(os.getenv("WATCH_INTERVAL", "2"))
+DEFAULT_WORKERS = int(os.getenv("WATCH_WORKERS", "2"))
+
+SPAIN_TZ = pytz.timezone('Europe/Madrid')
+
+# Valores de privacidad admitidos en el JSON, en español o como en la API
+PRIVACY_VALUES = {
+    "privado": "private",
+    "oculto": "unlisted",
+    "público": "public",
+    "publico": "public",
+    "private": "private",
+    "unlisted": "unlisted",
+    "public": "public",
+}
+
+
+def is_video(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def sidecar_path(video_path):
+    return os.path.splitext(video_path)[0] + ".json"
+
+
+def read_sidecar(video_path):
+    """Título, descripción, tags, privacidad y fecha de publicación del video
+
+    Cualquier error en el JSON (también un valor del tipo equivocado) se
+    lanza como ValueError.
+    """
+    metadata = {}
+    if os.path.exists(sidecar_path(video_path)):
+        with open(sidecar_path(video_path), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    if not isinstance(metadata, dict):
+        raise ValueError("el JSON debe ser un objeto")
+    for campo in ("title", "description", "privacy", "publish_at"):
+        if metadata.get(campo) is not None and not isinstance(metadata[campo], str):
+            raise ValueError(f"«{campo}» debe ser un texto")
+
+    tags = metadata.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("«tags» debe ser una lista de textos o un texto separado por comas")
+    privacy = PRIVACY_VALUES.get((metadata.get("privacy") or "private").lower())
+    if privacy is None:
+        raise ValueError(f"Privacidad no válida: {metadata['privacy']}")
+
+    publish_at = None
+    if metadata.get("publish_at"):
+        # Las fechas sin zona horaria son de la hora española
+        fecha = datetime.fromisoformat(metadata["publish_at"])
+        publish_at = (fecha if fecha.tzinfo else SPAIN_TZ.localize(fecha)).isoformat()
+
+    return {
+        'title': metadata.get("title") or os.path.splitext(os.path.basename(video_path))[0],
+        'description': metadata.get("description") or "",
+        'tags': tags,
+        'privacy': privacy,
+        'publish_at': publish_at,
+    }
+
+
+class FolderWatcher:
+    """Detecta los videos de una carpeta que ya terminaron de escribirse
+
+    Con inotify solo se revisan los archivos que generaron algún evento; sin
+    él se lista la carpeta en cada llamada a ``ready()``. Un archivo está
+    listo cuando su tamaño y fecha de modificación no cambian durante
+    ``settle`` segundos, y solo se devuelve una vez mientras no cambie.
+    """
+
+    def __init__(self, directory=PENDING_DIR, settle=SETTLE_SECONDS, use_inotify=True):
+        self.directory = directory
+        self.settle = settle
+        self.use_inotify = use_inotify
+        self.observer = None
+        self._changed = set()
+        self._lock = threading.Lock()
+        self._candidates = {}  # ruta -> (firma, desde cuándo no cambia)
+        self._emitted = {}     # ruta -> firma con la que se devolvió
+
+    def start(self):
+        if self.use_inotify:
+            try:
+                self.observer = self._start_observer()
+            except (ImportError, OSError) as e:
+                print(f"⚠️ Sin inotify ({e}); se revisa la carpeta cada pocos segundos")
+        # Los videos que ya estaban en la carpeta
+        self._mark_changed(self._scan())
+        return self
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    watcher._mark_changed([event.src_path, getattr(event, "dest_path", "")])
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.directory, recursive=False)
+        observer.start()
+        return observer
+
+    def stop(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+
+    def _scan(self):
+        return [entry.path for entry in os.scandir(self.directory) if entry.is_file() and is_video(entry.path)]
+
+    def _mark_changed(self, paths):
+        with self._lock:
+            self._changed.update(os.path.abspath(path) for path in paths if path and is_video(path))
+
+    def _take_changed(self):
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def idle(self):
+        """No hay archivos pendientes de terminar de escribirse"""
+        with self._lock:
+            return not self._changed and not self._candidates
+
+    def ready(self, now=None):
+        """Rutas de los videos que ya no cambian y no se habían devuelto"""
+        now = now if now is not None else time.monotonic()
+        paths = self._take_changed() | set(self._candidates)
+        if self.observer is None:
+            paths |= {os.path.abspath(path) for path in self._scan()}
+
+        ready = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._candidates.pop(path, None)
+                self._emitted.pop(path, None)
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._emitted.get(path) == signature:
+                continue
+            previous, since = self._candidates.get(path, (None, now))
+            if previous != signature:
+                self._candidates[path] = (signature, now)
+            elif stat.st_size and now - since >= self.settle:
+                del self._candidates[path]
+                self._emitted[path] = signature
+                ready.append(path)
+        return sorted(ready)
+
+
+def archive(video_path):
+    """Mueve el video y su JSON a la subcarpeta de publicados"""
+    destino = os.path.join(os.path.dirname(video_path), PUBLISHED_SUBDIR)
+    os.makedirs(destino, exist_ok=True)
+    for ruta in (video_path, sidecar_path(video_path)):
+        if os.path.exists(ruta):
+            shutil.move(ruta, os.path.join(destino, os.path.basename(ruta)))
+
+
+def make_handler(store, index):
+    def _handler(task, stage):
+        video_id = process_folder_video(task, stage, store, index)
+        archive(task['path'])
+        print(f"✅ {task['title']}: https://www.youtube.com/watch?v={video_id}")
+    return _handler
+
+
+def enqueue_video(path, store, executor):
+    """Crea la tarea del video y la lanza; devuelve el ID del trabajo o None"""
+    try:
+        task = {**read_sidecar(path), 'path': path}
+    except ValueError as e:
+        print(f"❌ {os.path.basename(path)}: metadatos no válidos ({e})")
+        return None
+
+    # La clave de contenido evita publicar dos veces el mismo video aunque
+    # se copie con otro nombre
+    task['video_id'] = source_key(path)
+    existente = store.task_for_video(task['video_id'], kind=TASK_FOLDER)
+    if existente and existente['processed']:
+        print(f"⏭️ {os.path.basename(path)} ya se publicó como «{existente['title']}»")
+        archive(path)
+        return None
+    if existente:
+        trabajo = executor.queue.latest(existente['id'])
+        if trabajo and trabajo['state'] not in ACTIVE_STATES:
+            print(f"❌ {os.path.basename(path)} falló ({trabajo['error'] or trabajo['state']}); "
+                  "se reintenta al reiniciar")
+        else:
+            print(f"⏭️ {os.path.basename(path)} ya está en la cola")
+        return None
+
+    task['scheduled_date'] = datetime.now().isoformat()
+    store.add_tasks([task], kind=TASK_FOLDER)
+    task = store.task_for_video(task['video_id'], kind=TASK_FOLDER)
+    job_ids = executor.submit([task])
+    if job_ids:
+        print(f"📥 En cola: {task['title']}")
+    return job_ids[0] if job_ids else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica los videos que se dejan en la carpeta Pendientes")
+    parser.add_argument("--dir", default=PENDING_DIR, help="carpeta vigilada")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="videos procesados a la vez")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="segundos sin cambios para dar un video por copiado")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="segundos entre revisiones")
+    parser.add_argument("--polling", action="store_true", help="no usar inotify")
+    parser.add_argument("--once", action="store_true",
+                        help="procesar los videos que haya en la carpeta y terminar")
+    args = parser.parse_args()
+
+    if not get_service("youtube", "v3", YOUTUBE_CREDENTIALS) or not get_service("drive", "v3", DRIVE_CREDENTIALS):
+        print("❌ Faltan credenciales de YouTube o Drive: autentícate antes en la app")
+        return 1
+
+    store = PodcastStore()
+    queue = JobQueue(kind=TASK_FOLDER)
+    executor = JobExecutor(make_handler(store, ContentIndex()), queue, max_workers=args.workers)
+
+    # Los trabajos interrumpidos y los que fallaron se reintentan al arrancar
+    executor.resume()
+    executor.submit([task for task in store.pending_tasks(kind=TASK_FOLDER) if os.path.exists(task['path'])])
+
+    watcher = FolderWatcher(args.dir, args.settle, use_inotify=not args.polling).start()
+    print(f"👀 Vigilando {os.path.abspath(args.dir)}")
+    try:
+        while True:
+            for path in watcher.ready():
+                enqueue_video(path, store, executor)
+            if args.once and watcher.idle() and not any(
+                    count for state, count in queue.counts().items() if state in ACTIVE_STATES):
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("⏹️ Esperando a que terminen los trabajos en curso...")
+    finally:
+        watcher.stop()
+        executor.shutdown(wait=True)
+
+    for estado, total in sorted(queue.counts().items()):
+        print(f"📊 {estado}: {total}")
+    print(f"📉 Cuota: {QUOTA.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Listado del catálogo de videos del canal de YouTube"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from metrics import ApiCallCounter
+from pipeline import run_concurrently
+from quota import QUOTA
+
+# La API admite hasta 50 IDs separados por comas en videos().list
+VIDEOS_PER_REQUEST = 50
+
+# Catálogo persistente, junto a episodios.json
+CATALOG_DB = "catalogo_youtube.db"
+
+# Antigüedad máxima de las estadísticas antes de refrescarlas en segundo plano
+STATS_MAX_AGE = 6 * 3600
+
+
+def _video_entry(video):
+    """Convierte un recurso de videos().list al formato usado por la app"""
+    return {
+        'id': video['id'],
+        'title': video['snippet']['title'],
+        'description': video['snippet']['description'],
+        'published_at': video['snippet']['publishedAt'],
+        'view_count': video.get('statistics', {}).get('viewCount', 0),
+        'url': f"https://www.youtube.com/watch?v={video['id']}"
+    }
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _playlist_page_request(service, playlist_id, page_token=None):
+    return service.playlistItems().list(
+        part="snippet",
+        playlistId=playlist_id,
+        maxResults=50,
+        pageToken=page_token
+    )
+
+
+def _details_request(service, video_ids):
+    return service.videos().list(
+        part="snippet,statistics",
+        id=",".join(video_ids),
+        maxResults=VIDEOS_PER_REQUEST
+    )
+
+
+def _ordered_items(video_ids, response):
+    """Respeta el orden de la playlist aunque la API devuelva otro"""
+    by_id = {video['id']: video for video in response.get('items', [])}
+    return [by_id[video_id] for video_id in video_ids if video_id in by_id]
+
+
+def get_uploads_playlist_id(service, counter):
+    """Devuelve el ID de la playlist de subidas del canal autenticado"""
+    channels_response = counter.execute(
+        service.channels().list(part="contentDetails", mine=True), "channels.list"
+    )
+    if not channels_response.get('items'):
+        raise LookupError("No se encontró canal de YouTube")
+    return channels_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+
+
+def _playlist_videos(service, counter, playlist_id, page, known=(), pipeline=True):
+    """Recursos de videos().list de la playlist desde ``page``, en su orden
+
+    Se detiene en el primer video de ``known``. Con ``pipeline`` activo,
+    los detalles de una página viajan en la misma petición por lotes
+    (BatchHttpRequest) que la siguiente página de la playlist, de modo que
+    cada página cuesta un único viaje HTTP.
+    """
+    videos = []
+    while page is not None:
+        video_ids = []
+        reached_known = False
+        for item in page.get('items', []):
+            video_id = item['snippet']['resourceId']['videoId']
+            if video_id in known:
+                reached_known = True
+                break
+            video_ids.append(video_id)
+        next_page_token = None if reached_known else page.get('nextPageToken')
+
+        if pipeline and next_page_token and video_ids:
+            results = {}
+
+            def _callback(request_id, response, exception):
+                if exception is not None:
+                    raise exception
+                results[request_id] = response
+
+            batch = service.new_batch_http_request()
+            batch.add(_details_request(service, video_ids), callback=_callback, request_id="details")
+            batch.add(_playlist_page_request(service, playlist_id, next_page_token),
+                      callback=_callback, request_id="page")
+            counter.run(batch.execute, "videos.list", "playlistItems.list")
+
+            videos.extend(_ordered_items(video_ids, results["details"]))
+            page = results["page"]
+            continue
+
+        for ids in _chunks(video_ids, VIDEOS_PER_REQUEST):
+            details = counter.execute(_details_request(service, ids), "videos.list")
+            videos.extend(_ordered_items(ids, details))
+
+        page = counter.execute(
+            _playlist_page_request(service, playlist_id, next_page_token), "playlistItems.list"
+        ) if next_page_token else None
+    return videos
+
+
+def list_channel_videos(service, counter=None, pipeline=True):
+    """Lista todos los videos del canal con detalles agrupados en lotes de 50
+
+    Con ``pipeline`` activo cada página de la playlist cuesta un único
+    viaje HTTP (ver _playlist_videos).
+    """
+    counter = counter or ApiCallCounter(QUOTA)
+    uploads_playlist_id = get_uploads_playlist_id(service, counter)
+    page = counter.execute(_playlist_page_request(service, uploads_playlist_id), "playlistItems.list")
+    videos = [_video_entry(video)
+              for video in _playlist_videos(service, counter, uploads_playlist_id, page, pipeline=pipeline)]
+    counter.stop()
+    return videos
+
+
+def _execute_conditional(request, etag, counter, method):
+    """Ejecuta una petición con If-None-Match; devuelve None si no hubo cambios"""
+    from googleapiclient.errors import HttpError
+
+    if etag:
+        request.headers['If-None-Match'] = etag
+    try:
+        return counter.execute(request, method)
+    except HttpError as e:
+        if e.resp.status == 304:
+            return None
+        raise
+
+
+class ChannelCatalog:
+    """Catálogo persistente del canal en SQLite con ETags de la API"""
+
+    def __init__(self, path=CATALOG_DB):
+        self.path = path
+        self._refresh_thread = None
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    id TEXT PRIMARY KEY,
+                    etag TEXT,
+                    snippet TEXT NOT NULL,
+                    statistics TEXT NOT NULL DEFAULT '{}',
+                    published_at TEXT NOT NULL,
+                    stats_updated_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS videos_published ON videos (published_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def known_ids(self):
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT id FROM videos")}
+
+    def _entries(self, rows):
+        return [
+            _video_entry({'id': video_id, 'snippet': json.loads(snippet), 'statistics': json.loads(statistics)})
+            for video_id, snippet, statistics in rows
+        ]
+
+    def videos(self):
+        """Devuelve los videos guardados, del más reciente al más antiguo"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, snippet, statistics FROM videos ORDER BY published_at DESC"
+            ).fetchall()
+        return self._entries(rows)
+
+    def get(self, video_ids):
+        """Los videos con esos IDs, del más reciente al más antiguo"""
+        video_ids = list(video_ids)
+        if not video_ids:
+            return []
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT id, snippet, statistics FROM videos WHERE id IN ({','.join('?' * len(video_ids))}) "
+                "ORDER BY published_at DESC", video_ids
+            ).fetchall()
+        return self._entries(rows)
+
+    def page(self, query="", offset=0, limit=50, include_ids=None, exclude_ids=None):
+        """Una página de videos filtrada en SQLite y el total de videos que cumplen el filtro
+
+        ``query`` busca en el título; ``include_ids`` y ``exclude_ids``
+        limitan los resultados a esos IDs o los descartan.
+        """
+        clauses, params = [], []
+        if query:
+            pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("json_extract(snippet, '$.title') LIKE ? ESCAPE '\\'")
+            params.append(f"%{pattern}%")
+        if include_ids is not None:
+            clauses.append(f"id IN ({','.join('?' * len(include_ids))})" if include_ids else "0")
+            params.extend(include_ids)
+        if exclude_ids:
+            clauses.append(f"id NOT IN ({','.join('?' * len(exclude_ids))})")
+            params.extend(exclude_ids)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM videos{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT id, snippet, statistics FROM videos{where} ORDER BY published_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+        return self._entries(rows), total
+
+    def _store(self, conn, items, now):
+        conn.executemany(
+            "INSERT OR REPLACE INTO videos (id, etag, snippet, statistics, published_at, stats_updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (item['id'], item.get('etag'), json.dumps(item['snippet'], ensure_ascii=False),
+                 json.dumps(item.get('statistics', {})), item['snippet']['publishedAt'], now)
+                for item in items
+            ]
+        )
+
+    def refresh(self, service, counter=None, full=False):
+        """Incorpora los videos nuevos del canal y devuelve sus IDs
+
+        Recorre la playlist de subidas solo hasta el primer video ya conocido,
+        pidiendo los detalles de cada página junto con la siguiente (ver
+        _playlist_videos). La primera página se pide de forma condicional con su ETag, así que
+        un canal sin cambios cuesta una sola llamada (dos la primera vez).
+        Los cambios y borrados de videos ya conocidos los recoge
+        ``refresh_statistics``.
+        """
+        counter = counter or ApiCallCounter(QUOTA)
+        with closing(self._connect()) as conn:
+            playlist_id = self._get_meta(conn, "uploads_playlist_id")
+            first_page_etag = None if full else self._get_meta(conn, "first_page_etag")
+        known = set() if full else self.known_ids()
+
+        if not playlist_id:
+            playlist_id = get_uploads_playlist_id(service, counter)
+
+        page = _execute_conditional(
+            _playlist_page_request(service, playlist_id), first_page_etag, counter, "playlistItems.list"
+        )
+        if page is None:
+            counter.stop()
+            return []
+        new_first_page_etag = page.get('etag')
+
+        # Cada página nueva y los detalles de la anterior van en la misma petición por lotes
+        fetched = _playlist_videos(service, counter, playlist_id, page, known)
+
+        with closing(self._connect()) as conn, conn:
+            self._store(conn, fetched, time.time())
+            self._set_meta(conn, "uploads_playlist_id", playlist_id)
+            if new_first_page_etag:
+                self._set_meta(conn, "first_page_etag", new_first_page_etag)
+
+        counter.stop()
+        return [item['id'] for item in fetched]
+
+    def stale_ids(self, max_age=STATS_MAX_AGE):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id FROM videos WHERE stats_updated_at < ? ORDER BY published_at DESC",
+                (time.time() - max_age,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def refresh_statistics(self, service, counter=None, max_age=STATS_MAX_AGE):
+        """Actualiza los videos antiguos en lotes de 50 IDs, varios a la vez
+
+        Se piden título, descripción y estadísticas (cuestan lo mismo que
+        solo las estadísticas); las filas cuyo ETag no cambió solo renuevan
+        la fecha y los videos que la API ya no devuelve (borrados del
+        canal) salen del catálogo.
+        """
+        counter = counter or ApiCallCounter(QUOTA)
+
+        def _refresh_chunk(ids):
+            response = counter.execute(_details_request(service, ids), "videos.list")
+            items = response.get('items', [])
+            now = time.time()
+            placeholders = ','.join('?' * len(ids))
+            with closing(self._connect()) as conn, conn:
+                etags = dict(conn.execute(f"SELECT id, etag FROM videos WHERE id IN ({placeholders})", ids))
+                self._store(conn, [item for item in items if item.get('etag') != etags.get(item['id'])], now)
+                conn.executemany(
+                    "UPDATE videos SET stats_updated_at = ? WHERE id = ?",
+                    [(now, item['id']) for item in items if item.get('etag') == etags.get(item['id'])]
+                )
+                returned = {item['id'] for item in items}
+                conn.executemany("DELETE FROM videos WHERE id = ?",
+                                 [(video_id,) for video_id in ids if video_id not in returned])
+
+        run_concurrently(_refresh_chunk, _chunks(self.stale_ids(max_age), VIDEOS_PER_REQUEST))
+        counter.stop()
+        return counter
+
+    def refresh_statistics_in_background(self, service_factory, max_age=STATS_MAX_AGE):
+        """Lanza el refresco de estadísticas en un hilo si no hay otro en curso
+
+        ``service_factory`` se llama dentro del hilo y debe devolver un
+        cliente seguro entre hilos (ver http_pool.PooledHttp).
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return False
+        if not self.stale_ids(max_age):
+            return False
+
+        def _run():
+            self.refresh_statistics(service_factory(), max_age=max_age)
+
+        self._refresh_thread = threading.Thread(target=_run, name="catalog-stats", daemon=True)
+        self._refresh_thread.start()
+        return True
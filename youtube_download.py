@@ -0,0 +1,82 @@
+"""Descarga solo la pista de audio de los videos del canal con yt-dlp"""
+import glob
+import os
+
+# Audios descargados pendientes de publicar; se borran al publicarse
+DOWNLOAD_DIR = "descargas"
+
+# Registro de yt-dlp con los IDs ya descargados: al repetir una tarea no se
+# vuelve a pedir nada a YouTube mientras el audio siga en DOWNLOAD_DIR
+DOWNLOAD_ARCHIVE = "descargas_youtube.txt"
+
+CONCURRENT_FRAGMENTS = int(os.getenv("YTDLP_FRAGMENTS", "4"))
+
+# AAC primero: extract_audio lo copia a .m4a sin recodificar
+AUDIO_FORMAT = "bestaudio[acodec^=mp4a]/bestaudio[ext=mp3]/bestaudio/best"
+
+PARTIAL_SUFFIXES = (".part", ".ytdl", ".temp")
+
+
+class AlreadyDownloadedError(RuntimeError):
+    """yt-dlp tiene el video en su registro pero su audio ya no está en disco"""
+
+
+def _downloaded_file(directory, video_id):
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(video_id)}.*")):
+        if not path.endswith(PARTIAL_SUFFIXES):
+            return path
+    return None
+
+
+def _run_ytdlp(url, options):
+    from yt_dlp import YoutubeDL
+
+    with YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=True)
+    if not info:
+        return None
+    downloads = info.get("requested_downloads") or []
+    return downloads[0].get("filepath") if downloads else None
+
+
+def download_audio(url, video_id=None, directory=DOWNLOAD_DIR, archive=DOWNLOAD_ARCHIVE,
+                   concurrent_fragments=CONCURRENT_FRAGMENTS):
+    """Descarga la mejor pista de audio de ``url`` y devuelve su ruta
+
+    No se baja el video: el audio pesa del orden de diez veces menos. Los
+    formatos fragmentados (DASH/HLS) se descargan con ``concurrent_fragments``
+    peticiones a la vez. Si ``video_id`` ya está descargado se devuelve el
+    archivo existente sin conectarse; si está en el registro ``archive`` pero
+    su audio ya no está en disco, se lanza AlreadyDownloadedError.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if video_id:
+        existing = _downloaded_file(directory, video_id)
+        if existing:
+            return existing
+
+    options = {
+        "format": AUDIO_FORMAT,
+        "outtmpl": os.path.join(directory, "%(id)s.%(ext)s"),
+        "download_archive": archive,
+        "concurrent_fragment_downloads": concurrent_fragments,
+        "noplaylist": True,
+        "retries": 10,
+        "fragment_retries": 10,
+        "quiet": True,
+        "no_warnings": True,
+        "noprogress": True,
+    }
+    path = _run_ytdlp(url, options)
+    if path is None:
+        # yt-dlp se salta los IDs de su registro: no se vuelve a bajar nada
+        existing = _downloaded_file(directory, video_id) if video_id else None
+        if existing:
+            return existing
+        raise AlreadyDownloadedError(
+            f"{url} ya se descargó (está en {archive}) y su audio no está en {directory}; "
+            f"quítalo de {archive} para descargarlo de nuevo"
+        )
+    if not os.path.exists(path):
+        raise RuntimeError(f"yt-dlp no descargó el audio de {url}")
+    return path